@@ -0,0 +1,40 @@
+"""
+Time load_puzzle on the bundled puzzles, with and without validation.
+
+Run from the repository root:
+
+    python -m benchmarks.load_puzzle [--repeat N]
+"""
+
+import argparse
+import glob
+import time
+
+from src.crossword.utils import load_puzzle
+
+
+def best_time(path: str, trusted: bool, repeat: int) -> float:
+    """Fastest of repeat loads, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load_puzzle(path, trusted=trusted)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("paths", nargs="*", default=sorted(glob.glob("data/*.puz")))
+    args = parser.parse_args()
+
+    print(f"{'puzzle':<24}{'validated us':>14}{'trusted us':>12}{'speedup':>9}")
+    for path in args.paths:
+        validated = best_time(path, False, args.repeat)
+        trusted = best_time(path, True, args.repeat)
+        print(f"{path:<24}{validated * 1e6:>14.0f}{trusted * 1e6:>12.0f}{validated / trusted:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
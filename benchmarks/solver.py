@@ -0,0 +1,130 @@
+"""
+Measure solver throughput and accuracy offline, against the stub backend.
+
+Run from the repository root:
+
+    python -m benchmarks.solver [--batch] [--refine 40] [--latency 0.3] [--noise 0.1] [--error-rate 0.05]
+        [--rpm 120 [--schedule]] [--cascade 0.3] [--stream]
+        [--candidates 3] [--dedupe] [--corpus corpus.db]
+"""
+
+import argparse
+import asyncio
+import glob
+import time
+
+from src.crossword.utils import load_puzzle
+from src.solver.backends import StubBackend, StubConfig
+from src.solver.batching import BatchSolver
+from src.solver.cascade import Cascade
+from src.solver.corpus import ClueCorpus
+from src.solver.multi import solve_many
+from src.solver.pipeline import ClueSolver, SolverConfig
+from src.solver.refine import Refiner, answers_from_results
+from src.solver.scheduler import Scheduler
+
+
+async def run(args) -> None:
+    puzzles = [load_puzzle(path) for path in args.paths]
+    backend = StubBackend(puzzles, StubConfig(
+        seed=args.seed, noise=args.noise, error_rate=args.error_rate,
+        latency=args.latency, latency_sigma=args.latency_sigma,
+        requests_per_minute=args.rpm,
+        # The cheap tier of a cascade: noisier, and a quarter of the latency
+        noise_by_model={"stub-fast": args.cascade or 0.0},
+        latency_by_model={"stub-fast": args.latency / 4},
+    ))
+    scheduler = None
+    if args.schedule:
+        scheduler = Scheduler(backend, requests_per_minute=args.rpm,
+                              max_concurrency=args.concurrency, seed=args.seed)
+    config = SolverConfig(model="stub", max_concurrency=args.concurrency, timeout=None,
+                          stream=args.stream, candidates=args.candidates)
+    client = scheduler or backend
+    corpus = ClueCorpus(args.corpus) if args.corpus else None
+    solver = (BatchSolver(client, config, corpus=corpus) if args.batch
+              else ClueSolver(client, config, corpus=corpus))
+    cascade = None
+    if args.cascade is not None:
+        cascade = Cascade.from_models(client, ["stub-fast", "stub"], config, batch=args.batch,
+                                      corpus=corpus)
+        solver = cascade.solvers[-1]
+
+    print(f"{'puzzle':<24}{'clues':>7}{'solved':>8}{'cells':>8}{'seconds':>9}")
+    start = time.perf_counter()
+    clues = 0
+    tier_stats = {}
+    many = await solve_many(solver, puzzles) if args.dedupe else None
+    for index, (path, puzzle) in enumerate(zip(args.paths, puzzles)):
+        began = time.perf_counter()
+        if many is not None:
+            results = many.results[index]
+        elif cascade is not None:
+            tiered = await cascade.solve_puzzle(puzzle)
+            results = list(tiered.results.values())
+            for stats in tiered.tiers:
+                tier_stats.setdefault(stats.model, []).append(stats)
+        else:
+            results = await solver.solve_puzzle(puzzle)
+        if args.refine:
+            await Refiner(solver, max_requests=args.refine).refine(puzzle, answers_from_results(results))
+        elapsed = time.perf_counter() - began
+        clues += len(results)
+        solved = sum(r.ok for r in results)
+        print(f"{path:<24}{len(results):>7}{solved:>8}{puzzle.progress().fraction:>8.0%}{elapsed:>9.2f}")
+
+    total = time.perf_counter() - start
+    stats = backend.stats
+    print(f"\n{clues} clues in {total:.2f}s, {clues / total:.1f} clues/s, "
+          f"{stats.requests} requests, {stats.errors} errors, "
+          f"{stats.prompt_tokens + stats.completion_tokens} tokens, {stats.rate_limited} rate limited")
+    if many is not None:
+        report = many.report
+        print(f"dedupe: {report.groups} distinct of {report.clues} clues, {report.saved} saved")
+    for model, runs in tier_stats.items():
+        asked = sum(t.clues for t in runs)
+        print(f"tier {model}: {asked} clues, {sum(t.accepted for t in runs) / asked:.0%} accepted, "
+              f"{sum(t.requests for t in runs)} requests, "
+              f"{sum(t.latency for t in runs) / asked:.2f}s mean latency")
+    if corpus is not None:
+        hits = sum(s.corpus_hits for s in cascade.solvers) if cascade else solver.corpus_hits
+        print(f"corpus: {hits} clues answered from {len(corpus)} entries")
+        corpus.close()
+    if scheduler is not None:
+        print(f"scheduler: {scheduler.stats.retries} retries, "
+              f"{scheduler.stats.queued_seconds:.1f}s queued")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch", action="store_true", help="Batch clues into shared requests")
+    parser.add_argument("--refine", type=int, default=0, metavar="REQUESTS",
+                        help="Re-solve conflicting clues within this request budget per puzzle")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--noise", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--rpm", type=int, default=None, help="Stub requests per minute limit")
+    parser.add_argument("--cascade", type=float, default=None, metavar="NOISE",
+                        help="Try a faster model with this noise first, escalating doubtful clues")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Ranked candidates to ask for per single-clue request")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Solve all puzzles together, asking repeated clues once")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream single-clue replies, stopping at the first acceptable word")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Pace requests to --rpm through a Scheduler")
+    parser.add_argument("--corpus", metavar="PATH",
+                        help="Answer clues found in this clue corpus without requests")
+    parser.add_argument("paths", nargs="*", default=sorted(glob.glob("data/*.puz")))
+    args = parser.parse_args()
+    if args.dedupe and args.cascade is not None:
+        parser.error("--dedupe and --cascade cannot be combined")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+On-disk cache of fully constructed puzzles.
+
+Entries are binary snapshots (see snapshot.py) named after the SHA-256 of
+the source file's content, so any worker or run that loads the same .puz
+reads the snapshot through mmap instead of parsing the file again. Entries
+are written atomically and the cache is kept under a size limit by evicting
+the least recently used entries, using file modification times as the
+recency clock. The total size is tracked in memory, so the directory is only
+scanned when it is opened and when the limit is passed.
+"""
+
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from .crossword import CrosswordPuzzle
+from .snapshot import VERSION
+from .exceptions import SnapshotError
+
+SUFFIX = ".xwpz"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class PuzzleCache:
+    """A size-bounded LRU cache of puzzle snapshots in a directory"""
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be positive")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = sum(size for _, size, _ in self._entries())
+
+    @staticmethod
+    def key(data: bytes) -> str:
+        """Cache key for the raw content of a puzzle file"""
+        digest = hashlib.sha256(data)
+        # A new snapshot format must not read entries written by an old one
+        digest.update(f"snapshot-v{VERSION}".encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{SUFFIX}"
+
+    def get(self, key: str) -> Optional[CrosswordPuzzle]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                puzzle = CrosswordPuzzle.from_bytes(data)
+            # Mark as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            # ValueError covers mmap of an empty file
+            self.misses += 1
+            return None
+        except SnapshotError:
+            self.misses += 1
+            self._remove(path)
+            return None
+        self.hits += 1
+        return puzzle
+
+    def put(self, key: str, puzzle: CrosswordPuzzle) -> None:
+        data = puzzle.to_bytes()
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            try:
+                replaced = path.stat().st_size
+            except FileNotFoundError:
+                replaced = 0
+            # Atomic, so concurrent workers never read a half-written entry
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self._size += len(data) - replaced
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        """(modification time, size, path) of every entry"""
+        entries = []
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        self._size -= size
+
+    def evict(self) -> None:
+        """
+        Delete least recently used entries until the cache fits in max_bytes.
+        Scans the directory, so entries written by other workers are counted too.
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+    def clear(self) -> None:
+        for path in self.directory.glob(f"*{SUFFIX}"):
+            path.unlink(missing_ok=True)
+        self._size = 0
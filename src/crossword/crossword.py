@@ -1,47 +1,145 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from pydantic import BaseModel, Field, PrivateAttr, computed_field, field_serializer
+
+from .types import Candidate, Direction, Clue, ClueRef, Crossing, Grid, Progress
+from .grid import CompactGrid, decode, encode_all
+from .history import Checkpoint, GridHistory
+from .index import CrossingIndex
+from .progress import SolvedState
+from .exceptions import InvalidGridError, InvalidClueError, CrossingConflictError
+
+ClueWrites = Union[Mapping[ClueRef, Sequence[str]], Iterable[Tuple[ClueRef, Sequence[str]]]]
+
+
+class Transaction:
+    """Writes staged by CrosswordPuzzle.transaction, applied together on exit"""
+
+    def __init__(self):
+        self.writes: List[Tuple[ClueRef, Sequence[str]]] = []
+
+    def set(self, clue: ClueRef, chars: Sequence[str]) -> None:
+        """Stage characters for a clue. The grid is unchanged until the transaction commits."""
+        self.writes.append((clue, chars))
 
-from .types import Direction, Cell, Clue, Grid
-from .exceptions import InvalidGridError, InvalidClueError
 
 class CrosswordPuzzle(BaseModel):
     width: int = Field(gt=0)
     height: int = Field(gt=0)
     clues: List[Clue] = Field(default_factory=list)
-    grid_history: List[Grid] = Field(default_factory=list, alias="grid_history")
     clue_history: List[int] = Field(default_factory=list, alias="clue_history")
+    # Ranked candidate answers per clue handle, best first
+    candidates: Dict[int, List[Candidate]] = Field(default_factory=dict)
+
+    _history: GridHistory = PrivateAttr()
+    _index: CrossingIndex = PrivateAttr()
+    _state: SolvedState = PrivateAttr()
+    _registry: Dict[Tuple[int, Direction], int] = PrivateAttr(default_factory=dict)
 
     def __init__(self, **data):
+        grids = data.pop("grid_history", None)
         super().__init__(**data)
-        if not self.grid_history:
-            # Initialize empty grid with cells
-            cells = [[Cell(row=r, col=c, value=None) 
-                     for c in range(self.width)]
-                    for r in range(self.height)]
-            
-            initial_grid = Grid(
-                width=self.width,
-                height=self.height,
-                cells=cells
-            )
-            self.grid_history.append(initial_grid)
+        if grids:
+            history = GridHistory.from_grids(grids, self.clue_history)
+        else:
+            # Start from an empty compact grid; Cell models are only built on access
+            history = GridHistory(CompactGrid(self.width, self.height))
+        self._attach_history(history)
+
+    @classmethod
+    def from_trusted(cls, width: int, height: int, grid: CompactGrid,
+                     clues: List[Clue]) -> "CrosswordPuzzle":
+        """
+        Build a puzzle from data already known to be valid, such as a parsed .puz
+        file, without pydantic validation of the puzzle, its clues or its cells.
+        Clue positions and uniqueness are still checked while indexing.
+        """
+        if (grid.width, grid.height) != (width, height):
+            raise InvalidGridError("Grid dimensions do not match the puzzle")
+        puzzle = cls.model_construct(width=width, height=height, clues=clues, clue_history=[])
+        puzzle._attach_history(GridHistory(grid))
+        return puzzle
+
+    def _attach_history(self, history: GridHistory) -> None:
+        """Index the clues and start tracking solved state over a history"""
+        registry = {}
+        index = CrossingIndex(self.width, self.height)
+        state = SolvedState(history.grid, index)
+        for clue_idx, clue in enumerate(self.clues):
+            if clue.key in registry:
+                raise InvalidClueError(f"Clue {clue.number} {clue.direction.value} already exists")
+            if not self._validate_clue_chars_position(clue):
+                raise InvalidClueError(f"Clue {clue.number} position is invalid")
+            index.add(clue_idx, clue)
+            registry[clue.key] = clue_idx
+            state.add_clue(clue_idx, clue)
+
+        history.observer = state
+        self._history = history
+        self._registry = registry
+        self._index = index
+        self._state = state
+
+    @computed_field
+    @property
+    def grid_history(self) -> List[Grid]:
+        """Grid states from the initial grid to the current one, materialized on access"""
+        return self._history
+
+    @field_serializer("grid_history")
+    def _serialize_grid_history(self, grid_history: GridHistory) -> List[Grid]:
+        return list(grid_history)
 
     @property
     def current_grid(self) -> Grid:
-        return self.grid_history[-1]
+        return self._history.current
+
+    @property
+    def compact_grid(self) -> CompactGrid:
+        """The live grid in compact form. Copy it before holding on to a state."""
+        return self._history.grid
 
-    def add_clue(self, clue: Clue) -> None:
-        """Add a new clue to the puzzle"""
+    def add_clue(self, clue: Clue) -> int:
+        """Add a new clue to the puzzle and return its handle"""
         
-        # check for unqiue id
-        if any(c.number == clue.number for c in self.clues):
-            raise InvalidClueError(f"Clue with number {clue.number} already exists")
+        # check for unique number and direction
+        if clue.key in self._registry:
+            raise InvalidClueError(f"Clue {clue.number} {clue.direction.value} already exists")
 
         # check for valid position                     
         if not self._validate_clue_chars_position(clue):
             raise InvalidClueError(f"Clue {clue.number} position is invalid")
-                              
+
+        handle = len(self.clues)
+        self._index.add(handle, clue)
+        self._registry[clue.key] = handle
         self.clues.append(clue)
+        self._state.add_clue(handle, clue)
+        return handle
+
+    def handle(self, clue: ClueRef) -> int:
+        """Get the integer handle of a clue in this puzzle"""
+        return self._resolve(clue)[0]
+
+    def get_clue(self, number: int, direction: Direction) -> Clue:
+        """Look up a clue by its number and direction"""
+        try:
+            return self.clues[self._registry[(number, Direction(direction))]]
+        except (KeyError, ValueError):
+            raise InvalidClueError(f"Clue {number} {direction} not found in puzzle")
+
+    def _resolve(self, clue: ClueRef) -> Tuple[int, Clue]:
+        """Resolve a clue or handle to the handle and the puzzle's own Clue"""
+        if isinstance(clue, int):
+            if not 0 <= clue < len(self.clues):
+                raise InvalidClueError(f"Clue handle {clue} not found in puzzle")
+            return clue, self.clues[clue]
+        handle = self._registry.get((clue.number, clue.direction))
+        if handle is not None:
+            registered = self.clues[handle]
+            if registered is clue or registered == clue:
+                return handle, registered
+        raise InvalidClueError("Clue not found in puzzle")
 
     def _validate_clue_chars_position(self, clue: Clue) -> bool:
         """Check if the clue position is valid"""
@@ -51,35 +149,111 @@ class CrosswordPuzzle(BaseModel):
             return clue.col + clue.length <= self.width
         return clue.row + clue.length <= self.height
 
-    def get_current_clue_chars(self, clue: Clue) -> List[Optional[str]]:
-        """Get current characters in the grid for a given clue"""     
-        if clue not in self.clues:
-            raise InvalidClueError("Clue not found in puzzle")
-        
-        return [self.current_grid.cells[row][col].value 
-                for row, col in clue.cells()]
+    def get_current_clue_chars(self, clue: ClueRef) -> List[Optional[str]]:
+        """Get current characters in the grid for a given clue or handle"""
+        clue_idx, _ = self._resolve(clue)
+        buffer = self._history.grid.buffer
+        return [decode(buffer[i]) for i in self._index.cells(clue_idx)]
 
-    def set_clue_chars(self, clue: Clue, chars: List[str]) -> None:
-        """Fill in characters for a given clue"""
+    def set_clue_chars(self, clue: ClueRef, chars: List[str]) -> None:
+        """Fill in characters for a given clue or handle"""
+        clue_idx, clue = self._resolve(clue)
         if len(chars) != clue.length:
             raise InvalidClueError(f"Expected {clue.length} characters, got {len(chars)}")
 
         # Make all chars uppercase
-        chars = [char.upper() for char in chars]
+        try:
+            codes = encode_all(char.upper() for char in chars)
+        except InvalidGridError as e:
+            raise InvalidClueError(str(e))
 
-        # Create new grid based on current state
-        new_grid = self.current_grid.model_copy(deep=True)
-        
-        for (row, col), char in zip(clue.cells(), chars):
-            new_grid.cells[row][col].value = char
+        # Record only the cells this clue covers
+        self._history.record(
+            self._index.cells(clue_idx),
+            codes,
+            ((clue_idx, clue.answered),)
+        )
 
-        self.grid_history.append(new_grid)
-        
         clue.answered = True
-        self.clue_history.append(self.clues.index(clue))
+        self.clue_history.append(clue_idx)
+
+    def get_candidates(self, clue: ClueRef) -> List[Candidate]:
+        """Candidate answers stored for a clue or handle, best first"""
+        return self.candidates.get(self.handle(clue), [])
+
+    def add_candidates(self, clue: ClueRef, candidates: Iterable[Candidate]) -> List[Candidate]:
+        """
+        Merge candidates into those stored for a clue or handle and return
+        them. Words are uppercased, those of the wrong length are dropped and
+        a word seen twice keeps its best score.
+        """
+        clue_idx, clue = self._resolve(clue)
+        best = {c.word: c.score for c in self.candidates.get(clue_idx, [])}
+        for candidate in candidates:
+            word = candidate.word.upper()
+            if len(word) == clue.length and candidate.score > best.get(word, float("-inf")):
+                best[word] = candidate.score
+        merged = [
+            Candidate(word=word, score=score)
+            for word, score in sorted(best.items(), key=lambda item: -item[1])
+        ]
+        self.candidates[clue_idx] = merged
+        return merged
+
+    def set_many(self, writes: ClueWrites) -> None:
+        """
+        Fill in several clues as a single move. Either every write is applied
+        or, if any is invalid or two writes disagree on a shared cell, none is.
+        """
+        items = writes.items() if isinstance(writes, Mapping) else writes
+        width = self.width
+        # cell -> (code, clue index that wrote it)
+        staged: Dict[int, Tuple[int, int]] = {}
+        clues = []
+        seen = set()
+        for clue, chars in items:
+            clue_idx, clue = self._resolve(clue)
+            if len(chars) != clue.length:
+                raise InvalidClueError(f"Expected {clue.length} characters, got {len(chars)}")
+            try:
+                codes = encode_all(char.upper() for char in chars)
+            except InvalidGridError as e:
+                raise InvalidClueError(str(e))
+            if clue_idx in seen:
+                raise InvalidClueError(f"Clue {clue.number} {clue.direction.value} is set more than once")
+
+            for i, code in zip(self._index.cells(clue_idx), codes):
+                previous = staged.setdefault(i, (code, clue_idx))
+                if previous[0] != code:
+                    other = self.clues[previous[1]]
+                    row, col = divmod(i, width)
+                    raise CrossingConflictError(
+                        f"Clue {clue.number} {clue.direction.value} conflicts with clue "
+                        f"{other.number} {other.direction.value} at ({row}, {col})",
+                        row, col
+                    )
+            seen.add(clue_idx)
+            clues.append((clue_idx, clue.answered))
+
+        if not clues:
+            return
+
+        self._history.record(staged.keys(), bytes(code for code, _ in staged.values()), tuple(clues))
+        for clue_idx, _ in clues:
+            self.clues[clue_idx].answered = True
+            self.clue_history.append(clue_idx)
 
-    def reveal_clue_answer(self, clue: Clue) -> None:
+    @contextmanager
+    def transaction(self) -> Iterator[Transaction]:
+        """Stage writes with Transaction.set and apply them with set_many on exit"""
+        transaction = Transaction()
+        yield transaction
+        self.set_many(transaction.writes)
+
+    def reveal_clue_answer(self, clue: ClueRef) -> None:
         """Reveal the answer for a specific clue"""
+        if isinstance(clue, int):
+            clue = self._resolve(clue)[1]
         if not clue.answer:
             raise InvalidClueError("No answer available for this clue")
             
@@ -87,39 +261,76 @@ class CrosswordPuzzle(BaseModel):
 
     def reveal_all(self) -> None:
         """Reveal all answers in the puzzle"""
-        for clue in self.clues:
+        for clue_idx, clue in enumerate(self.clues):
             if not clue.answered and clue.answer:
-                self.reveal_clue_answer(clue)
+                self.reveal_clue_answer(clue_idx)
 
     def get_clues_overlapping_with_cell(self, row: int, col: int) -> List[Clue]:
         """Get all clues that overlap with a specific cell"""
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            raise InvalidGridError(f"Cell ({row}, {col}) is outside the grid")
+        across, _, down, _ = self._index.at(row, col)
+        return [self.clues[i] for i in (across, down) if i is not None]
+
+    def crossings(self, clue: ClueRef) -> List[Crossing]:
+        """Get the clues crossing a given clue and where they cross"""
+        clues = self.clues
         return [
-            clue for clue in self.clues if row in clue.cells() and col in clue.cells()
+            Crossing(pos, clues[other_idx], other_pos)
+            for pos, other_idx, other_pos in self._index.crossings(self._resolve(clue)[0])
         ]
 
-    def validate_clue_chars(self, clue: Clue) -> bool:
+    def validate_clue_chars(self, clue: ClueRef) -> bool:
         """Check if the current entry for a clue is correct"""
-        return self.get_current_clue_chars(clue) == list(clue.answer)
+        clue_idx, clue = self._resolve(clue)
+        if clue.answer is None:
+            raise InvalidClueError("No answer available for this clue")
+        return self._state.is_complete(clue_idx)
     
     def validate_all(self) -> bool:
         """Check if all entries in the puzzle are correct"""
-        return all(self.validate_clue_chars(clue) for clue in self.clues if clue.answer)
+        return self._state.all_complete
+
+    def progress(self) -> Progress:
+        """Count the correct cells and complete clues, for clues with known answers"""
+        return self._state.progress()
 
     def undo(self) -> None:
         """Undo the last move"""
-        if len(self.grid_history) <= 1:
-            raise InvalidGridError("No moves to undo")
-        self.grid_history.pop()
-        clue_idx = self.clue_history.pop()
-        self.clues[clue_idx].answered = False
+        delta = self._history.pop()
+        for clue_idx, was_answered in reversed(delta.clues):
+            self.clue_history.pop()
+            self.clues[clue_idx].answered = was_answered
+
+    def checkpoint(self) -> Checkpoint:
+        """Mark the current state so it can be restored with rollback"""
+        return self._history.checkpoint()
+
+    def rollback(self, checkpoint: Checkpoint) -> None:
+        """Undo every move made since a checkpoint, in O(cells changed since then)"""
+        if not self._history.reaches(checkpoint):
+            raise InvalidGridError("Checkpoint is not in the current history")
+        for _ in range(len(self._history.deltas) - checkpoint.depth):
+            self.undo()
 
     def reset(self) -> None:
         """Reset the puzzle to its initial state"""
-        self.grid_history = [self.grid_history[0]]
-        self.clue_history = []
+        self._history.reset()
+        self.clue_history.clear()
         for clue in self.clues:
             clue.answered = False
             
+    def to_bytes(self) -> bytes:
+        """Serialize the puzzle and its history in the compact binary snapshot format"""
+        from .snapshot import dump
+        return dump(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CrosswordPuzzle":
+        """Load a puzzle written by to_bytes. Accepts any buffer, e.g. an mmap."""
+        from .snapshot import load
+        return load(data)
+
     def __repr__(self):
         return f"<CrosswordPuzzle width={self.width} height={self.height} clues={len(self.clues)}>"
     
@@ -141,7 +352,7 @@ class CrosswordPuzzle(BaseModel):
         # Grid content
         for row in range(self.height):
             # Format each cell with padding
-            formatted_cells = [f" {cell.value or ' '} " for cell in self.current_grid.cells[row]]
+            formatted_cells = [f" {value or ' '} " for value in self.compact_grid.row_values(row)]
             row_str = VERTICAL + "".join(formatted_cells) + VERTICAL
             result.append(row_str)
 
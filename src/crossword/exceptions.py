@@ -8,4 +8,16 @@ class InvalidGridError(CrosswordError):
 
 class InvalidClueError(CrosswordError):
     """Raised when clue operations are invalid"""
-    pass
\ No newline at end of file
+    pass
+
+class SnapshotError(CrosswordError):
+    """Raised when a binary snapshot cannot be read"""
+    pass
+
+class CrossingConflictError(InvalidGridError):
+    """Raised when writes disagree on the letter of a shared cell"""
+
+    def __init__(self, message: str, row: int, col: int):
+        super().__init__(message)
+        self.row = row
+        self.col = col
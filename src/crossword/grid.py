@@ -0,0 +1,142 @@
+"""
+Compact array-backed grid storage.
+
+A CompactGrid keeps one byte per square in a flat bytearray indexed by
+row * width + col, instead of a pydantic Cell per square. The pydantic Grid
+stays the import/export format: use CompactGrid.from_grid and to_grid to
+convert between the two.
+"""
+
+from typing import Iterable, Iterator, List, Optional
+
+from .types import Cell, Grid
+from .exceptions import InvalidGridError
+
+BLOCK = "░"
+
+EMPTY_CODE = 0
+BLOCK_CODE = 0xFF
+
+# Byte code -> cell value. Codes 1-254 are the latin-1 character of the same code.
+_DECODE: List[Optional[str]] = [None] + [chr(i) for i in range(1, BLOCK_CODE)] + [BLOCK]
+_ENCODE = {value: code for code, value in enumerate(_DECODE)}
+
+
+def encode(value: Optional[str]) -> int:
+    """Encode a cell value as a single byte"""
+    code = _ENCODE.get(value)
+    if code is None:
+        raise InvalidGridError(f"Cell value {value!r} cannot be stored in a compact grid")
+    return code
+
+
+def decode(code: int) -> Optional[str]:
+    """Decode a single byte back into a cell value"""
+    return _DECODE[code]
+
+
+def encode_all(values: Iterable[Optional[str]]) -> bytes:
+    """Encode several cell values at once"""
+    return bytes(map(encode, values))
+
+
+class CellView:
+    """A lightweight read/write view of one square of a CompactGrid"""
+    __slots__ = ("_grid", "row", "col")
+
+    def __init__(self, grid: "CompactGrid", row: int, col: int):
+        self._grid = grid
+        self.row = row
+        self.col = col
+
+    @property
+    def value(self) -> Optional[str]:
+        return _DECODE[self._grid.buffer[self.row * self._grid.width + self.col]]
+
+    @value.setter
+    def value(self, value: Optional[str]) -> None:
+        self._grid.buffer[self.row * self._grid.width + self.col] = encode(value)
+
+    @property
+    def is_block(self) -> bool:
+        return self._grid.buffer[self.row * self._grid.width + self.col] == BLOCK_CODE
+
+    def to_cell(self) -> Cell:
+        return Cell(row=self.row, col=self.col, value=self.value)
+
+    def __repr__(self):
+        return f"<CellView row={self.row} col={self.col} value={self.value!r}>"
+
+
+class CompactGrid:
+    """A width x height grid stored as one byte per square"""
+    __slots__ = ("width", "height", "buffer")
+
+    def __init__(self, width: int, height: int, buffer: Optional[bytearray] = None):
+        if width <= 0 or height <= 0:
+            raise InvalidGridError("Grid dimensions must be positive")
+        if buffer is None:
+            buffer = bytearray(width * height)
+        elif len(buffer) != width * height:
+            raise InvalidGridError(f"Expected {width * height} bytes, got {len(buffer)}")
+        self.width = width
+        self.height = height
+        self.buffer = buffer if isinstance(buffer, bytearray) else bytearray(buffer)
+
+    @classmethod
+    def from_grid(cls, grid: Grid) -> "CompactGrid":
+        return cls(grid.width, grid.height, bytearray(
+            encode(cell.value) for row in grid.cells for cell in row
+        ))
+
+    def to_grid(self) -> Grid:
+        """Export as a pydantic Grid"""
+        width = self.width
+        buffer = self.buffer
+        cells = [
+            [Cell.model_construct(row=r, col=c, value=_DECODE[buffer[r * width + c]])
+             for c in range(width)]
+            for r in range(self.height)
+        ]
+        return Grid.model_construct(width=width, height=self.height, cells=cells)
+
+    def copy(self) -> "CompactGrid":
+        return CompactGrid(self.width, self.height, bytearray(self.buffer))
+
+    def index(self, row: int, col: int) -> int:
+        return row * self.width + col
+
+    def __getitem__(self, position) -> Optional[str]:
+        row, col = position
+        return _DECODE[self.buffer[row * self.width + col]]
+
+    def __setitem__(self, position, value: Optional[str]) -> None:
+        row, col = position
+        self.buffer[row * self.width + col] = encode(value)
+
+    def cell(self, row: int, col: int) -> CellView:
+        return CellView(self, row, col)
+
+    @property
+    def cells(self) -> List[List[CellView]]:
+        """Rows of cell views, mirroring Grid.cells"""
+        return [[CellView(self, r, c) for c in range(self.width)] for r in range(self.height)]
+
+    def row_values(self, row: int) -> List[Optional[str]]:
+        start = row * self.width
+        return [_DECODE[code] for code in self.buffer[start:start + self.width]]
+
+    def __iter__(self) -> Iterator[Optional[str]]:
+        """Iterate over all cell values in row-major order"""
+        return (_DECODE[code] for code in self.buffer)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactGrid):
+            return NotImplemented
+        return (self.width, self.height, self.buffer) == (other.width, other.height, other.buffer)
+
+    def __repr__(self):
+        return f"<CompactGrid width={self.width} height={self.height}>"
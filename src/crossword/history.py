@@ -0,0 +1,202 @@
+"""
+Delta-based grid history for crossword puzzles.
+
+Rather than keeping a full copy of the grid for every move, the history keeps
+the initial grid, the live CompactGrid and one GridDelta per move. Full Grid
+objects are only built when a caller asks for one, starting from the nearest
+keyframe and replaying the deltas after it.
+"""
+
+from collections.abc import Sequence
+from itertools import count
+from typing import Dict, Iterable, List, NamedTuple, Optional, Protocol, Tuple, Union
+
+from .types import Grid
+from .grid import CompactGrid, decode
+from .exceptions import InvalidGridError
+
+KEYFRAME_INTERVAL = 64
+
+
+class GridDelta(NamedTuple):
+    """The cells changed by a single move, as flat row * width + col indices"""
+    cells: Tuple[int, ...]
+    # Encoded cell values, one byte per entry in cells
+    old: bytes
+    new: bytes
+    # (clue index, answered flag before the move) for every clue the move set
+    clues: Tuple[Tuple[int, bool], ...] = ()
+
+
+class Checkpoint(NamedTuple):
+    """A point in the history that can be rolled back to"""
+    depth: int
+    # Id of the move at depth, so a checkpoint on an abandoned branch is detected
+    move_id: int
+
+
+class HistoryObserver(Protocol):
+    """Notified of every change the history makes to the live grid"""
+
+    def cells_changed(self, cells: Sequence, old: bytes, new: bytes) -> None:
+        """Cells were set from old to new codes, in order"""
+
+    def grid_replaced(self) -> None:
+        """The live grid was replaced wholesale"""
+
+
+class GridHistory(Sequence):
+    """
+    Sequence of grid states where item 0 is the initial grid and item -1 the
+    current one. Recording or undoing a move costs O(cells changed).
+    """
+
+    def __init__(self, base: Union[Grid, CompactGrid], keyframe_interval: int = KEYFRAME_INTERVAL):
+        if keyframe_interval <= 0:
+            raise ValueError("keyframe_interval must be positive")
+        self.width = base.width
+        self.height = base.height
+        self.keyframe_interval = keyframe_interval
+        if isinstance(base, CompactGrid):
+            self.grid = base
+            self._current: Optional[Grid] = None
+        else:
+            self.grid = CompactGrid.from_grid(base)
+            self._current = base
+        self._base = bytes(self.grid.buffer)
+        self.deltas: List[GridDelta] = []
+        self._keyframes: Dict[int, bytes] = {0: self._base}
+        self.observer: Optional[HistoryObserver] = None
+        self._ids = count()
+        self._base_id = next(self._ids)
+        self._move_ids: List[int] = []
+
+    @classmethod
+    def from_grids(cls, grids: Iterable[Grid], clue_history: Iterable[int] = ()) -> "GridHistory":
+        """Rebuild a history from a list of full grids, e.g. a model_dump round trip"""
+        grids = (Grid.model_validate(grid) for grid in grids)
+        try:
+            history = cls(next(grids))
+        except StopIteration:
+            raise InvalidGridError("Grid history must contain at least one grid")
+        clue_history = list(clue_history)
+        for i, grid in enumerate(grids):
+            buffer = CompactGrid.from_grid(grid).buffer
+            if len(buffer) != len(history.grid.buffer):
+                raise InvalidGridError("Grid dimensions do not match the initial grid")
+            live = history.grid.buffer
+            changed = [j for j, code in enumerate(buffer) if code != live[j]]
+            clues = ((clue_history[i], False),) if i < len(clue_history) else ()
+            history.record(changed, bytes(buffer[j] for j in changed), clues)
+        return history
+
+    def __len__(self) -> int:
+        return len(self.deltas) + 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("grid history index out of range")
+        if index == len(self.deltas):
+            return self.current
+        return self.grid_at(index).to_grid()
+
+    def __setitem__(self, index: int, grid: Grid) -> None:
+        """Replace the initial grid. Only allowed before any move is made."""
+        if index not in (0, -len(self)) or self.deltas:
+            raise InvalidGridError("Only the initial grid of an unplayed puzzle can be replaced")
+        if (grid.width, grid.height) != (self.width, self.height):
+            raise InvalidGridError("Grid dimensions do not match the puzzle")
+        # Update in place so holders of self.grid keep seeing the live grid
+        self.grid.buffer[:] = CompactGrid.from_grid(grid).buffer
+        self._base = bytes(self.grid.buffer)
+        self._keyframes = {0: self._base}
+        self._current = grid
+        self._base_id = next(self._ids)
+        if self.observer is not None:
+            self.observer.grid_replaced()
+
+    @property
+    def current(self) -> Grid:
+        """The current grid, materialized at most once per move"""
+        if self._current is None:
+            self._current = self.grid.to_grid()
+        return self._current
+
+    def value(self, row: int, col: int) -> Optional[str]:
+        return decode(self.grid.buffer[row * self.width + col])
+
+    def record(self, cells: Iterable[int], new: bytes,
+               clues: Tuple[Tuple[int, bool], ...] = ()) -> GridDelta:
+        """Apply a move of encoded values to the live grid and append it to the history"""
+        cells = tuple(cells)
+        buffer = self.grid.buffer
+        old = bytearray()
+        # Read each old value just before writing so repeated cells chain correctly
+        for i, code in zip(cells, new):
+            old.append(buffer[i])
+            buffer[i] = code
+
+        delta = GridDelta(cells, bytes(old), bytes(new), clues)
+        self.deltas.append(delta)
+        self._move_ids.append(next(self._ids))
+        self._current = None
+        if len(self.deltas) % self.keyframe_interval == 0:
+            self._keyframes[len(self.deltas)] = bytes(buffer)
+        if self.observer is not None:
+            self.observer.cells_changed(cells, delta.old, delta.new)
+        return delta
+
+    def pop(self) -> GridDelta:
+        """Revert the last move on the live grid and return it"""
+        if not self.deltas:
+            raise InvalidGridError("No moves to undo")
+        self._keyframes.pop(len(self.deltas), None)
+        delta = self.deltas.pop()
+        self._move_ids.pop()
+        buffer = self.grid.buffer
+        # Reverse order so a cell written twice in one move ends at its oldest value
+        cells = delta.cells[::-1]
+        old = delta.old[::-1]
+        for i, code in zip(cells, old):
+            buffer[i] = code
+        self._current = None
+        if self.observer is not None:
+            self.observer.cells_changed(cells, delta.new[::-1], old)
+        return delta
+
+    def reset(self) -> List[GridDelta]:
+        """Return to the initial grid, returning the discarded moves"""
+        deltas = self.deltas
+        self.deltas = []
+        self._move_ids = []
+        self._base_id = next(self._ids)
+        self.grid.buffer[:] = self._base
+        self._keyframes = {0: self._base}
+        self._current = None
+        if self.observer is not None:
+            self.observer.grid_replaced()
+        return deltas
+
+    def checkpoint(self) -> Checkpoint:
+        """Mark the current state"""
+        return Checkpoint(len(self.deltas), self._move_ids[-1] if self._move_ids else self._base_id)
+
+    def reaches(self, checkpoint: Checkpoint) -> bool:
+        """Whether popping moves would return to the checkpointed state"""
+        depth, move_id = checkpoint
+        if not 0 <= depth <= len(self.deltas):
+            return False
+        return (self._move_ids[depth - 1] if depth else self._base_id) == move_id
+
+    def grid_at(self, index: int) -> CompactGrid:
+        """The compact grid after the first index moves"""
+        start = index - index % self.keyframe_interval
+        buffer = bytearray(self._keyframes[start])
+        for delta in self.deltas[start:index]:
+            for i, code in zip(delta.cells, delta.new):
+                buffer[i] = code
+        return CompactGrid(self.width, self.height, buffer)
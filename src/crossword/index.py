@@ -0,0 +1,76 @@
+"""
+Cell-to-clue crossing index.
+
+The index is built incrementally as clues are added, so looking up the clues
+through a cell, or the crossings of a clue, never scans the clue list.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from .types import Clue, Direction
+from .exceptions import InvalidClueError
+
+
+class CellClues(NamedTuple):
+    """The clues through a cell, as clue indices, and the cell's position in each"""
+    across: Optional[int]
+    across_pos: Optional[int]
+    down: Optional[int]
+    down_pos: Optional[int]
+
+
+class CrossingIndex:
+    """Maps every cell to the across and down clue through it"""
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        # Flat row * width + col arrays of (clue index, position) or None
+        self._across: List[Optional[Tuple[int, int]]] = [None] * (width * height)
+        self._down: List[Optional[Tuple[int, int]]] = [None] * (width * height)
+        # Per clue index: (position, crossing clue index, position in crossing clue)
+        self._crossings: List[List[Tuple[int, int, int]]] = []
+        self._cells: List[Tuple[int, ...]] = []
+
+    def add(self, clue_idx: int, clue: Clue) -> None:
+        """Index a clue that has already passed position validation"""
+        if clue_idx != len(self._crossings):
+            raise InvalidClueError("Clues must be indexed in order")
+        same, other = (
+            (self._across, self._down) if clue.direction == Direction.ACROSS
+            else (self._down, self._across)
+        )
+        width = self.width
+        cells = tuple(row * width + col for row, col in clue.cells())
+        for i in cells:
+            if same[i] is not None:
+                raise InvalidClueError(
+                    f"Clue {clue.number} overlaps another {clue.direction.value} clue"
+                )
+
+        crossings = []
+        for pos, i in enumerate(cells):
+            same[i] = (clue_idx, pos)
+            if other[i] is not None:
+                other_idx, other_pos = other[i]
+                crossings.append((pos, other_idx, other_pos))
+                self._crossings[other_idx].append((other_pos, clue_idx, pos))
+        self._crossings.append(crossings)
+        self._cells.append(cells)
+
+    def at(self, row: int, col: int) -> CellClues:
+        i = row * self.width + col
+        across = self._across[i] or (None, None)
+        down = self._down[i] or (None, None)
+        return CellClues(*across, *down)
+
+    def clues_at(self, index: int) -> Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]:
+        """The (clue index, position) pairs through a flat cell index"""
+        return self._across[index], self._down[index]
+
+    def cells(self, clue_idx: int) -> Tuple[int, ...]:
+        """Flat cell indices covered by a clue"""
+        return self._cells[clue_idx]
+
+    def crossings(self, clue_idx: int) -> List[Tuple[int, int, int]]:
+        return self._crossings[clue_idx]
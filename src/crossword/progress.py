@@ -0,0 +1,125 @@
+"""
+Incremental solved-state tracking.
+
+SolvedState observes the grid history and keeps running counts of correct
+cells and complete clues, so checking whether a puzzle is solved does not
+re-read the grid.
+"""
+
+from typing import List, Sequence, Tuple
+
+from .types import Clue, Progress
+from .grid import CompactGrid, encode
+from .index import CrossingIndex
+from .exceptions import InvalidGridError
+
+# Never equal to a stored byte, used for answer letters a cell cannot hold
+_NO_MATCH = -1
+
+
+def _answer_codes(clue: Clue) -> Tuple[int, ...]:
+    if clue.answer is None:
+        return ()
+    if len(clue.answer) != clue.length:
+        return (_NO_MATCH,) * clue.length
+    codes = []
+    for char in clue.answer:
+        try:
+            codes.append(encode(char))
+        except InvalidGridError:
+            codes.append(_NO_MATCH)
+    return tuple(codes)
+
+
+class SolvedState:
+    """Per-clue and per-cell correctness, updated on every grid change"""
+
+    def __init__(self, grid: CompactGrid, index: CrossingIndex):
+        self.grid = grid
+        self.index = index
+        # Expected code per cell from the first clue with an answer through it, 0 if unknown
+        self.solution = bytearray(len(grid.buffer))
+        self.correct_cells = 0
+        self.solution_cells = 0
+        self._answers: List[Tuple[int, ...]] = []
+        self._correct: List[int] = []
+        self.complete_clues = 0
+        self.answer_clues = 0
+
+    def add_clue(self, clue_idx: int, clue: Clue) -> None:
+        """Start tracking a clue that has just been indexed"""
+        answer = _answer_codes(clue)
+        self._answers.append(answer)
+        self._correct.append(0)
+        if not answer:
+            return
+        self.answer_clues += 1
+
+        buffer = self.grid.buffer
+        correct = 0
+        for i, expected in zip(self.index.cells(clue_idx), answer):
+            correct += buffer[i] == expected
+            if not self.solution[i] and expected != _NO_MATCH:
+                self.solution[i] = expected
+                self.solution_cells += 1
+                self.correct_cells += buffer[i] == expected
+        self._correct[clue_idx] = correct
+        self.complete_clues += correct == clue.length
+
+    def cells_changed(self, cells: Sequence[int], old: bytes, new: bytes) -> None:
+        solution = self.solution
+        clues_at = self.index.clues_at
+        answers = self._answers
+        correct = self._correct
+        for i, was, now in zip(cells, old, new):
+            if was == now:
+                continue
+            expected = solution[i]
+            if expected:
+                self.correct_cells += (now == expected) - (was == expected)
+            for entry in clues_at(i):
+                if entry is None:
+                    continue
+                clue_idx, pos = entry
+                answer = answers[clue_idx]
+                if not answer:
+                    continue
+                delta = (now == answer[pos]) - (was == answer[pos])
+                if delta:
+                    length = len(answer)
+                    if correct[clue_idx] == length:
+                        self.complete_clues -= 1
+                    correct[clue_idx] += delta
+                    if correct[clue_idx] == length:
+                        self.complete_clues += 1
+
+    def grid_replaced(self) -> None:
+        buffer = self.grid.buffer
+        solution = self.solution
+        self.correct_cells = sum(
+            1 for i, expected in enumerate(solution) if expected and buffer[i] == expected
+        )
+        self.complete_clues = 0
+        for clue_idx, answer in enumerate(self._answers):
+            if not answer:
+                continue
+            self._correct[clue_idx] = sum(
+                buffer[i] == expected for i, expected in zip(self.index.cells(clue_idx), answer)
+            )
+            self.complete_clues += self._correct[clue_idx] == len(answer)
+
+    def is_complete(self, clue_idx: int) -> bool:
+        answer = self._answers[clue_idx]
+        return bool(answer) and self._correct[clue_idx] == len(answer)
+
+    @property
+    def all_complete(self) -> bool:
+        return self.complete_clues == self.answer_clues
+
+    def progress(self) -> Progress:
+        return Progress(
+            correct_cells=self.correct_cells,
+            total_cells=self.solution_cells,
+            complete_clues=self.complete_clues,
+            total_clues=self.answer_clues,
+        )
@@ -0,0 +1,154 @@
+"""
+Vectorized slot and numbering extraction.
+
+A grid is described by a boolean (height, width) array of block squares and,
+optionally, a uint8 array of solution letters. Across runs are found from
+the row-wise difference of the padded open-square mask, down runs from the
+same on its transpose, so the work per grid is a few NumPy passes plus one
+slice per slot, whatever the grid size. Slots are numbered the standard way:
+every square that starts a slot gets the next number in reading order.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from .types import Direction
+from .exceptions import InvalidGridError
+
+ACROSS, DOWN = 0, 1
+
+_DIRECTIONS = (Direction.ACROSS, Direction.DOWN)
+
+# Block squares in .puz fill and solution strings
+PUZ_BLOCKS = b".:"
+
+
+class Slots(NamedTuple):
+    """
+    The slots of a grid, across ones first, each direction in reading order.
+
+    All fields are parallel arrays, except answers, which is None when no
+    solution was given.
+    """
+    direction: np.ndarray
+    number: np.ndarray
+    row: np.ndarray
+    col: np.ndarray
+    length: np.ndarray
+    answers: Optional[List[str]]
+
+    def __len__(self) -> int:
+        return len(self.direction)
+
+    def directions(self) -> List[Direction]:
+        return [_DIRECTIONS[d] for d in self.direction.tolist()]
+
+    def clue_order(self) -> np.ndarray:
+        """
+        Slot indices in .puz clue order: by starting square, across before down.
+        """
+        return np.lexsort((self.direction, self.col, self.row))
+
+
+def _runs(open_: np.ndarray, min_length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Rows, start columns and lengths of the horizontal runs of open squares"""
+    height, width = open_.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = open_
+    edges = np.diff(padded, axis=1)
+    # Starts and ends pair up in row-major order, as every run that starts in a row ends in it
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    lengths = ends - starts
+    keep = lengths >= min_length
+    return rows[keep], starts[keep], lengths[keep]
+
+
+def _answers(solution: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+             lengths: np.ndarray) -> List[str]:
+    # One contiguous buffer, so each answer is a single slice
+    width = solution.shape[1]
+    data = np.ascontiguousarray(solution).tobytes().decode("latin-1")
+    starts = (rows * width + cols).tolist()
+    return [data[start:start + length] for start, length in zip(starts, lengths.tolist())]
+
+
+def find_slots(blocks: np.ndarray, solution: Optional[np.ndarray] = None,
+               min_length: int = 2) -> Slots:
+    """
+    Find and number the slots of a grid.
+
+    Args:
+        blocks: Boolean (height, width) array, True for block squares
+        solution: Optional uint8 (height, width) array of latin-1 letter codes
+        min_length: Shortest run of open squares that counts as a slot
+    """
+    blocks = np.asarray(blocks, dtype=bool)
+    if blocks.ndim != 2:
+        raise InvalidGridError("Block mask must be two-dimensional")
+    if solution is not None and solution.shape != blocks.shape:
+        raise InvalidGridError("Solution and block mask shapes differ")
+    height, width = blocks.shape
+    open_ = ~blocks
+
+    a_rows, a_cols, a_lengths = _runs(open_, min_length)
+    # Down runs are across runs of the transpose, found in column-major order
+    d_cols, d_rows, d_lengths = _runs(open_.T, min_length)
+    order = np.argsort(d_rows * width + d_cols, kind="stable")
+    d_rows, d_cols, d_lengths = d_rows[order], d_cols[order], d_lengths[order]
+
+    starts = np.zeros(height * width, dtype=bool)
+    starts[a_rows * width + a_cols] = True
+    starts[d_rows * width + d_cols] = True
+    numbers = np.cumsum(starts, dtype=np.int64)
+
+    answers = None
+    if solution is not None:
+        answers = _answers(solution, a_rows, a_cols, a_lengths)
+        answers += _answers(solution.T, d_cols, d_rows, d_lengths)
+
+    return Slots(
+        direction=np.repeat(np.array([ACROSS, DOWN], dtype=np.int8), [len(a_rows), len(d_rows)]),
+        number=np.concatenate([numbers[a_rows * width + a_cols], numbers[d_rows * width + d_cols]]),
+        row=np.concatenate([a_rows, d_rows]),
+        col=np.concatenate([a_cols, d_cols]),
+        length=np.concatenate([a_lengths, d_lengths]),
+        answers=answers,
+    )
+
+
+def puz_arrays(fill: str, solution: str, width: int,
+               height: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Block mask and solution codes from the fill and solution strings of a .puz file"""
+    codes = np.frombuffer(solution.encode("latin-1"), dtype=np.uint8)
+    if codes.size != width * height or len(fill) != width * height:
+        raise InvalidGridError("Fill and solution must have width * height squares")
+    fill_codes = np.frombuffer(fill.encode("latin-1"), dtype=np.uint8)
+    blocks = np.isin(fill_codes, np.frombuffer(PUZ_BLOCKS, dtype=np.uint8))
+    return blocks.reshape(height, width), codes.reshape(height, width)
+
+
+def guardian_arrays(json_data: Dict) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Block mask and solution codes from Guardian crossword JSON.
+
+    Squares not covered by any entry are blocks. Entries without a solution
+    leave their squares as "-".
+    """
+    height = json_data["dimensions"]["rows"]
+    width = json_data["dimensions"]["cols"]
+    codes = np.zeros((height, width), dtype=np.uint8)
+    for entry in json_data["entries"]:
+        x, y, length = entry["position"]["x"], entry["position"]["y"], entry["length"]
+        letters = np.frombuffer(
+            entry.get("solution", "-" * length).upper().encode("latin-1", "replace"),
+            dtype=np.uint8,
+        )
+        if entry["direction"] == "down":
+            codes[y:y + length, x] = letters
+        else:
+            codes[y, x:x + length] = letters
+    blocks = codes == 0
+    codes[blocks] = ord(".")
+    return blocks, codes
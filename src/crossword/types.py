@@ -1,5 +1,6 @@
 from enum import Enum
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from pydantic import BaseModel, Field
 
 class Direction(str, Enum):
@@ -21,15 +22,49 @@ class Clue(BaseModel):
     answer: Optional[str] = None
     answered: bool = False
 
+    @property
+    def key(self) -> Tuple[int, "Direction"]:
+        """The (number, direction) pair identifying this clue within a puzzle"""
+        return (self.number, self.direction)
+
+    def __hash__(self) -> int:
+        # Equal clues share a key, so clues can be used as dict keys
+        return hash(self.key)
+
     def cells(self) -> List[Tuple[int, int]]:
         """Return list of (row, col) coordinates for this clue"""
-        cells = []
-        for i in range(self.length):
-            if self.direction == Direction.ACROSS:
-                cells.append((self.row, self.col + i))
-            else:
-                cells.append((self.row + i, self.col))
-        return cells
+        return list(_clue_cells(self.row, self.col, self.length, self.direction))
+
+@lru_cache(maxsize=65536)
+def _clue_cells(row: int, col: int, length: int, direction: Direction) -> Tuple[Tuple[int, int], ...]:
+    if direction == Direction.ACROSS:
+        return tuple((row, col + i) for i in range(length))
+    return tuple((row + i, col) for i in range(length))
+
+# A clue, or its integer handle (its index in CrosswordPuzzle.clues)
+ClueRef = Union[Clue, int]
+
+class Candidate(BaseModel):
+    """A possible answer for a clue, higher scores being more likely"""
+    word: str
+    score: float = 0.0
+
+class Crossing(NamedTuple):
+    """A clue crossing another clue: position in the first clue, the crossing clue and its position"""
+    position: int
+    clue: Clue
+    clue_position: int
+
+class Progress(BaseModel):
+    correct_cells: int
+    total_cells: int
+    complete_clues: int
+    total_clues: int
+
+    @property
+    def fraction(self) -> float:
+        """Fraction of cells with a known answer that are filled in correctly"""
+        return self.correct_cells / self.total_cells if self.total_cells else 1.0
 
 class Grid(BaseModel):
     width: int = Field(gt=0)
@@ -4,75 +4,209 @@ Utility functions for loading and manipulating crossword puzzles.
 You should not need to worry about this module. We use it to load CrosswordPuzzle instances from .puz files.
 """
 
+import glob
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from src.crossword.cache import PuzzleCache
 from src.crossword.crossword import CrosswordPuzzle
 from src.crossword.exceptions import InvalidClueError
-from src.crossword.types import Clue, Grid, Cell, Direction
+from src.crossword.types import Clue, Grid, Cell
+from src.crossword.grid import BLOCK_CODE, EMPTY_CODE, CompactGrid
+from src.crossword.slots import Slots, find_slots, puz_arrays
 import puz
 
-def load_puzzle(puz_file_path: str) -> CrosswordPuzzle:
-    """Load a puzzle from a .puz file."""
-    puzzle_file = puz.read(puz_file_path)
-    
-    # Initialize puzzle with dimensions
-    puzzle = CrosswordPuzzle(
-        width=puzzle_file.width,
-        height=puzzle_file.height
-    )
-    
-    # Update initial grid with puzzle file content
-    new_cells = [[Cell(row=r, col=c, value=None) 
-                    for c in range(puzzle.width)]
-                for r in range(puzzle.height)]
+def load_puzzle(puz_file_path: str, cache: Optional[PuzzleCache] = None,
+                trusted: bool = False) -> CrosswordPuzzle:
+    """
+    Load a puzzle from a .puz file.
+
+    With a cache, a file whose content was loaded before is read back from its
+    snapshot instead of being parsed. With trusted=True the puzzle is built
+    without pydantic validation, for files known to be well formed.
+    """
+    with open(puz_file_path, "rb") as f:
+        data = f.read()
+
+    parse = _parse_trusted_puzzle if trusted else _parse_puzzle
+    if cache is None:
+        return parse(data)
+
+    key = cache.key(data)
+    puzzle = cache.get(key)
+    if puzzle is None:
+        puzzle = parse(data)
+        cache.put(key, puzzle)
+    return puzzle
+
+def _puz_slots(puzzle_file: puz.Puzzle) -> Tuple[Slots, List[str]]:
+    """The slots of a .puz file and the clue text of each slot"""
+    slots = find_slots(*puz_arrays(
+        puzzle_file.fill, puzzle_file.solution, puzzle_file.width, puzzle_file.height
+    ))
+    if len(puzzle_file.clues) != len(slots):
+        raise InvalidClueError(
+            f"Puzzle has {len(puzzle_file.clues)} clues for {len(slots)} slots"
+        )
+    # .puz clues are listed by starting square, across before down
+    texts = [""] * len(slots)
+    for slot, text in zip(slots.clue_order().tolist(), puzzle_file.clues):
+        texts[slot] = text
+    return slots, texts
+
+def _parse_puzzle(data: bytes) -> CrosswordPuzzle:
+    """Build a puzzle from the raw content of a .puz file."""
+    puzzle_file = puz.load(data)
+    width = puzzle_file.width
+
+    # Initial grid from the puzzle file content
+    cells = [[Cell(row=r, col=c, value=None) 
+                for c in range(width)]
+            for r in range(puzzle_file.height)]
                 
     for i, c in enumerate(puzzle_file.fill):
-        row = i // puzzle.width
-        col = i % puzzle.width
-        new_cells[row][col].value = None if c == '-' else '░' if c == '.' else c
-
-    puzzle.grid_history[0] = Grid(
-        width=puzzle.width,
-        height=puzzle.height,
-        cells=new_cells
-    )
+        row = i // width
+        col = i % width
+        cells[row][col].value = None if c == '-' else '░' if c == '.' else c
 
-    numbering = puzzle_file.clue_numbering()
+    puzzle = CrosswordPuzzle(
+        width=width,
+        height=puzzle_file.height,
+        grid_history=[Grid(width=width, height=puzzle_file.height, cells=cells)]
+    )
 
-    # Add across clues with answers
-    for across in numbering.across:
-        row = across["cell"] // puzzle.width
-        col = across["cell"] % puzzle.width
-        answer = ''.join(puzzle_file.solution[across["cell"] + i] 
-                        for i in range(across["len"]))
-        try:
-            puzzle.add_clue(Clue(
-                number=len(puzzle.clues) + 1,
-                text=across["clue"],
-                direction=Direction.ACROSS,
-                length=across["len"],
-                row=row,
-                col=col,
-                answer=answer
-            ))
-        except InvalidClueError as e:
-            raise InvalidClueError(f"Invalid across clue: {e}")
-
-    # Add down clues with answers
-    for down in numbering.down:
-        row = down["cell"] // puzzle.width
-        col = down["cell"] % puzzle.width
-        answer = ''.join(puzzle_file.solution[down["cell"] + i * puzzle.width] 
-                        for i in range(down["len"]))
+    slots, texts = _puz_slots(puzzle_file)
+    for direction, row, col, length, answer, text in zip(
+        slots.directions(), slots.row.tolist(), slots.col.tolist(),
+        slots.length.tolist(), slots.answers, texts
+    ):
         try:
             puzzle.add_clue(Clue(
                 number=len(puzzle.clues) + 1,
-                text=down["clue"],
-                direction=Direction.DOWN,
-                length=down["len"],
+                text=text,
+                direction=direction,
+                length=length,
                 row=row,
                 col=col,
                 answer=answer
             ))
         except InvalidClueError as e:
-            raise InvalidClueError(f"Invalid down clue: {e}")
+            raise InvalidClueError(f"Invalid {direction.value} clue: {e}")
 
     return puzzle
+
+# .puz fill characters -> CompactGrid codes: '-' is an empty square, '.' a block
+_FILL_CODES = bytes.maketrans(b"-.", bytes([EMPTY_CODE, BLOCK_CODE]))
+
+def _parse_trusted_puzzle(data: bytes) -> CrosswordPuzzle:
+    """Build a puzzle from a .puz file without validating clues or cells."""
+    puzzle_file = puz.load(data)
+    width, height = puzzle_file.width, puzzle_file.height
+    grid = CompactGrid(width, height, bytearray(
+        puzzle_file.fill.encode("latin-1").translate(_FILL_CODES)
+    ))
+
+    slots, texts = _puz_slots(puzzle_file)
+    clues = [
+        Clue.model_construct(
+            number=number,
+            text=text,
+            direction=direction,
+            length=length,
+            row=row,
+            col=col,
+            answer=answer,
+            answered=False
+        )
+        for number, (direction, row, col, length, answer, text) in enumerate(zip(
+            slots.directions(), slots.row.tolist(), slots.col.tolist(),
+            slots.length.tolist(), slots.answers, texts
+        ), start=1)
+    ]
+
+    return CrosswordPuzzle.from_trusted(width, height, grid, clues)
+
+
+class LoadResult(NamedTuple):
+    """The outcome of loading one file with load_puzzles"""
+    path: str
+    puzzle: Optional[CrosswordPuzzle]
+    error: Optional[Exception]
+
+def _expand_paths(paths_or_glob: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Expand a glob, a directory or a list of paths into .puz file paths."""
+    if isinstance(paths_or_glob, (str, os.PathLike)):
+        paths_or_glob = [paths_or_glob]
+    for path in paths_or_glob:
+        path = os.fspath(path)
+        if os.path.isdir(path):
+            yield from sorted(glob.glob(os.path.join(path, "*.puz")))
+        elif glob.has_magic(path):
+            yield from sorted(glob.glob(path, recursive=True))
+        else:
+            yield path
+
+def _load_snapshot(path: str, cache: Optional[PuzzleCache]) -> bytes:
+    # Workers send back snapshots, which are far cheaper to pickle than models
+    return load_puzzle(path, cache=cache).to_bytes()
+
+def load_puzzles(paths_or_glob: Union[str, Iterable[str]],
+                 workers: Optional[int] = None,
+                 ordered: bool = False,
+                 max_in_flight: Optional[int] = None,
+                 cache: Optional[PuzzleCache] = None) -> Iterator[LoadResult]:
+    """
+    Load many .puz files in a process pool, yielding results as they complete.
+
+    Args:
+        paths_or_glob: A glob such as "data/**/*.puz", a directory, a path or a list of them
+        workers: Worker processes, defaulting to the CPU count. 1 loads in this process.
+        ordered: Yield results in input order instead of completion order
+        max_in_flight: Most files submitted but not yet yielded, defaulting to twice the workers
+        cache: Optional PuzzleCache shared by the workers
+
+    A file that fails to load yields a LoadResult with the error set instead of
+    stopping the batch.
+    """
+    paths = _expand_paths(paths_or_glob)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for path in paths:
+            try:
+                yield LoadResult(path, load_puzzle(path, cache=cache), None)
+            except Exception as e:
+                yield LoadResult(path, None, e)
+        return
+
+    max_in_flight = max_in_flight or 2 * workers
+
+    def result(path: str, future: Future) -> LoadResult:
+        try:
+            return LoadResult(path, CrosswordPuzzle.from_bytes(future.result()), None)
+        except Exception as e:
+            return LoadResult(path, None, e)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                path = next(paths, None)
+                if path is None:
+                    exhausted = True
+                else:
+                    pending.append((path, pool.submit(_load_snapshot, path, cache)))
+            if not pending:
+                return
+
+            if ordered:
+                path, future = pending.popleft()
+                yield result(path, future)
+            else:
+                done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                for path, future in [entry for entry in pending if entry[1] in done]:
+                    pending.remove((path, future))
+                    yield result(path, future)
@@ -304,6 +304,10 @@ def main() -> None:
         '-o', '--output-dir',
         help='Output directory for the puzzle file'
     )
+    parser.add_argument(
+        '-c', '--corpus',
+        help='Also add the clues and answers to this clue corpus database'
+    )
     
     args = parser.parse_args()
     
@@ -312,6 +316,11 @@ def main() -> None:
         crossword.fetch_crossword()
         crossword.process_crossword()
         crossword.save_puzzle(args.output_dir)
+        if args.corpus:
+            from src.solver.corpus import ClueCorpus
+            with ClueCorpus(args.corpus) as corpus:
+                added = corpus.add_guardian(crossword.json_data)
+            logger.info(f"Added {added} clues to {args.corpus}")
         
     except CrosswordFetchError as e:
         logger.error(f"Failed to fetch crossword: {str(e)}")
@@ -0,0 +1,178 @@
+"""
+Persistent cache of model answers to clues, in a SQLite file.
+
+Entries are keyed by model, prompt version, normalized clue text, answer
+length and the known-letter pattern given to the model, so the same clue
+asked again in another run or in another puzzle is answered without a
+request. Entries expire after a time to live, and the cache is kept under a
+maximum number of entries by evicting the least recently used ones. The
+entry count is kept in memory, so a put only touches the table beyond its
+own row when the cache is full or a periodic sweep for expired entries is due.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from pydantic import BaseModel
+from unidecode import unidecode
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    word TEXT NOT NULL,
+    raw TEXT,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_used ON answers (used);
+CREATE INDEX IF NOT EXISTS answers_created ON answers (created);
+"""
+
+# Seconds between sweeps for expired entries on put; get drops any it meets in between
+PURGE_INTERVAL = 60.0
+
+
+class CachedAnswer(BaseModel):
+    word: str
+    raw: Optional[str] = None
+
+
+class AnswerCacheStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def normalize_clue(text: str) -> str:
+    """ASCII, lowercase, punctuation dropped and whitespace collapsed: 'Café, au lait!' -> 'cafe au lait'"""
+    text = re.sub(r"[^\w\s]", " ", unidecode(text).lower())
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """A size-bounded LRU cache of clue answers with a time to live"""
+
+    def __init__(self, path: Union[str, Path], ttl: Optional[float] = None,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be positive")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._entries = len(self)
+        self._purged = time.time()
+
+    @staticmethod
+    def key(model: str, prompt_version: str, clue_text: str, length: int,
+            pattern: Optional[str] = None) -> str:
+        """
+        Cache key for a request.
+
+        Args:
+            model: Model or deployment name
+            prompt_version: Identifies the prompt template the model was given
+            clue_text: The clue, normalized here
+            length: Answer length
+            pattern: Known letters given to the model, such as C?T, if any
+        """
+        pattern = (pattern or "?" * length).upper()
+        fields = [model, prompt_version, normalize_clue(clue_text), length, pattern]
+        return hashlib.sha256(json.dumps(fields).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        now = time.time()
+        row = self._db.execute(
+            "SELECT word, raw, created FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        word, raw, created = row
+        if self.ttl is not None and now - created > self.ttl:
+            self._entries -= self._db.execute("DELETE FROM answers WHERE key = ?", (key,)).rowcount
+            self.misses += 1
+            return None
+        # Mark as recently used
+        self._db.execute("UPDATE answers SET used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return CachedAnswer(word=word, raw=raw)
+
+    def put(self, key: str, word: str, raw: Optional[str] = None) -> None:
+        now = time.time()
+        updated = self._db.execute(
+            "UPDATE answers SET word = ?, raw = ?, created = ?, used = ? WHERE key = ?",
+            (word, raw, now, now, key),
+        ).rowcount
+        if not updated:
+            self._db.execute(
+                "INSERT INTO answers (key, word, raw, created, used) VALUES (?, ?, ?, ?, ?)",
+                (key, word, raw, now, now),
+            )
+            self._entries += 1
+        if self.ttl is not None and now - self._purged > min(self.ttl, PURGE_INTERVAL):
+            self.purge()
+        if self._entries > self.max_entries:
+            self.evict()
+
+    def purge(self) -> None:
+        """Delete expired entries"""
+        if self.ttl is None:
+            return
+        self._purged = time.time()
+        self._entries -= self._db.execute(
+            "DELETE FROM answers WHERE created < ?", (self._purged - self.ttl,)
+        ).rowcount
+
+    def evict(self) -> None:
+        """
+        Delete expired entries, then least recently used ones until a tenth
+        of max_entries is free, so a full cache is not trimmed on every put.
+        """
+        self.purge()
+        # Recount, as other processes may share the file
+        self._entries = len(self)
+        excess = self._entries - (self.max_entries - self.max_entries // 10)
+        if excess > 0:
+            self._entries -= self._db.execute(
+                "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY used LIMIT ?)",
+                (excess,),
+            ).rowcount
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def stats(self) -> AnswerCacheStats:
+        return AnswerCacheStats(hits=self.hits, misses=self.misses, entries=len(self))
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM answers")
+        self._entries = 0
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "AnswerCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,440 @@
+"""
+Pluggable chat completion backends.
+
+The solver talks to a model only through CompletionRequest and Completion.
+A backend implements complete (blocking), acomplete (async) or both, and
+may also stream the text of a reply with astream:
+
+- ChatClientBackend adapts any OpenAI-style client, sync or async, such as
+  AzureOpenAI or AsyncAzureOpenAI; azure_backend builds one from the
+  environment.
+- StubBackend answers from the puzzles' own Clue.answer without any
+  network access, with configurable errors, wrong answers, latency and rate
+  limits, so the whole pipeline can be benchmarked offline. Every random
+  choice is seeded by the prompt, so a run is reproducible whatever order
+  concurrent requests arrive in.
+"""
+
+import asyncio
+import collections
+import json
+import os
+import random
+import re
+import string
+import threading
+import time
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Protocol, Tuple, runtime_checkable
+
+from pydantic import BaseModel, Field
+
+from src.crossword.crossword import CrosswordPuzzle
+from .answer_cache import normalize_clue
+
+
+class CompletionRequest(BaseModel):
+    model: str
+    messages: List[Dict[str, str]]
+    max_tokens: int = 50
+    temperature: float = 0.0
+    json_output: bool = False
+    # Higher goes first through a Scheduler; other backends ignore it
+    priority: float = 0.0
+
+    @property
+    def prompt(self) -> str:
+        """Text of the last message"""
+        return self.messages[-1]["content"] if self.messages else ""
+
+
+class Completion(BaseModel):
+    text: str
+    model: str = ""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class RateLimited(Exception):
+    """The backend refused a request for exceeding its rate limit"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackendError(Exception):
+    """A transient backend failure, worth retrying"""
+
+
+@runtime_checkable
+class Backend(Protocol):
+    def complete(self, request: CompletionRequest) -> Completion:
+        ...
+
+
+@runtime_checkable
+class AsyncBackend(Protocol):
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        ...
+
+
+@runtime_checkable
+class StreamingBackend(Protocol):
+    def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """The reply's text in chunks as it is generated; closing it early abandons the rest"""
+        ...
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for English text, about four characters a token"""
+    return len(text) // 4 + 1
+
+
+class ChatClientBackend:
+    """Adapts an OpenAI-style chat completions client, sync or async"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _kwargs(self, request: CompletionRequest) -> dict:
+        kwargs = dict(
+            model=request.model,
+            messages=request.messages,
+            max_tokens=request.max_tokens,
+            temperature=request.temperature,
+        )
+        if request.json_output:
+            kwargs["response_format"] = {"type": "json_object"}
+        return kwargs
+
+    @staticmethod
+    def _completion(response) -> Completion:
+        usage = getattr(response, "usage", None)
+        return Completion(
+            text=(response.choices[0].message.content or "").strip(),
+            model=getattr(response, "model", None) or "",
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        )
+
+    @staticmethod
+    def _translate(error: Exception) -> Exception:
+        """Map a client's rate limit error to RateLimited, honoring retry-after"""
+        if type(error).__name__ != "RateLimitError":
+            return error
+        retry_after = None
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after"))
+        except (TypeError, ValueError):
+            pass
+        return RateLimited(str(error), retry_after)
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        try:
+            return self._completion(self.client.chat.completions.create(**self._kwargs(request)))
+        except Exception as e:
+            translated = self._translate(e)
+            if translated is e:
+                raise
+            raise translated from e
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        try:
+            response = self.client.chat.completions.create(**self._kwargs(request))
+            if asyncio.iscoroutine(response):
+                response = await response
+            return self._completion(response)
+        except Exception as e:
+            translated = self._translate(e)
+            if translated is e:
+                raise
+            raise translated from e
+
+    @staticmethod
+    def _delta(chunk) -> str:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        return getattr(choices[0].delta, "content", None) or ""
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        try:
+            stream = self.client.chat.completions.create(**self._kwargs(request), stream=True)
+            if asyncio.iscoroutine(stream):
+                stream = await stream
+        except Exception as e:
+            translated = self._translate(e)
+            if translated is e:
+                raise
+            raise translated from e
+        try:
+            if hasattr(stream, "__aiter__"):
+                async for chunk in stream:
+                    if text := self._delta(chunk):
+                        yield text
+            else:
+                for chunk in stream:
+                    if text := self._delta(chunk):
+                        yield text
+        finally:
+            # Stops generation and frees the connection when closed early
+            close = getattr(stream, "close", None)
+            if close is not None:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+
+    async def aclose(self) -> None:
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+
+
+def azure_backend(asynchronous: bool = True, max_connections: Optional[int] = None) -> ChatClientBackend:
+    """
+    A backend over one Azure OpenAI client configured from the environment,
+    to be shared by every request so connections are pooled.
+    """
+    # Imported here so the rest of the solver works without the openai package
+    import httpx
+    from openai import AsyncAzureOpenAI, AzureOpenAI
+
+    http_client = None
+    if max_connections is not None:
+        limits = httpx.Limits(max_connections=max_connections,
+                              max_keepalive_connections=max_connections)
+        http_client = httpx.AsyncClient(limits=limits) if asynchronous else httpx.Client(limits=limits)
+    client_class = AsyncAzureOpenAI if asynchronous else AzureOpenAI
+    return ChatClientBackend(client_class(
+        api_version=os.getenv("OPENAI_API_VERSION"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        api_key=os.getenv("AZURE_OPENAI_API_KEY") or os.getenv("OPENAI_API_KEY"),
+        http_client=http_client,
+    ))
+
+
+class ThreadedBackend:
+    """Runs a blocking backend in worker threads so it can be awaited"""
+
+    def __init__(self, backend: Backend):
+        self.backend = backend
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        return self.backend.complete(request)
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        return await asyncio.to_thread(self.backend.complete, request)
+
+
+def as_async_backend(backend) -> AsyncBackend:
+    """An AsyncBackend for a backend or an OpenAI-style client"""
+    if isinstance(backend, AsyncBackend):
+        return backend
+    if hasattr(backend, "chat"):
+        return ChatClientBackend(backend)
+    if isinstance(backend, Backend):
+        return ThreadedBackend(backend)
+    raise TypeError(f"{type(backend).__name__} is not a backend or a chat completions client")
+
+
+async def aclose_backend(backend) -> None:
+    aclose = getattr(backend, "aclose", None)
+    if aclose is not None:
+        await aclose()
+
+
+class StubConfig(BaseModel):
+    seed: int = 0
+    # Chance a request fails with BackendError
+    error_rate: float = Field(default=0.0, ge=0, le=1)
+    # Chance a clue is answered with a wrong word of the right length
+    noise: float = Field(default=0.0, ge=0, le=1)
+    # Candidates returned per clue in JSON replies: the answer first, or ranked lower if noisy
+    candidates: int = Field(default=3, gt=0)
+    # Latency is lognormal with this median in seconds and log-space spread
+    latency: float = Field(default=0.0, ge=0)
+    latency_sigma: float = Field(default=0.0, ge=0)
+    requests_per_minute: Optional[int] = Field(default=None, gt=0)
+    tokens_per_minute: Optional[int] = Field(default=None, gt=0)
+    # noise and latency for requests to particular models, to stand in for cheaper tiers
+    noise_by_model: Dict[str, float] = {}
+    latency_by_model: Dict[str, float] = {}
+
+
+class StubStats(BaseModel):
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    clues: int = 0
+    noisy: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+# A clue in a batch prompt:
+# "<id>. <number> <direction>, <length> letters, pattern <pattern>[, not <words>]: <text>"
+_BATCH_LINE = re.compile(
+    r"^(\d+)\. \d+ \w+, (\d+) letters, pattern (\S+)(?:, not [^:]*)?: (.*)$", re.MULTILINE
+)
+# A single-clue prompt: "Give the <length>-letter answer for this crossword clue: '<text>'",
+# or any SolverConfig.clue_template with the length before the quoted text and possibly more
+# after it, optionally followed by "It fits the pattern <pattern>, ..."
+_SINGLE = re.compile(r"(\d+)-letter[^\n]*?'(.*)'")
+_SINGLE_PATTERN = re.compile(r"pattern (\S+),")
+_SINGLE_CANDIDATES = re.compile(r"Give up to (\d+) candidates")
+
+
+class StubBackend:
+    """
+    An offline backend answering from the puzzles' own answers.
+
+    Understands the single-clue prompt of pipeline.clue_prompt and the batch
+    prompt of batching.batch_prompt; JSON requests are answered in the
+    batch reply format.
+    """
+
+    def __init__(self, puzzles: Iterable[CrosswordPuzzle], config: Optional[StubConfig] = None,
+                 **overrides):
+        self.config = (config or StubConfig()).model_copy(update=overrides)
+        self.stats = StubStats()
+        self._answers: Dict[Tuple[str, int], str] = {}
+        for puzzle in ([puzzles] if isinstance(puzzles, CrosswordPuzzle) else puzzles):
+            for clue in puzzle.clues:
+                if clue.answer:
+                    self._answers.setdefault((normalize_clue(clue.text), clue.length), clue.answer.upper())
+        self._attempts: Dict[str, int] = collections.Counter()
+        self._window: Deque[Tuple[float, int]] = collections.deque()
+        self._lock = threading.Lock()
+
+    def answer(self, text: str, length: int) -> Optional[str]:
+        return self._answers.get((normalize_clue(text), length))
+
+    def _rng(self, request: CompletionRequest) -> random.Random:
+        # Seeded by the model, the prompt and how often it was sent, not by arrival order
+        key = f"{request.model}:{request.prompt}"
+        with self._lock:
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+        return random.Random(f"{self.config.seed}:{attempt}:{key}")
+
+    def _admit(self, tokens: int) -> None:
+        """Raise RateLimited if the request would exceed the per-minute limits"""
+        config = self.config
+        if config.requests_per_minute is None and config.tokens_per_minute is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] >= 60:
+                self._window.popleft()
+            used = sum(t for _, t in self._window)
+            if ((config.requests_per_minute is not None and len(self._window) >= config.requests_per_minute)
+                    or (config.tokens_per_minute is not None and used + tokens > config.tokens_per_minute)):
+                self.stats.rate_limited += 1
+                retry_after = 60 - (now - self._window[0][0]) if self._window else 60.0
+                raise RateLimited("Stub rate limit exceeded", retry_after=retry_after)
+            self._window.append((now, tokens))
+
+    @staticmethod
+    def _random_word(rng: random.Random, length: int, pattern: Optional[str]) -> str:
+        """Random letters, keeping the known letters of a pattern"""
+        pattern = pattern if pattern and len(pattern) == length else "?" * length
+        return "".join(
+            char if char.isalpha() else rng.choice(string.ascii_uppercase) for char in pattern
+        )
+
+    def _word(self, rng: random.Random, answer: Optional[str], length: int,
+              pattern: Optional[str], noise: float) -> str:
+        noisy = answer is None or rng.random() < noise
+        with self._lock:
+            self.stats.clues += 1
+            self.stats.noisy += noisy
+        if noisy:
+            return self._random_word(rng, length, pattern)
+        return answer
+
+    def _ranked(self, rng: random.Random, answer: Optional[str], length: int,
+                pattern: Optional[str], noise: float, count: int) -> List[str]:
+        """count words, best first: the answer, unless noisy, when a wrong word precedes it"""
+        best = self._word(rng, answer, length, pattern, noise)
+        words = [best] + [self._random_word(rng, length, pattern) for _ in range(count - 1)]
+        if answer is not None and best != answer and count > 1:
+            words[rng.randrange(1, count)] = answer
+        return words
+
+    def _reply(self, rng: random.Random, request: CompletionRequest) -> str:
+        prompt = request.prompt
+        noise = self.config.noise_by_model.get(request.model, self.config.noise)
+        lines = _BATCH_LINE.findall(prompt)
+        if lines or request.json_output:
+            answers = []
+            for clue_id, length, pattern, text in lines:
+                length = int(length)
+                words = self._ranked(rng, self.answer(text, length), length, pattern, noise,
+                                     self.config.candidates)
+                answers.append({"id": int(clue_id), "candidates": words})
+            return json.dumps({"answers": answers})
+
+        match = _SINGLE.search(prompt)
+        if match is None:
+            return "I don't know."
+        length, text = int(match.group(1)), match.group(2)
+        pattern = _SINGLE_PATTERN.search(prompt)
+        pattern = pattern and pattern.group(1)
+        wanted = _SINGLE_CANDIDATES.search(prompt)
+        if wanted is None:
+            word = self._word(rng, self.answer(text, length), length, pattern, noise)
+            return f"The answer is '{word}'."
+        words = self._ranked(rng, self.answer(text, length), length, pattern, noise, int(wanted.group(1)))
+        return "\n".join(f"{rank}. {word}" for rank, word in enumerate(words, 1))
+
+    def _prepare(self, request: CompletionRequest) -> Tuple[random.Random, float, int]:
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in request.messages)
+        self._admit(prompt_tokens + request.max_tokens)
+        rng = self._rng(request)
+        delay = 0.0
+        latency = self.config.latency_by_model.get(request.model, self.config.latency)
+        if latency:
+            delay = latency * rng.lognormvariate(0, self.config.latency_sigma)
+        return rng, delay, prompt_tokens
+
+    def _text(self, rng: random.Random, request: CompletionRequest, prompt_tokens: int) -> str:
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.prompt_tokens += prompt_tokens
+        if rng.random() < self.config.error_rate:
+            with self._lock:
+                self.stats.errors += 1
+            raise BackendError("Stub backend error")
+        return self._reply(rng, request)
+
+    def _finish(self, rng: random.Random, request: CompletionRequest, prompt_tokens: int) -> Completion:
+        text = self._text(rng, request, prompt_tokens)
+        completion_tokens = estimate_tokens(text)
+        with self._lock:
+            self.stats.completion_tokens += completion_tokens
+        return Completion(text=text, model=request.model,
+                          prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def complete(self, request: CompletionRequest) -> Completion:
+        rng, delay, prompt_tokens = self._prepare(request)
+        time.sleep(delay)
+        return self._finish(rng, request, prompt_tokens)
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        rng, delay, prompt_tokens = self._prepare(request)
+        await asyncio.sleep(delay)
+        return self._finish(rng, request, prompt_tokens)
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """The reply four characters, about a token, at a time, with the latency spread across them"""
+        rng, delay, prompt_tokens = self._prepare(request)
+        text = self._text(rng, request, prompt_tokens)
+        chunks = [text[i:i + 4] for i in range(0, len(text), 4)]
+        for chunk in chunks:
+            await asyncio.sleep(delay / len(chunks))
+            with self._lock:
+                self.stats.completion_tokens += 1
+            yield chunk
@@ -0,0 +1,290 @@
+"""
+Batched multi-clue requests with structured JSON output.
+
+Instead of one request per clue, clues are packed into requests that list
+each clue's id, number, direction, length and current letter pattern, and
+ask for a JSON object of ranked candidates per clue. Batches are sized by an
+estimated token budget for both the prompt and the reply. A batch whose
+reply cannot be used at all is split in half and retried; clues still
+missing or invalid after that fall back to single-clue requests.
+"""
+
+import asyncio
+import json
+import re
+import time
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import Candidate, ClueRef
+from .backends import estimate_tokens
+from .patterns import pattern_from_chars
+from .pipeline import (
+    ClueQuery, ClueResult, ClueSolver, SolverConfig, constrainedness, rank_candidates,
+)
+
+BATCH_SYSTEM_PROMPT = (
+    "You are a crossword puzzle solver. Reply with a JSON object only, of the form "
+    '{"answers": [{"id": <clue id>, "candidates": ["BEST", "NEXT", ...]}]}. '
+    "Give up to the requested number of candidates per clue, best first, each exactly "
+    "the clue's length and matching its pattern, where ? is an unknown letter."
+)
+
+# Bump whenever batch_prompt or BATCH_SYSTEM_PROMPT changes
+BATCH_PROMPT_VERSION = "1"
+
+
+class BatchConfig(BaseModel):
+    max_prompt_tokens: int = Field(default=1500, gt=0)
+    max_output_tokens: int = Field(default=2000, gt=0)
+    max_clues: int = Field(default=40, gt=0)
+    candidates: int = Field(default=3, gt=0)
+    # Batches this small are not split further when their reply is unusable
+    min_split: int = Field(default=4, gt=0)
+
+
+def _line(query: ClueQuery) -> str:
+    """A query as it appears in a batch request"""
+    clue = query.clue
+    line = (f"{query.handle}. {clue.number} {clue.direction.value}, "
+            f"{clue.length} letters, pattern {query.pattern or '?' * clue.length}")
+    if query.avoid:
+        line += f", not {' '.join(query.avoid)}"
+    return f"{line}: {clue.text}"
+
+
+def _output_tokens(entry: ClueQuery, candidates: int) -> int:
+    # Each candidate is a quoted word and a comma, plus the id and keys per clue
+    return candidates * (entry.clue.length // 3 + 3) + 12
+
+
+def plan_batches(entries: Sequence[ClueQuery], config: BatchConfig) -> List[List[ClueQuery]]:
+    """Greedily pack entries, in order, into batches within the token budgets"""
+    base = estimate_tokens(BATCH_SYSTEM_PROMPT) + estimate_tokens(_header(config))
+    batches: List[List[ClueQuery]] = []
+    batch: List[ClueQuery] = []
+    prompt_tokens, output_tokens = base, 0
+    for entry in entries:
+        entry_prompt = estimate_tokens(_line(entry))
+        entry_output = _output_tokens(entry, config.candidates)
+        if batch and (
+            len(batch) >= config.max_clues
+            or prompt_tokens + entry_prompt > config.max_prompt_tokens
+            or output_tokens + entry_output > config.max_output_tokens
+        ):
+            batches.append(batch)
+            batch, prompt_tokens, output_tokens = [], base, 0
+        batch.append(entry)
+        prompt_tokens += entry_prompt
+        output_tokens += entry_output
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _header(config: BatchConfig) -> str:
+    return f"Solve these crossword clues, giving up to {config.candidates} candidates each:"
+
+
+def batch_prompt(entries: Sequence[ClueQuery], config: BatchConfig) -> str:
+    return "\n".join([_header(config)] + [_line(entry) for entry in entries])
+
+
+def _json_object(text: str):
+    """The JSON value in a reply, ignoring code fences and surrounding prose"""
+    text = re.sub(r"^```(?:json)?|```$", "", text.strip(), flags=re.MULTILINE).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        raise ValueError("No JSON object in reply")
+    return json.loads(text[start:end + 1])
+
+
+def parse_batch_response(text: str, entries: Sequence[ClueQuery]) -> Dict[int, List[Candidate]]:
+    """
+    Ranked candidates per handle from a batch reply.
+
+    Candidates of the wrong length, that contradict the clue's pattern or
+    that were ruled out are dropped, and so are clues left without any. Accepts the requested
+    {"answers": [...]} form as well as a bare list or an {id: candidates} map.
+    Raises ValueError if the reply holds no JSON at all.
+    """
+    data = _json_object(text)
+    if isinstance(data, dict) and "answers" in data:
+        data = data["answers"]
+    if isinstance(data, dict):
+        items = [{"id": key, "candidates": value} for key, value in data.items()]
+    elif isinstance(data, list):
+        items = [item for item in data if isinstance(item, dict)]
+    else:
+        raise ValueError("Reply JSON is not an object or a list")
+
+    by_handle = {entry.handle: entry for entry in entries}
+    parsed: Dict[int, List[Candidate]] = {}
+    for item in items:
+        try:
+            handle = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        entry = by_handle.get(handle)
+        words = item.get("candidates", item.get("answer"))
+        if entry is None or words is None:
+            continue
+        if isinstance(words, str):
+            words = [words]
+
+        candidates = rank_candidates(
+            [[word for word in words if isinstance(word, str)]],
+            entry.clue.length, entry.pattern, entry.avoid,
+        )
+        if candidates:
+            parsed[handle] = candidates
+    return parsed
+
+
+def batch_entries(puzzle: CrosswordPuzzle,
+                  clues: Optional[Iterable[ClueRef]] = None) -> List[ClueQuery]:
+    """Queries for clues of a puzzle, with their current patterns from the grid"""
+    handles = range(len(puzzle.clues)) if clues is None else [puzzle.handle(c) for c in clues]
+    entries = []
+    for handle in handles:
+        pattern = pattern_from_chars(puzzle.get_current_clue_chars(handle))
+        entries.append(ClueQuery(
+            handle=handle,
+            clue=puzzle.clues[handle],
+            pattern=pattern,
+            priority=constrainedness(puzzle, handle, pattern),
+        ))
+    return entries
+
+
+def _cached_candidates(raw: Optional[str], word: str, entry: ClueQuery) -> List[Candidate]:
+    """Ranked candidates from a cached JSON list of words, or the word alone for older entries"""
+    try:
+        words = json.loads(raw or "")
+    except ValueError:
+        words = None
+    if not isinstance(words, list):
+        words = [word]
+    return rank_candidates([[w for w in words if isinstance(w, str)]],
+                           entry.clue.length, entry.pattern, entry.avoid)
+
+
+class BatchSolver(ClueSolver):
+    """A ClueSolver that sends many clues per request"""
+
+    def __init__(self, backend, config: Optional[SolverConfig] = None, cache=None,
+                 batch_config: Optional[BatchConfig] = None, corpus=None):
+        super().__init__(backend, config, cache, corpus)
+        self.batch_config = batch_config or BatchConfig()
+        # Clues that fell back to single-clue requests
+        self.fallbacks = 0
+
+    def _batch_cache_key(self, entry: ClueQuery) -> Optional[str]:
+        if self.cache is None or entry.avoid:
+            return None
+        return self.cache.key(
+            self.config.model, f"batch-{BATCH_PROMPT_VERSION}",
+            entry.clue.text, entry.clue.length, entry.known_pattern
+        )
+
+    async def _solve_batch(self, batch: List[ClueQuery]) -> List[ClueResult]:
+        """Results for every entry of a batch, splitting and falling back as needed"""
+        start = time.perf_counter()
+        raw = None
+        parsed: Dict[int, List[Candidate]] = {}
+        try:
+            raw = await self.request(
+                batch_prompt(batch, self.batch_config),
+                system_prompt=BATCH_SYSTEM_PROMPT,
+                max_tokens=self.batch_config.max_output_tokens,
+                json_output=True,
+                # A batch goes as early as its most constrained clue
+                priority=max(entry.priority for entry in batch),
+            )
+            parsed = parse_batch_response(raw, batch)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+
+        if not parsed and len(batch) > self.batch_config.min_split:
+            # Likely truncated or malformed because it was too long: retry smaller
+            middle = len(batch) // 2
+            halves = await asyncio.gather(
+                self._solve_batch(batch[:middle]), self._solve_batch(batch[middle:])
+            )
+            return halves[0] + halves[1]
+
+        elapsed = time.perf_counter() - start
+        results = []
+        missing = []
+        for entry in batch:
+            candidates = parsed.get(entry.handle)
+            if candidates is None:
+                missing.append(entry)
+                continue
+            key = self._batch_cache_key(entry)
+            if key is not None:
+                # The clue's own ranked words, as the batch reply is keyed by this call's handles
+                self.cache.put(key, candidates[0].word, json.dumps([c.word for c in candidates]))
+            results.append(ClueResult(
+                handle=entry.handle, word=candidates[0].word, raw=raw,
+                candidates=candidates, elapsed=elapsed
+            ))
+
+        self.fallbacks += len(missing)
+        results += await asyncio.gather(*(
+            self.solve_query(entry) for entry in missing
+        ))
+        return results
+
+    def _cached(self, entries: List[ClueQuery]) -> Tuple[List[ClueResult], List[ClueQuery]]:
+        hits, misses = [], []
+        for entry in entries:
+            known = self._from_corpus(entry)
+            if known is not None:
+                hits.append(known)
+                continue
+            key = self._batch_cache_key(entry)
+            cached = self.cache.get(key) if key is not None else None
+            candidates = _cached_candidates(cached.raw, cached.word, entry) if cached else []
+            if not candidates:
+                misses.append(entry)
+            else:
+                hits.append(ClueResult(handle=entry.handle, word=candidates[0].word, raw=cached.raw,
+                                       cached=True, candidates=candidates))
+        return hits, misses
+
+    def puzzle_queries(self, puzzle: CrosswordPuzzle,
+                       clues: Optional[Iterable[ClueRef]] = None) -> List[ClueQuery]:
+        """Queries with patterns taken from the grid when the call is made"""
+        return batch_entries(puzzle, clues)
+
+    async def solve_queries(self, queries: Iterable[ClueQuery]) -> AsyncIterator[ClueResult]:
+        """
+        Solve queries in batches, yielding each batch's results as it
+        completes. Higher priority queries are batched and sent first.
+        """
+        hits, entries = self._cached(list(queries))
+        for result in hits:
+            yield result
+        entries.sort(key=lambda entry: -entry.priority)
+
+        tasks = [
+            asyncio.ensure_future(self._solve_batch(batch))
+            for batch in plan_batches(entries, self.batch_config)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                for result in await next_done:
+                    yield result
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
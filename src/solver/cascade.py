@@ -0,0 +1,218 @@
+"""
+Tiered solving: a cheap, fast model first, escalating only doubtful clues.
+
+The first tier answers every clue. Each answer is then given a confidence
+from how strongly the model preferred it over its other candidates and how
+many crossing answers agree with it. Missing answers and those below the
+threshold are asked again of the next, larger tier, with the letters of
+the accepted crossings as a pattern. So is one side of each pair of
+crossing answers that disagree: as in refine, the side with more
+disagreements and less support. The last tier's answers are kept whatever
+their confidence. Per-tier statistics record how many clues each tier
+settled and what it cost.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import ClueRef
+from .answer_cache import AnswerCache
+from .batching import BatchSolver
+from .corpus import ClueCorpus
+from .pipeline import (
+    ClueQuery, ClueResult, ClueSolver, SolverConfig, apply_result, constrainedness, run_blocking,
+)
+from .refine import Refiner, cover_disagreements, crossing_handles, disagreements
+
+
+def default_models() -> List[str]:
+    """The fast deployment, then the default one"""
+    return [
+        os.getenv("AZURE_FAST_DEPLOYMENT_NAME", "gpt-4o-mini"),
+        os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"),
+    ]
+
+
+class TierStats(BaseModel):
+    model: str
+    # Clues asked of this tier, and how many of its answers were accepted or escalated
+    clues: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    failed: int = 0
+    requests: int = 0
+    # Wall time of the tier, and the sum of its per-clue latencies
+    seconds: float = 0.0
+    latency: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.accepted / self.clues if self.clues else 0.0
+
+    @property
+    def mean_latency(self) -> float:
+        return self.latency / self.clues if self.clues else 0.0
+
+
+class CascadeResult(BaseModel):
+    # The answer kept for each clue, and the tier that gave it
+    results: Dict[int, ClueResult]
+    tier: Dict[int, int]
+    confidence: Dict[int, float]
+    tiers: List[TierStats]
+
+    @property
+    def answers(self) -> Dict[int, str]:
+        return {handle: result.word for handle, result in self.results.items() if result.ok}
+
+
+def agreement(result: ClueResult) -> float:
+    """
+    The share of the candidate scores held by the best candidate: 1 for a
+    lone candidate, 0.5 when the reply gave no candidate list.
+    """
+    if not result.candidates:
+        return 0.5
+    return result.candidates[0].score / sum(c.score for c in result.candidates)
+
+
+def support(handle: int, answers: Mapping[int, str],
+            crossings: List[Tuple[int, int, int]]) -> Tuple[float, int]:
+    """
+    The share of answered crossings that agree with a clue's answer, 0.5 when
+    none are answered, and the number that disagree.
+    """
+    answer = answers[handle]
+    agree = disagree = 0
+    for pos, other, other_pos in crossings:
+        other_answer = answers.get(other)
+        if other_answer is None:
+            continue
+        if other_answer[other_pos] == answer[pos]:
+            agree += 1
+        else:
+            disagree += 1
+    if not agree + disagree:
+        return 0.5, 0
+    return agree / (agree + disagree), disagree
+
+
+class Cascade:
+    """Solvers from cheapest to most capable, each asked only what the previous doubted"""
+
+    def __init__(self, solvers: Sequence[ClueSolver], threshold: float = 0.6):
+        if not solvers:
+            raise ValueError("A cascade needs at least one solver")
+        self.solvers = list(solvers)
+        self.threshold = threshold
+
+    @classmethod
+    def from_models(cls, backend, models: Optional[Sequence[str]] = None,
+                    config: Optional[SolverConfig] = None, cache: Optional[AnswerCache] = None,
+                    batch: bool = False, threshold: float = 0.6,
+                    corpus: Optional[ClueCorpus] = None) -> "Cascade":
+        """A solver per model, sharing a backend and corpus, defaulting to default_models()"""
+        config = config or SolverConfig()
+        solver = BatchSolver if batch else ClueSolver
+        return cls([
+            solver(backend, config.model_copy(update={"model": model}), cache, corpus=corpus)
+            for model in models or default_models()
+        ], threshold)
+
+    def confidence(self, result: ClueResult, answers: Mapping[int, str],
+                   crossings: List[Tuple[int, int, int]]) -> float:
+        """An answer's confidence, the mean of its agreement and support"""
+        share, _ = support(result.handle, answers, crossings)
+        return (agreement(result) + share) / 2
+
+    async def solve_puzzle(self, puzzle: CrosswordPuzzle,
+                           clues: Optional[Iterable[ClueRef]] = None,
+                           on_result: Optional[Callable[[ClueResult], Optional[Awaitable[None]]]] = None
+                           ) -> CascadeResult:
+        """
+        Solve clues tier by tier, writing each answer into the puzzle as it arrives.
+
+        Args:
+            puzzle: The puzzle to solve
+            clues: Clues or handles to solve, defaulting to every clue
+            on_result: Called with each result of every tier, possibly a coroutine
+        """
+        handles = list(range(len(puzzle.clues)) if clues is None else [puzzle.handle(c) for c in clues])
+        crossings = crossing_handles(puzzle)
+        results: Dict[int, ClueResult] = {}
+        tier: Dict[int, int] = {}
+        confidence: Dict[int, float] = {}
+        tiers = []
+        pending: List[ClueQuery] = []
+
+        for level, solver in enumerate(self.solvers):
+            stats = TierStats(model=solver.config.model)
+            tiers.append(stats)
+            start, requests = time.perf_counter(), solver.requests
+            # The first tier builds its own queries; later ones get patterns from accepted answers
+            stream = solver.solve_stream(puzzle, handles) if level == 0 else solver.solve_queries(pending)
+            asked = []
+            try:
+                async for result in stream:
+                    asked.append(result.handle)
+                    stats.clues += 1
+                    stats.latency += result.elapsed
+                    apply_result(puzzle, result)
+                    if result.ok:
+                        results[result.handle] = result
+                        tier[result.handle] = level
+                    else:
+                        stats.failed += 1
+                        results.setdefault(result.handle, result)
+                    if on_result is not None:
+                        callback = on_result(result)
+                        if asyncio.iscoroutine(callback):
+                            await callback
+            finally:
+                await stream.aclose()
+            stats.seconds = time.perf_counter() - start
+            stats.requests = solver.requests - requests
+
+            answers = {handle: result.word for handle, result in results.items() if result.ok}
+            pairs, agreeing = disagreements(answers, crossings, asked)
+            doubtful = cover_disagreements(pairs, agreeing) & set(asked)
+            # The other side of a disagreement is judged without the answer it lost to
+            trusted = {handle: word for handle, word in answers.items() if handle not in doubtful}
+            for handle in asked:
+                if handle not in answers:
+                    doubtful.add(handle)
+                    continue
+                confidence[handle] = self.confidence(
+                    results[handle], trusted if handle in trusted else answers, crossings[handle]
+                )
+                if confidence[handle] < self.threshold:
+                    doubtful.add(handle)
+            stats.accepted = len(asked) - len(doubtful)
+
+            if level == len(self.solvers) - 1 or not doubtful:
+                break
+            stats.escalated = len(doubtful)
+            pending = []
+            for handle in sorted(doubtful):
+                pattern = Refiner.pattern(puzzle, handle, answers, crossings[handle], doubtful)
+                pending.append(ClueQuery(
+                    handle=handle, clue=puzzle.clues[handle], pattern=pattern,
+                    priority=constrainedness(puzzle, handle, pattern),
+                ))
+
+        return CascadeResult(results=results, tier=tier, confidence=confidence, tiers=tiers)
+
+
+def solve_cascade(puzzle: CrosswordPuzzle, backend=None, models: Optional[Sequence[str]] = None,
+                  config: Optional[SolverConfig] = None, cache: Optional[AnswerCache] = None,
+                  batch: bool = False, threshold: float = 0.6, corpus: Optional[ClueCorpus] = None,
+                  **kwargs) -> CascadeResult:
+    """Blocking wrapper around Cascade.solve_puzzle for scripts, through run_blocking"""
+    return run_blocking(backend, lambda shared: Cascade.from_models(
+        shared, models, config, cache, batch, threshold, corpus
+    ).solve_puzzle(puzzle, **kwargs))
@@ -0,0 +1,207 @@
+"""
+Local corpus of clues and answers from solved puzzles, in a SQLite file.
+
+Clue/answer pairs are ingested from Guardian crossword JSON, as fetched by
+src/download.py, and from .puz files or puzzles with answers. Each pair is
+stored once with a count of how often it was seen. Clues can be looked up by
+exact text, by normalized text (case, accents, punctuation and a trailing
+enumeration such as "(3,4)" ignored) with the answer length and known
+letters, and answers by length and pattern alone. Solvers given a corpus
+consult it before sending a clue to a model.
+
+Ingest from the command line with:
+
+    python -m src.solver.corpus corpus.db data/*.puz guardian/*.json
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import Candidate
+from .answer_cache import normalize_clue
+from .patterns import WILDCARDS, normalize_word
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clues (
+    text TEXT NOT NULL,
+    normalized TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    answer TEXT NOT NULL,
+    source TEXT,
+    seen INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (text, answer)
+);
+CREATE INDEX IF NOT EXISTS clues_normalized ON clues (normalized, length);
+CREATE INDEX IF NOT EXISTS clues_answers ON clues (length, answer);
+"""
+
+# A trailing enumeration such as (5), (3,4) or (5-3)
+_ENUMERATION = re.compile(r"\s*\(\s*\d+(?:\s*[,\-]\s*\d+)*\s*\)\s*$")
+# Guardian entries continuing another, such as "See 12 across"
+_SEE = re.compile(r"^see \d+")
+
+
+class CorpusStats(BaseModel):
+    hits: int
+    misses: int
+    entries: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def corpus_text(text: str) -> str:
+    """normalize_clue, with any trailing enumeration dropped first"""
+    return normalize_clue(_ENUMERATION.sub("", text))
+
+
+def _glob(pattern: str) -> str:
+    """A pattern such as C?T as a SQLite GLOB, escaping nothing since answers are letters"""
+    return "".join("?" if char in WILDCARDS else char.upper() for char in pattern)
+
+
+class ClueCorpus:
+    """Clue/answer pairs from solved puzzles, indexed for lookup by clue and by pattern"""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def add_pairs(self, pairs: Iterable[Tuple[str, str]], source: Optional[str] = None) -> int:
+        """
+        Add (clue text, answer) pairs in one transaction, counting repeats, and
+        return how many were added. Answers are uppercased and stripped of
+        anything but letters; pairs left without text or answer are skipped.
+        """
+        rows = []
+        for text, answer in pairs:
+            text, answer = text.strip(), normalize_word(answer or "")
+            normalized = corpus_text(text)
+            if normalized and answer and not _SEE.match(normalized):
+                rows.append((text, normalized, len(answer), answer, source))
+        self._db.execute("BEGIN")
+        try:
+            self._db.executemany(
+                "INSERT INTO clues (text, normalized, length, answer, source) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (text, answer) DO UPDATE SET seen = seen + 1",
+                rows,
+            )
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+        return len(rows)
+
+    def add(self, text: str, answer: str, source: Optional[str] = None) -> int:
+        return self.add_pairs([(text, answer)], source)
+
+    def add_puzzle(self, puzzle: CrosswordPuzzle, source: Optional[str] = None) -> int:
+        """Add every clue of a puzzle that has an answer"""
+        return self.add_pairs(((clue.text, clue.answer) for clue in puzzle.clues if clue.answer), source)
+
+    def add_guardian(self, json_data: Dict) -> int:
+        """Add the solved entries of a Guardian crossword, as GuardianCrossword.json_data"""
+        source = json_data.get("id") or json_data.get("name")
+        return self.add_pairs(
+            ((entry.get("clue", ""), entry.get("solution")) for entry in json_data.get("entries", [])),
+            source,
+        )
+
+    def add_file(self, path: Union[str, Path]) -> int:
+        """Add a .puz file, or a .json file of Guardian crossword data"""
+        path = Path(path)
+        if path.suffix.lower() == ".json":
+            return self.add_guardian(json.loads(path.read_text(encoding="utf-8")))
+        # Imported here as the loader pulls in the .puz parser
+        from src.crossword.utils import load_puzzle
+        return self.add_puzzle(load_puzzle(str(path), trusted=True), source=path.name)
+
+    def exact(self, text: str) -> List[Candidate]:
+        """Answers given to exactly this clue text, most often seen first, scored by share"""
+        rows = self._db.execute(
+            "SELECT answer, seen FROM clues WHERE text = ? ORDER BY seen DESC, answer", (text.strip(),)
+        ).fetchall()
+        return self._ranked(rows)
+
+    def lookup(self, text: str, length: int, pattern: Optional[str] = None,
+               avoid: Sequence[str] = ()) -> List[Candidate]:
+        """
+        Answers of the given length to clues with the same normalized text,
+        fitting the pattern and not ruled out, most often seen first and
+        scored by their share of sightings. Counts as a hit or a miss.
+        """
+        query = "SELECT answer, SUM(seen) FROM clues WHERE normalized = ? AND length = ?"
+        params: list = [corpus_text(text), length]
+        if pattern is not None and len(pattern) == length:
+            query += " AND answer GLOB ?"
+            params.append(_glob(pattern))
+        query += " GROUP BY answer ORDER BY SUM(seen) DESC, answer"
+        avoid = {normalize_word(word) for word in avoid}
+        rows = [row for row in self._db.execute(query, params).fetchall() if row[0] not in avoid]
+        if rows:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return self._ranked(rows)
+
+    def words(self, length: int, pattern: Optional[str] = None,
+              limit: Optional[int] = None) -> List[Candidate]:
+        """Known answers of a length fitting a pattern, most often seen first"""
+        query = "SELECT answer, SUM(seen) FROM clues WHERE length = ?"
+        params: list = [length]
+        if pattern is not None:
+            query += " AND answer GLOB ?"
+            params.append(_glob(pattern))
+        query += " GROUP BY answer ORDER BY SUM(seen) DESC, answer"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return self._ranked(self._db.execute(query, params).fetchall())
+
+    @staticmethod
+    def _ranked(rows: List[Tuple[str, int]]) -> List[Candidate]:
+        total = sum(seen for _, seen in rows)
+        return [Candidate(word=answer, score=seen / total) for answer, seen in rows]
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM clues").fetchone()[0]
+
+    def stats(self) -> CorpusStats:
+        return CorpusStats(hits=self.hits, misses=self.misses, entries=len(self))
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ClueCorpus":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Add clues and answers from puzzles to a corpus")
+    parser.add_argument("corpus", help="SQLite file, created if missing")
+    parser.add_argument("paths", nargs="+", help=".puz files or Guardian crossword .json files")
+    args = parser.parse_args()
+    with ClueCorpus(args.corpus) as corpus:
+        added = sum(corpus.add_file(path) for path in args.paths)
+        print(f"Added {added} clues from {len(args.paths)} files, {len(corpus)} entries in {args.corpus}")
+
+
+if __name__ == "__main__":
+    main()
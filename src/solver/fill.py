@@ -0,0 +1,311 @@
+"""
+Constraint-propagation fill engine.
+
+Given scored candidate answers for some or all clues of a CrosswordPuzzle,
+find the highest-scoring set of answers that agree at every crossing.
+
+Each slot's domain is a bitset over its candidate list, sorted best first,
+and a PatternIndex over the candidates gives the bitset of candidates with a
+given letter at a given position. Restricting a crossing is then a handful
+of integer ANDs and ORs rather than string comparisons.
+
+The search runs in two phases:
+
+1. Every slot with candidates must be filled. Arc consistency is maintained
+   across crossings after each assignment, slots are chosen by minimum
+   remaining values and candidates are tried best score first, with branch
+   and bound on the sum of the best remaining scores.
+2. If no complete fill exists, or none was found in half the time budget,
+   slots may be left blank. The search then maximizes the number of filled
+   slots and then their total score, with forward checking from assigned
+   slots, since a blank slot constrains nothing.
+"""
+
+import time
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import Candidate, ClueRef
+from .patterns import PatternIndex, pattern_from_chars
+
+CandidateLike = Union[Candidate, Tuple[str, float], str]
+
+# Assignment states besides a candidate index
+_UNDECIDED = -1
+_BLANK = -2
+
+# How many nodes to expand between clock checks
+_CLOCK_INTERVAL = 64
+
+
+class FillResult(BaseModel):
+    """The best consistent fill found for a puzzle"""
+    answers: Dict[int, str]
+    score: float
+    complete: bool
+    exhausted: bool
+    nodes: int
+    elapsed: float
+
+    def apply(self, puzzle: CrosswordPuzzle) -> None:
+        """Write the answers into the puzzle as a single move"""
+        puzzle.set_many({handle: list(word) for handle, word in self.answers.items()})
+
+
+def normalize_candidates(candidates: Iterable[CandidateLike], length: int) -> List[Candidate]:
+    """Uppercase, keep words of the right length, de-duplicate and sort best first"""
+    best: Dict[str, float] = {}
+    for candidate in candidates:
+        if isinstance(candidate, Candidate):
+            word, score = candidate.word, candidate.score
+        elif isinstance(candidate, str):
+            word, score = candidate, 0.0
+        else:
+            word, score = candidate
+        word = word.upper()
+        if len(word) != length or not word.isalpha():
+            continue
+        if word not in best or score > best[word]:
+            best[word] = score
+    return [
+        Candidate(word=word, score=score)
+        for word, score in sorted(best.items(), key=lambda item: -item[1])
+    ]
+
+
+class _Slot:
+    __slots__ = ("handle", "index", "words", "scores", "masks", "full", "crossings")
+
+    def __init__(self, handle: int, candidates: List[Candidate], length: int):
+        self.handle = handle
+        # Candidates are already normalized and unique, so bit i is candidates[i]
+        self.index = PatternIndex((c.word for c in candidates), normalize=False)
+        self.words = self.index.words(length)
+        self.scores = [c.score for c in candidates]
+        # masks[pos][letter] = bitset of candidates with letter at pos
+        self.masks: List[Dict[str, int]] = self.index.masks(length) or [{} for _ in range(length)]
+        self.full = self.index.full_mask(length)
+        # (position, crossing slot index, position in crossing slot)
+        self.crossings: List[Tuple[int, int, int]] = []
+
+    def best(self, domain: int) -> int:
+        """Index of the highest-scoring candidate left in a domain"""
+        return (domain & -domain).bit_length() - 1
+
+
+class _Timeout(Exception):
+    pass
+
+
+class FillEngine:
+    """Searches for the best consistent fill of a puzzle from candidate lists"""
+
+    def __init__(self, puzzle: CrosswordPuzzle,
+                 candidates: Mapping[ClueRef, Iterable[CandidateLike]],
+                 respect_grid: bool = False):
+        self.puzzle = puzzle
+        self.slots: List[_Slot] = []
+        slot_of: Dict[int, int] = {}
+        for clue, clue_candidates in candidates.items():
+            handle = puzzle.handle(clue)
+            length = puzzle.clues[handle].length
+            slot = _Slot(handle, normalize_candidates(clue_candidates, length), length)
+            slot_of[handle] = len(self.slots)
+            self.slots.append(slot)
+
+        for slot in self.slots:
+            for crossing in puzzle.crossings(slot.handle):
+                other = slot_of.get(puzzle.handle(crossing.clue))
+                if other is not None:
+                    slot.crossings.append((crossing.position, other, crossing.clue_position))
+
+        self.domains = [slot.full for slot in self.slots]
+        if respect_grid:
+            for i, slot in enumerate(self.slots):
+                chars = puzzle.get_current_clue_chars(slot.handle)
+                self.domains[i] = slot.index.mask(pattern_from_chars(chars))
+
+    def solve(self, time_budget: float = 1.0, allow_partial: bool = True) -> FillResult:
+        start = time.perf_counter()
+        self._nodes = 0
+        self._best: Optional[List[int]] = None
+        self._best_key: Tuple[int, float] = (-1, float("-inf"))
+
+        exhausted = False
+        strict_budget = time_budget / 2 if allow_partial else time_budget
+        self._deadline = start + strict_budget
+        domains = self._propagate(self.domains[:], range(len(self.slots)))
+        if domains is not None:
+            try:
+                self._search_strict(domains, [_UNDECIDED] * len(self.slots), 0.0)
+                exhausted = True
+            except _Timeout:
+                pass
+        else:
+            exhausted = True
+
+        if self._best is None and allow_partial:
+            self._deadline = start + time_budget
+            try:
+                self._search_partial(self.domains[:], [_UNDECIDED] * len(self.slots), 0, 0.0)
+                exhausted = True
+            except _Timeout:
+                exhausted = False
+
+        return self._result(start, exhausted)
+
+    def _result(self, start: float, exhausted: bool) -> FillResult:
+        answers = {}
+        score = 0.0
+        if self._best is not None:
+            for slot, choice in zip(self.slots, self._best):
+                if choice >= 0:
+                    answers[slot.handle] = slot.words[choice]
+                    score += slot.scores[choice]
+        return FillResult(
+            answers=answers,
+            score=score,
+            complete=bool(self.slots) and len(answers) == len(self.slots),
+            exhausted=exhausted,
+            nodes=self._nodes,
+            elapsed=time.perf_counter() - start,
+        )
+
+    def _tick(self) -> None:
+        self._nodes += 1
+        if self._nodes % _CLOCK_INTERVAL == 0 and time.perf_counter() > self._deadline:
+            raise _Timeout
+
+    def _propagate(self, domains: List[int], changed: Iterable[int]) -> Optional[List[int]]:
+        """Enforce arc consistency from the changed slots, or return None on a wipeout"""
+        slots = self.slots
+        queue = list(changed)
+        queued = set(queue)
+        while queue:
+            a = queue.pop()
+            queued.discard(a)
+            slot_a = slots[a]
+            domain_a = domains[a]
+            for pos_a, b, pos_b in slot_a.crossings:
+                masks_b = slots[b].masks[pos_b]
+                supported = 0
+                for letter, mask in slot_a.masks[pos_a].items():
+                    if domain_a & mask:
+                        supported |= masks_b.get(letter, 0)
+                domain_b = domains[b] & supported
+                if domain_b != domains[b]:
+                    if not domain_b:
+                        return None
+                    domains[b] = domain_b
+                    if b not in queued:
+                        queue.append(b)
+                        queued.add(b)
+        return domains
+
+    def _select(self, domains: List[int], assigned: List[int]) -> int:
+        """Minimum remaining values, ties broken by most crossings"""
+        best, best_key = -1, None
+        for i, choice in enumerate(assigned):
+            if choice != _UNDECIDED or not domains[i]:
+                continue
+            key = (domains[i].bit_count(), -len(self.slots[i].crossings))
+            if best_key is None or key < best_key:
+                best, best_key = i, key
+        return best
+
+    def _bound(self, domains: List[int], assigned: List[int]) -> Tuple[int, float]:
+        """Most slots that could still be filled and the best score they could add"""
+        count, score = 0, 0.0
+        for slot, domain, choice in zip(self.slots, domains, assigned):
+            if choice == _UNDECIDED and domain:
+                count += 1
+                score += slot.scores[slot.best(domain)]
+        return count, score
+
+    def _record(self, assigned: List[int], filled: int, score: float) -> None:
+        if (filled, score) > self._best_key:
+            self._best_key = (filled, score)
+            self._best = assigned[:]
+
+    def _search_strict(self, domains: List[int], assigned: List[int], score: float) -> None:
+        self._tick()
+        i = self._select(domains, assigned)
+        if i < 0:
+            self._record(assigned, len(assigned), score)
+            return
+
+        slot = self.slots[i]
+        domain = domains[i]
+        _, remaining = self._bound(domains, assigned)
+        # Best possible score with slot i's share of the bound left out
+        others = score + remaining - slot.scores[slot.best(domain)]
+        while domain:
+            low = domain & -domain
+            domain ^= low
+            choice = low.bit_length() - 1
+            # Scores are sorted, so no later candidate can do better either
+            if self._best is not None and others + slot.scores[choice] <= self._best_key[1]:
+                return
+            child = domains[:]
+            child[i] = low
+            child = self._propagate(child, (i,))
+            if child is None:
+                continue
+            assigned[i] = choice
+            self._search_strict(child, assigned, score + slot.scores[choice])
+            assigned[i] = _UNDECIDED
+
+    def _search_partial(self, domains: List[int], assigned: List[int],
+                        filled: int, score: float) -> None:
+        self._tick()
+        i = self._select(domains, assigned)
+        if i < 0:
+            self._record(assigned, filled, score)
+            return
+
+        count, remaining = self._bound(domains, assigned)
+        if (filled + count, score + remaining) <= self._best_key:
+            return
+
+        slot = self.slots[i]
+        domain = domains[i]
+        while domain:
+            low = domain & -domain
+            domain ^= low
+            choice = low.bit_length() - 1
+            word = slot.words[choice]
+            child = domains[:]
+            child[i] = low
+            for pos, j, pos_j in slot.crossings:
+                if assigned[j] == _UNDECIDED:
+                    child[j] &= self.slots[j].masks[pos_j].get(word[pos], 0)
+            assigned[i] = choice
+            self._search_partial(child, assigned, filled + 1, score + slot.scores[choice])
+            assigned[i] = _UNDECIDED
+
+        # Finally try leaving the slot blank
+        assigned[i] = _BLANK
+        self._search_partial(domains, assigned, filled, score)
+        assigned[i] = _UNDECIDED
+
+
+def fill_puzzle(puzzle: CrosswordPuzzle,
+                candidates: Mapping[ClueRef, Iterable[CandidateLike]],
+                time_budget: float = 1.0,
+                allow_partial: bool = True,
+                respect_grid: bool = False) -> FillResult:
+    """
+    Find the highest-scoring consistent fill of a puzzle within a time budget.
+
+    Args:
+        puzzle: The puzzle whose clue geometry defines the crossings
+        candidates: Candidate answers per clue or handle, as Candidate objects,
+            (word, score) pairs or bare words scored 0
+        time_budget: Seconds to search before returning the best fill so far
+        allow_partial: Leave slots blank when no complete fill is found
+        respect_grid: Only keep candidates that agree with letters already in the grid
+    """
+    engine = FillEngine(puzzle, candidates, respect_grid=respect_grid)
+    return engine.solve(time_budget=time_budget, allow_partial=allow_partial)
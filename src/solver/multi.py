@@ -0,0 +1,127 @@
+"""
+Solving many puzzles at once, asking each repeated clue only once.
+
+A day's puzzles often share clues, verbatim or up to case, punctuation and
+accents. Queries from every puzzle are grouped by normalized clue text,
+length, known letters and ruled-out words; one query per group is sent,
+with the summed priority of its members, and its result is fanned back out
+to every puzzle that has the clue. Each puzzle gets its results as though
+it had been solved alone.
+"""
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel
+
+from src.crossword.crossword import CrosswordPuzzle
+from .answer_cache import AnswerCache, normalize_clue
+from .batching import BatchSolver
+from .corpus import ClueCorpus
+from .pipeline import ClueQuery, ClueResult, ClueSolver, SolverConfig, apply_result, run_blocking
+
+GroupKey = Tuple[str, int, Optional[str], Tuple[str, ...]]
+
+
+class DedupReport(BaseModel):
+    puzzles: int
+    # Clue queries over all puzzles, and the distinct ones among them
+    clues: int
+    groups: int
+    # Requests actually sent to the backend
+    requests: int
+    elapsed: float = 0.0
+
+    @property
+    def saved(self) -> int:
+        """Clue queries answered by another puzzle's identical clue"""
+        return self.clues - self.groups
+
+
+class MultiResult(BaseModel):
+    # Per puzzle, in the order given, its results in arrival order
+    results: List[List[ClueResult]]
+    report: DedupReport
+
+
+def group_key(query: ClueQuery) -> GroupKey:
+    return (normalize_clue(query.clue.text), query.clue.length, query.known_pattern,
+            tuple(sorted(query.avoid)))
+
+
+def group_queries(per_puzzle: Sequence[Sequence[ClueQuery]]
+                  ) -> Tuple[List[ClueQuery], List[List[Tuple[int, int]]]]:
+    """
+    One query per group of identical queries, its handle being the group's
+    index, and per group the (puzzle index, handle) of each member.
+    """
+    groups: Dict[GroupKey, int] = {}
+    shared: List[ClueQuery] = []
+    members: List[List[Tuple[int, int]]] = []
+    for index, queries in enumerate(per_puzzle):
+        for query in queries:
+            key = group_key(query)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = len(shared)
+                shared.append(query.model_copy(update={"handle": group, "priority": 0.0}))
+                members.append([])
+            shared[group].priority += query.priority
+            members[group].append((index, query.handle))
+    return shared, members
+
+
+async def solve_many(solver: ClueSolver, puzzles: Sequence[CrosswordPuzzle],
+                     on_result: Optional[Callable[[int, ClueResult], Optional[Awaitable[None]]]] = None,
+                     apply: bool = True) -> MultiResult:
+    """
+    Solve every clue of several puzzles, sending each distinct clue once.
+
+    Args:
+        solver: The solver, whose puzzle_queries decides what is asked per puzzle
+        puzzles: The puzzles to solve
+        on_result: Called with the puzzle's index and each result as it arrives,
+            possibly a coroutine
+        apply: Write answers and candidates into the puzzles; otherwise only return them
+    """
+    start = time.perf_counter()
+    requests = solver.requests
+    shared, members = group_queries([solver.puzzle_queries(puzzle) for puzzle in puzzles])
+    results: List[List[ClueResult]] = [[] for _ in puzzles]
+
+    stream = solver.solve_queries(shared)
+    try:
+        async for result in stream:
+            for index, handle in members[result.handle]:
+                fanned = result.model_copy(update={"handle": handle})
+                if apply:
+                    apply_result(puzzles[index], fanned)
+                if on_result is not None:
+                    pending = on_result(index, fanned)
+                    if asyncio.iscoroutine(pending):
+                        await pending
+                results[index].append(fanned)
+    finally:
+        await stream.aclose()
+
+    report = DedupReport(
+        puzzles=len(puzzles),
+        clues=sum(len(group) for group in members),
+        groups=len(shared),
+        requests=solver.requests - requests,
+        elapsed=time.perf_counter() - start,
+    )
+    return MultiResult(results=results, report=report)
+
+
+def solve_puzzles(puzzles: Sequence[CrosswordPuzzle], backend=None,
+                  config: Optional[SolverConfig] = None, cache: Optional[AnswerCache] = None,
+                  batch: bool = False, corpus: Optional[ClueCorpus] = None, **kwargs) -> MultiResult:
+    """
+    Blocking wrapper around solve_many for scripts, through run_blocking,
+    with a BatchSolver if batch is set.
+    """
+    return run_blocking(backend, lambda shared: solve_many(
+        (BatchSolver if batch else ClueSolver)(shared, config, cache, corpus=corpus), puzzles, **kwargs
+    ))
@@ -0,0 +1,162 @@
+"""
+Positional pattern index for fast candidate filtering.
+
+Words are grouped by length. For every length, position and letter the index
+keeps a bitset (a Python int) of the words with that letter at that
+position, bit i standing for the i-th word of that length in insertion
+order. A query such as C?T?? is then the AND of two bitsets, whatever the
+number of words.
+"""
+
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+from pydantic import BaseModel
+
+from src.crossword.grid import BLOCK
+
+# Characters that stand for an unknown letter in a string pattern
+WILDCARDS = frozenset("?_. ")
+
+Pattern = Union[str, Sequence[Optional[str]]]
+
+
+class IndexStats(BaseModel):
+    words: int
+    lengths: int
+    build_seconds: float
+    bytes: int
+
+
+def normalize_word(word: str) -> str:
+    """Uppercase a word and drop anything that is not a letter, e.g. OEDIPUS REX -> OEDIPUSREX"""
+    return "".join(char for char in word.upper() if char.isalpha())
+
+
+def pattern_from_chars(chars: Sequence[Optional[str]]) -> str:
+    """Turn get_current_clue_chars output into a string pattern such as C?T??"""
+    return "".join(char if char and char != BLOCK else "?" for char in chars)
+
+
+def _known_letters(pattern: Pattern) -> List[tuple]:
+    return [
+        (pos, char.upper()) for pos, char in enumerate(pattern)
+        if char is not None and char not in WILDCARDS and char != BLOCK
+    ]
+
+
+def _bits(mask: int) -> List[int]:
+    """Indices of the set bits of a mask, lowest first"""
+    # Reversed binary string: index i holds bit i
+    digits = bin(mask)[:1:-1]
+    indices = []
+    i = digits.find("1")
+    while i >= 0:
+        indices.append(i)
+        i = digits.find("1", i + 1)
+    return indices
+
+
+class PatternIndex:
+    """Words indexed by length and by letter at each position"""
+
+    def __init__(self, words: Iterable[str], normalize: bool = True):
+        start = time.perf_counter()
+        self._words: Dict[int, List[str]] = {}
+        self._all = seen = set()
+        for word in words:
+            if normalize:
+                word = normalize_word(word)
+            if not word or word in seen:
+                continue
+            seen.add(word)
+            self._words.setdefault(len(word), []).append(word)
+
+        self._masks: Dict[int, List[Dict[str, int]]] = {
+            length: self._build_masks(length, words)
+            for length, words in self._words.items()
+        }
+        self._build_seconds = time.perf_counter() - start
+
+    @staticmethod
+    def _build_masks(length: int, words: List[str]) -> List[Dict[str, int]]:
+        # Collect bit positions first: ORing into an ever-growing int is quadratic
+        positions: List[Dict[str, List[int]]] = [{} for _ in range(length)]
+        for bit, word in enumerate(words):
+            for pos, letter in enumerate(word):
+                positions[pos].setdefault(letter, []).append(bit)
+
+        nbytes = (len(words) + 7) // 8
+        masks = []
+        for letters in positions:
+            pos_masks = {}
+            for letter, bits in letters.items():
+                buffer = bytearray(nbytes)
+                for bit in bits:
+                    buffer[bit >> 3] |= 1 << (bit & 7)
+                pos_masks[letter] = int.from_bytes(buffer, "little")
+            masks.append(pos_masks)
+        return masks
+
+    @classmethod
+    def from_file(cls, path: str) -> "PatternIndex":
+        """Build an index from a word list with one word or phrase per line"""
+        with open(path, encoding="utf-8") as f:
+            return cls(line.strip() for line in f)
+
+    def __len__(self) -> int:
+        return sum(len(words) for words in self._words.values())
+
+    def __contains__(self, word: str) -> bool:
+        return word in self._all
+
+    def words(self, length: int) -> List[str]:
+        """All words of a length, in bit order"""
+        return self._words.get(length, [])
+
+    def masks(self, length: int) -> List[Dict[str, int]]:
+        """Per position, the letter -> bitset map for words of a length"""
+        return self._masks.get(length, [])
+
+    def full_mask(self, length: int) -> int:
+        return (1 << len(self.words(length))) - 1
+
+    def mask(self, pattern: Pattern) -> int:
+        """Bitset over words(len(pattern)) of the words matching a pattern"""
+        length = len(pattern)
+        masks = self._masks.get(length)
+        if masks is None:
+            return 0
+        result = self.full_mask(length)
+        for pos, letter in _known_letters(pattern):
+            result &= masks[pos].get(letter, 0)
+            if not result:
+                break
+        return result
+
+    def match(self, pattern: Pattern, limit: Optional[int] = None) -> List[str]:
+        """Words matching a pattern such as C?T?? or ['C', None, 'T', None, None]"""
+        words = self.words(len(pattern))
+        bits = _bits(self.mask(pattern))
+        if limit is not None:
+            bits = bits[:limit]
+        return [words[bit] for bit in bits]
+
+    def count(self, pattern: Pattern) -> int:
+        return self.mask(pattern).bit_count()
+
+    def stats(self) -> IndexStats:
+        """Word count, build time and approximate memory of the index"""
+        size = sys.getsizeof(self._words) + sys.getsizeof(self._masks)
+        for length, words in self._words.items():
+            size += sys.getsizeof(words) + sum(sys.getsizeof(word) for word in words)
+            for pos_masks in self._masks[length]:
+                size += sys.getsizeof(pos_masks)
+                size += sum(sys.getsizeof(mask) for mask in pos_masks.values())
+        return IndexStats(
+            words=len(self),
+            lengths=len(self._words),
+            build_seconds=self._build_seconds,
+            bytes=size,
+        )
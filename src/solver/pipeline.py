@@ -0,0 +1,479 @@
+"""
+Concurrent clue solving through one shared async backend.
+
+Every clue of a puzzle is sent to the model at once, at most
+max_concurrency requests being in flight, and results are yielded as they
+arrive rather than in clue order. Each request has its own timeout, and
+closing or cancelling the stream cancels every request still pending.
+With SolverConfig.stream, single-clue replies are read as they are
+generated and abandoned as soon as they hold an acceptable answer. Clues
+found in a ClueCorpus of solved puzzles are answered from it with no
+request at all.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from pydantic import BaseModel, Field
+
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import Candidate, Clue, ClueRef
+from .answer_cache import AnswerCache
+from .corpus import ClueCorpus
+from .backends import (
+    CompletionRequest, StreamingBackend, aclose_backend, as_async_backend, azure_backend,
+)
+from .patterns import WILDCARDS, normalize_word
+
+SYSTEM_PROMPT = "You are a crossword puzzle solver. Provide only the answer word, with no additional explanation."
+
+# The opening line of a single-clue prompt, filled in with the clue's length and text
+CLUE_TEMPLATE = "Give the {length}-letter answer for this crossword clue: '{text}'"
+
+# Bump whenever clue_prompt changes, so cached answers to the old prompt are not reused
+PROMPT_VERSION = "1"
+
+T = TypeVar("T")
+
+
+class SolverConfig(BaseModel):
+    model: str = Field(default_factory=lambda: os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4o"))
+    max_concurrency: int = Field(default=8, gt=0)
+    # Deadline per clue or batch, including any wait in a Scheduler; None for none
+    timeout: Optional[float] = Field(default=30.0, gt=0)
+    max_tokens: int = 50
+    temperature: float = 0.0
+    system_prompt: str = SYSTEM_PROMPT
+    clue_template: str = CLUE_TEMPLATE
+    # Stream single-clue replies, stopping at the first acceptable word, when the backend can
+    stream: bool = False
+    # Ranked candidates to ask for per single-clue request; more than one disables streaming
+    candidates: int = Field(default=1, gt=0)
+
+    @property
+    def prompt_version(self) -> str:
+        """Identifies the prompt template and system prompt, for answer caching"""
+        prompts = self.system_prompt
+        if self.clue_template != CLUE_TEMPLATE:
+            prompts += "\n" + self.clue_template
+        digest = hashlib.sha256(prompts.encode()).hexdigest()[:12]
+        version = f"{PROMPT_VERSION}-{digest}"
+        return version if self.candidates == 1 else f"{version}-{self.candidates}"
+
+
+class ClueResult(BaseModel):
+    """The outcome of solving one clue: a word, or the error that prevented it"""
+    handle: int
+    word: Optional[str] = None
+    raw: Optional[str] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+    cached: bool = False
+    # Ranked alternatives, best first, when the reply offered several
+    candidates: List[Candidate] = []
+
+    @property
+    def ok(self) -> bool:
+        return self.word is not None
+
+
+def extract_word(response_text: str, length: int) -> str:
+    """
+    Find the answer in a model response: a quoted word, a word after "is",
+    or else the first word of the right length.
+    """
+    patterns = [
+        r"['\"](.*?)['\"]",
+        rf"is ['\"]*([A-Za-z]{{{length}}})['\"]*",
+    ]
+    for pattern in patterns:
+        for match in re.findall(pattern, response_text, re.IGNORECASE):
+            word = match.strip(" .\"'")
+            if len(word) == length and word.isalpha():
+                return word.upper()
+
+    for word in re.findall(r"\b[A-Za-z]+\b", response_text):
+        if len(word) == length:
+            return word.upper()
+
+    raise ValueError(f"Could not find a {length}-letter word in response: {response_text}")
+
+
+def extract_candidates(response_text: str, length: int) -> List[str]:
+    """
+    The words of a reply listing candidates one per line, in order: each
+    line's answer as extract_word finds it, skipping lines without one.
+    """
+    words = []
+    for line in response_text.splitlines():
+        try:
+            words.append(extract_word(line, length))
+        except ValueError:
+            continue
+    return words
+
+
+def rank_candidates(rankings: Iterable[Sequence[str]], length: int, pattern: Optional[str] = None,
+                    avoid: Sequence[str] = ()) -> List[Candidate]:
+    """
+    Merge ranked word lists, such as one reply's candidates or several
+    replies', into de-duplicated candidates, best first. Words of the wrong
+    length, that contradict the pattern or that were ruled out are dropped.
+    In each list the first word left scores 1, the next 1/2, then 1/3..., and
+    a word's score is its mean over the lists.
+    """
+    rankings = list(rankings)
+    scores: dict = {}
+    for words in rankings:
+        seen = {normalize_word(word) for word in avoid}
+        rank = 0
+        for word in words:
+            word = normalize_word(word)
+            if len(word) != length or word in seen or not _fits_pattern(word, pattern):
+                continue
+            seen.add(word)
+            rank += 1
+            scores[word] = scores.get(word, 0.0) + 1.0 / rank
+    return [
+        Candidate(word=word, score=score / len(rankings))
+        for word, score in sorted(scores.items(), key=lambda item: -item[1])
+    ]
+
+
+def _fits_pattern(word: str, pattern: Optional[str]) -> bool:
+    return pattern is None or all(p in WILDCARDS or p == w for w, p in zip(word, pattern))
+
+
+class WordExtractor:
+    """
+    Finds the answer in a reply as it streams in. A quoted word, a word after
+    "is", or a first word ending the reply's first sentence or line, is
+    accepted as soon as it is complete if it has the right length and fits
+    the pattern. finish falls back to extract_word on the whole reply.
+    """
+
+    _QUOTED = re.compile(r"['\"]([A-Za-z]+)['\"]")
+    _AFTER_IS = re.compile(r"\bis ['\"]*([A-Za-z]+)(?=[^A-Za-z])", re.IGNORECASE)
+    _FIRST = re.compile(r"^\s*([A-Za-z]+)\s*[.\n]")
+
+    def __init__(self, length: int, pattern: Optional[str] = None):
+        self.length = length
+        self.pattern = pattern
+        self.text = ""
+
+    def _fits(self, word: str) -> bool:
+        return len(word) == self.length and _fits_pattern(word, self.pattern)
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """Add a chunk, returning the answer once one is found"""
+        self.text += chunk
+        for regex in (self._QUOTED, self._AFTER_IS, self._FIRST):
+            for match in regex.finditer(self.text):
+                word = match.group(1).upper()
+                if self._fits(word):
+                    return word
+        return None
+
+    def finish(self) -> str:
+        """The answer in the complete reply; raises ValueError if there is none"""
+        return extract_word(self.text, self.length)
+
+
+class ClueQuery(BaseModel):
+    """A clue to solve, with the letters known so far and words already ruled out"""
+    handle: int
+    clue: Clue
+    # Such as ?A?E?, None or all unknown when no letters are known
+    pattern: Optional[str] = None
+    avoid: List[str] = []
+    priority: float = 0.0
+
+    @property
+    def known_pattern(self) -> Optional[str]:
+        """The pattern, or None if it has no known letters"""
+        if self.pattern is None or all(char in WILDCARDS for char in self.pattern):
+            return None
+        return self.pattern
+
+
+def clue_prompt(clue: Clue, pattern: Optional[str] = None, avoid: Sequence[str] = (),
+                candidates: int = 1, template: str = CLUE_TEMPLATE) -> str:
+    prompt = template.format(length=clue.length, text=clue.text)
+    if pattern is not None:
+        prompt += f"\nIt fits the pattern {pattern}, where ? is an unknown letter."
+    if avoid:
+        prompt += f"\nIt is not {', '.join(avoid)}."
+    if candidates > 1:
+        prompt += f"\nGive up to {candidates} candidates, best first, one per line."
+    return prompt
+
+
+def constrainedness(puzzle: CrosswordPuzzle, handle: int, pattern: Optional[str] = None) -> float:
+    """
+    How much solving a clue constrains the rest of the grid, and how well it
+    is constrained itself: its crossed squares plus twice its known letters.
+    """
+    known = sum(char not in WILDCARDS for char in pattern) if pattern else 0
+    return len(puzzle.crossings(handle)) + 2 * known
+
+
+def queries(puzzle: CrosswordPuzzle, clues: Optional[Iterable[ClueRef]] = None) -> List[ClueQuery]:
+    """Queries without patterns for clues of a puzzle, defaulting to every clue"""
+    handles = range(len(puzzle.clues)) if clues is None else [puzzle.handle(c) for c in clues]
+    return [
+        ClueQuery(handle=handle, clue=puzzle.clues[handle], priority=constrainedness(puzzle, handle))
+        for handle in handles
+    ]
+
+
+def apply_result(puzzle: CrosswordPuzzle, result: ClueResult) -> None:
+    """
+    Write a result's answer into the puzzle and store its candidates, or the
+    answer alone scored 1 if it has none, for later conflict resolution.
+    """
+    if not result.ok:
+        return
+    puzzle.set_clue_chars(result.handle, list(result.word))
+    puzzle.add_candidates(result.handle, result.candidates or [Candidate(word=result.word, score=1.0)])
+
+
+class ClueSolver:
+    """Solves clues concurrently through a shared async backend"""
+
+    def __init__(self, backend, config: Optional[SolverConfig] = None,
+                 cache: Optional[AnswerCache] = None, corpus: Optional[ClueCorpus] = None):
+        # A backend, or an OpenAI-style client to adapt
+        self.backend = as_async_backend(backend)
+        self.config = config or SolverConfig()
+        self.cache = cache
+        self.corpus = corpus
+        # Requests sent to the backend, streamed replies abandoned once answered,
+        # and clues answered from the corpus
+        self.requests = 0
+        self.early_stops = 0
+        self.corpus_hits = 0
+        self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+
+    async def complete(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None, json_output: bool = False,
+                       priority: float = 0.0) -> str:
+        """Send one prompt and return the text of the reply"""
+        completion = await self.backend.acomplete(self._completion_request(
+            prompt, system_prompt, max_tokens, json_output, priority
+        ))
+        return completion.text
+
+    def _completion_request(self, prompt: str, system_prompt: Optional[str] = None,
+                            max_tokens: Optional[int] = None, json_output: bool = False,
+                            priority: float = 0.0) -> CompletionRequest:
+        return CompletionRequest(
+            model=self.config.model,
+            messages=[
+                {"role": "system", "content": system_prompt or self.config.system_prompt},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens or self.config.max_tokens,
+            temperature=self.config.temperature,
+            json_output=json_output,
+            priority=priority,
+        )
+
+    async def stream_word(self, prompt: str, length: int, pattern: Optional[str] = None,
+                          priority: float = 0.0) -> Tuple[str, str]:
+        """
+        Stream a reply to a single-clue prompt, returning the text read and the
+        answer as soon as WordExtractor accepts one. The rest of the reply is
+        abandoned by closing the stream.
+        """
+        extractor = WordExtractor(length, pattern)
+        stream = self.backend.astream(self._completion_request(prompt, priority=priority))
+        try:
+            async for chunk in stream:
+                word = extractor.feed(chunk)
+                if word is not None:
+                    self.early_stops += 1
+                    return extractor.text, word
+        finally:
+            await stream.aclose()
+        return extractor.text, extractor.finish()
+
+    async def _limited(self, send: Callable[..., Awaitable], *args, **kwargs):
+        """Call send within the concurrency limit and the per-request timeout"""
+        async with self._semaphore:
+            self.requests += 1
+            return await asyncio.wait_for(send(*args, **kwargs), self.config.timeout)
+
+    async def request(self, prompt: str, **kwargs) -> str:
+        """complete, within the concurrency limit and the per-request timeout"""
+        return await self._limited(self.complete, prompt, **kwargs)
+
+    def _cache_key(self, query: ClueQuery) -> Optional[str]:
+        # Ruling words out changes the question, so such queries bypass the cache
+        if self.cache is None or query.avoid:
+            return None
+        return self.cache.key(self.config.model, self.config.prompt_version,
+                              query.clue.text, query.clue.length, query.known_pattern)
+
+    def _from_corpus(self, query: ClueQuery) -> Optional[ClueResult]:
+        """The corpus's answers to a query's clue, if it has any fitting the grid"""
+        if self.corpus is None:
+            return None
+        candidates = self.corpus.lookup(query.clue.text, query.clue.length,
+                                        query.known_pattern, query.avoid)
+        if not candidates:
+            return None
+        self.corpus_hits += 1
+        return ClueResult(handle=query.handle, word=candidates[0].word, cached=True,
+                          candidates=candidates)
+
+    async def solve_clue(self, handle: int, clue: Clue) -> ClueResult:
+        """Solve one clue, never raising except on cancellation"""
+        return await self.solve_query(ClueQuery(handle=handle, clue=clue))
+
+    async def solve_query(self, query: ClueQuery) -> ClueResult:
+        """Solve one query, never raising except on cancellation"""
+        handle, clue = query.handle, query.clue
+        known = self._from_corpus(query)
+        if known is not None:
+            return known
+        key = self._cache_key(query)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return ClueResult(handle=handle, word=cached.word, raw=cached.raw, cached=True,
+                                  candidates=self._candidates(cached.raw, query))
+
+        start = time.perf_counter()
+        raw = None
+        candidates: List[Candidate] = []
+        prompt = clue_prompt(clue, query.known_pattern, query.avoid, self.config.candidates,
+                             self.config.clue_template)
+        try:
+            if self.config.candidates > 1:
+                raw = await self.request(prompt, priority=query.priority)
+                candidates = self._candidates(raw, query)
+                if not candidates:
+                    raise ValueError(f"No {clue.length}-letter candidates in response: {raw}")
+                word = candidates[0].word
+            elif self.config.stream and isinstance(self.backend, StreamingBackend):
+                raw, word = await self._limited(
+                    self.stream_word, prompt, clue.length, query.known_pattern, query.priority
+                )
+            else:
+                raw = await self.request(prompt, priority=query.priority)
+                word = extract_word(raw, clue.length)
+        except asyncio.TimeoutError:
+            return ClueResult(handle=handle, error=f"Timed out after {self.config.timeout}s",
+                              elapsed=time.perf_counter() - start)
+        except Exception as e:
+            return ClueResult(handle=handle, raw=raw, error=f"{type(e).__name__}: {e}",
+                              elapsed=time.perf_counter() - start)
+        if key is not None:
+            self.cache.put(key, word, raw)
+        return ClueResult(handle=handle, word=word, raw=raw, candidates=candidates,
+                          elapsed=time.perf_counter() - start)
+
+    def _candidates(self, raw: Optional[str], query: ClueQuery) -> List[Candidate]:
+        """Ranked candidates in a reply to a request for several, else none"""
+        if self.config.candidates == 1 or not raw:
+            return []
+        words = extract_candidates(raw, query.clue.length)[:self.config.candidates]
+        return rank_candidates([words], query.clue.length, query.known_pattern, query.avoid)
+
+    async def solve_stream(self, puzzle: CrosswordPuzzle,
+                           clues: Optional[Iterable[ClueRef]] = None) -> AsyncIterator[ClueResult]:
+        """
+        Solve clues of a puzzle concurrently, yielding results as they complete.
+
+        Args:
+            puzzle: The puzzle to solve
+            clues: Clues or handles to solve, defaulting to every clue
+        """
+        stream = self.solve_queries(self.puzzle_queries(puzzle, clues))
+        try:
+            async for result in stream:
+                yield result
+        finally:
+            await stream.aclose()
+
+    def puzzle_queries(self, puzzle: CrosswordPuzzle,
+                       clues: Optional[Iterable[ClueRef]] = None) -> List[ClueQuery]:
+        """The queries solve_stream sends for clues of a puzzle"""
+        return queries(puzzle, clues)
+
+    async def solve_queries(self, queries: Iterable[ClueQuery]) -> AsyncIterator[ClueResult]:
+        """
+        Solve queries concurrently, yielding results as they complete. Higher
+        priority queries are sent first.
+        """
+        ordered = sorted(queries, key=lambda query: -query.priority)
+        tasks = [asyncio.ensure_future(self.solve_query(query)) for query in ordered]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Reached early when the consumer stops iterating or is cancelled
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def solve_puzzle(self, puzzle: CrosswordPuzzle,
+                           clues: Optional[Iterable[ClueRef]] = None,
+                           on_result: Optional[Callable[[ClueResult], Optional[Awaitable[None]]]] = None,
+                           apply: bool = True) -> List[ClueResult]:
+        """
+        Solve clues concurrently, writing each answer and its candidates into
+        the puzzle as it arrives.
+
+        Args:
+            puzzle: The puzzle to solve
+            clues: Clues or handles to solve, defaulting to every clue
+            on_result: Called with each result as it arrives, possibly a coroutine
+            apply: Write answers into the puzzle; otherwise only return them
+        """
+        results = []
+        stream = self.solve_stream(puzzle, clues)
+        try:
+            async for result in stream:
+                if apply:
+                    apply_result(puzzle, result)
+                if on_result is not None:
+                    pending = on_result(result)
+                    if asyncio.iscoroutine(pending):
+                        await pending
+                results.append(result)
+        finally:
+            await stream.aclose()
+        return results
+
+
+def run_blocking(backend, main: Callable[[Any], Awaitable[T]]) -> T:
+    """
+    Run main with a backend to completion, for the blocking wrappers used by
+    scripts. With no backend, one is built with azure_backend and closed
+    afterwards.
+    """
+    async def run() -> T:
+        own_backend = backend is None
+        shared = azure_backend() if own_backend else backend
+        try:
+            return await main(shared)
+        finally:
+            if own_backend:
+                await aclose_backend(shared)
+
+    return asyncio.run(run())
+
+
+def solve_puzzle(puzzle: CrosswordPuzzle, backend=None,
+                 config: Optional[SolverConfig] = None,
+                 cache: Optional[AnswerCache] = None, corpus: Optional[ClueCorpus] = None,
+                 **kwargs) -> List[ClueResult]:
+    """Blocking wrapper around ClueSolver.solve_puzzle for scripts, through run_blocking"""
+    return run_blocking(backend, lambda shared: ClueSolver(shared, config, cache, corpus).solve_puzzle(
+        puzzle, **kwargs
+    ))
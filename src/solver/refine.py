@@ -0,0 +1,317 @@
+"""
+Targeted re-solving of conflicting and unfilled clues.
+
+After a first pass, some answers disagree at crossings (the later write
+won the shared cell) and some clues have no answer at all. Each refinement
+round finds those slots from the grid and asks again for only those clues,
+giving the model the letters of the crossing answers that are not
+themselves in doubt as a pattern such as ?A?E?. Of two answers that
+disagree, only the one with more disagreements is asked again, since a
+wrong answer tends to clash with several crossings while a right one only
+clashes with the wrong ones, and an answer its reply strongly preferred
+counts for less. Before either side is chosen, candidates stored on the
+puzzle by earlier replies are tried on both sides, and one that settles a
+disagreement without breaking an agreeing crossing is taken at no request.
+Before asking, a stored candidate that fits the known letters is tried
+instead, also at no request. A clue whose model insists on an answer that still
+conflicts has that answer ruled out the next time.
+Rounds continue until every slot agrees with its crossings, or the request
+budget, round limit or per-clue attempt limit is reached.
+"""
+
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from pydantic import BaseModel
+
+from src.crossword.crossword import CrosswordPuzzle
+from .patterns import WILDCARDS
+from .pipeline import ClueQuery, ClueResult, ClueSolver, apply_result, constrainedness, run_blocking
+
+
+class RefineResult(BaseModel):
+    answers: Dict[int, str]
+    rounds: int
+    requests: int
+    converged: bool
+    # Slots still conflicting or unfilled
+    remaining: List[int]
+    # Answers taken from the puzzle's stored candidates instead of a request
+    local: int = 0
+
+
+def answers_from_results(results: Iterable[ClueResult]) -> Dict[int, str]:
+    return {result.handle: result.word for result in results if result.ok}
+
+
+def unresolved_slots(puzzle: CrosswordPuzzle, answers: Mapping[int, str]) -> Tuple[List[int], List[int]]:
+    """
+    Handles of conflicting slots, whose grid letters differ from their answer
+    or whose answer disagrees with a crossing answer, and of unfilled slots,
+    which have no answer or an empty square.
+    """
+    conflicting, unfilled = [], []
+    for handle in range(len(puzzle.clues)):
+        chars = puzzle.get_current_clue_chars(handle)
+        answer = answers.get(handle)
+        if answer is None or None in chars:
+            unfilled.append(handle)
+        elif "".join(chars) != answer or any(
+            other is not None and other[c.clue_position] != answer[c.position]
+            for c, other in ((c, answers.get(puzzle.handle(c.clue))) for c in puzzle.crossings(handle))
+        ):
+            conflicting.append(handle)
+    return conflicting, unfilled
+
+
+def crossing_handles(puzzle: CrosswordPuzzle) -> List[List[Tuple[int, int, int]]]:
+    """Per handle: (position, crossing handle, position in the crossing clue) for each crossing"""
+    return [
+        [(c.position, puzzle.handle(c.clue), c.clue_position) for c in puzzle.crossings(handle)]
+        for handle in range(len(puzzle.clues))
+    ]
+
+
+def disagreements(answers: Mapping[int, str], crossings: List[List[Tuple[int, int, int]]],
+                   handles: Iterable[int]) -> Tuple[Set[Tuple[int, int]], Counter]:
+    """
+    Pairs of crossing handles whose answers disagree on their shared square,
+    and per handle the number of crossing answers that agree with it.
+    """
+    pairs = set()
+    support: Counter = Counter()
+    for handle in handles:
+        answer = answers.get(handle)
+        if answer is None:
+            continue
+        for pos, other, other_pos in crossings[handle]:
+            other_answer = answers.get(other)
+            if other_answer is None:
+                continue
+            if answer[pos] != other_answer[other_pos]:
+                pairs.add((min(handle, other), max(handle, other)))
+            else:
+                support[handle] += 1
+    return pairs, support
+
+
+def answer_share(puzzle: CrosswordPuzzle, handle: int, answer: Optional[str]) -> float:
+    """
+    The share of a clue's stored candidate scores held by its answer: 1 for
+    a lone candidate, 0.5 when nothing is stored or the answer is not among it.
+    """
+    candidates = puzzle.get_candidates(handle)
+    score = next((c.score for c in candidates if c.word == answer), None)
+    total = sum(c.score for c in candidates)
+    if score is None or total <= 0:
+        return 0.5
+    return score / total
+
+
+def cover_disagreements(pairs: Set[Tuple[int, int]], support: Counter,
+                        share: Optional[Mapping[int, float]] = None) -> Set[int]:
+    """
+    Greedily pick handles until every disagreeing pair has one, taking the
+    handle in the most remaining pairs first, then the one fewest crossings
+    agree with. With shares from answer_share, a handle's pairs count for up
+    to half less the more its reply preferred its answer, so a well-supported
+    answer crossed by two doubtful ones is not the one re-asked.
+    """
+    share = share or {}
+    pairs = set(pairs)
+    chosen = set()
+    while pairs:
+        counts = Counter(handle for pair in pairs for handle in pair)
+        handle = min(counts, key=lambda h: (-counts[h] * (1 - share.get(h, 0.5) / 2), support[h], h))
+        chosen.add(handle)
+        pairs = {pair for pair in pairs if handle not in pair}
+    return chosen
+
+
+class Refiner:
+    """Re-queries only the clues that disagree with their crossings, within a budget"""
+
+    def __init__(self, solver: ClueSolver, max_requests: int = 50, max_rounds: int = 5,
+                 max_attempts: int = 3):
+        self.solver = solver
+        self.max_requests = max_requests
+        self.max_rounds = max_rounds
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def pattern(puzzle: CrosswordPuzzle, handle: int, answers: Mapping[int, str],
+                crossings: List[Tuple[int, int, int]], targets: Set[int]) -> str:
+        """
+        The slot's letters where a crossing answer that is not itself a target
+        fixes them, with ? everywhere else. These are the grid's letters,
+        except on squares the slot's own conflicting answer overwrote.
+        """
+        pattern = ["?"] * puzzle.clues[handle].length
+        for pos, other, other_pos in crossings:
+            answer = answers.get(other)
+            if other not in targets and answer is not None:
+                pattern[pos] = answer[other_pos]
+        return "".join(pattern)
+
+    @staticmethod
+    def stored(puzzle: CrosswordPuzzle, query: ClueQuery, current: Optional[str]) -> Optional[str]:
+        """
+        The best stored candidate other than the current answer that fits the
+        query, if its pattern has any known letters to check it against.
+        """
+        if query.known_pattern is None:
+            return None
+        return next((
+            c.word for c in puzzle.get_candidates(query.handle)
+            if c.word != current and _fits(c.word, query)
+        ), None)
+
+    @staticmethod
+    def settle(puzzle: CrosswordPuzzle, answers: Dict[int, str],
+               crossings: List[List[Tuple[int, int, int]]], pairs: Set[Tuple[int, int]],
+               avoid: Mapping[int, Sequence[str]], skip: Iterable[int] = ()) -> List[int]:
+        """
+        Swap in stored candidates on either side of disagreeing pairs, before
+        anything is re-asked. A candidate qualifies if it keeps every crossing
+        its clue's answer agreed with and settles at least one disagreement;
+        the one settling most, then the highest scored, is taken first, and
+        so on while any qualify. Handles in skip are left alone. Returns the
+        handles changed, in order.
+        """
+        skip = set(skip)
+        changed = []
+        pairs = set(pairs)
+        while pairs:
+            best = None
+            for handle in sorted({h for pair in pairs for h in pair} - skip):
+                answer = answers[handle]
+                for candidate in puzzle.get_candidates(handle):
+                    word = candidate.word
+                    if word == answer or word in avoid.get(handle, ()) or len(word) != len(answer):
+                        continue
+                    settled = 0
+                    for pos, other, other_pos in crossings[handle]:
+                        other_answer = answers.get(other)
+                        if other_answer is None:
+                            continue
+                        was = answer[pos] == other_answer[other_pos]
+                        now = word[pos] == other_answer[other_pos]
+                        if was and not now:
+                            break
+                        settled += now and not was
+                    else:
+                        if settled and (best is None or (settled, candidate.score) > best[:2]):
+                            best = (settled, candidate.score, handle, word)
+            if best is None:
+                break
+            _, _, handle, word = best
+            answers[handle] = word
+            puzzle.set_clue_chars(handle, list(word))
+            changed.append(handle)
+            pairs, _ = disagreements(answers, crossings, range(len(puzzle.clues)))
+        return changed
+
+    async def refine(self, puzzle: CrosswordPuzzle, answers: Mapping[int, str]) -> RefineResult:
+        """
+        Re-solve the conflicting and unfilled slots of a puzzle until it is consistent.
+
+        Args:
+            puzzle: The puzzle, with the first pass answers already in the grid
+            answers: The answer each clue was given, by handle
+        """
+        answers = dict(answers)
+        crossings = crossing_handles(puzzle)
+        attempts: Counter = Counter()
+        avoid: Dict[int, List[str]] = {}
+        asked: Dict[int, str] = {}
+        start = self.solver.requests
+        rounds = 0
+        local = 0
+        remaining: List[int] = []
+
+        while True:
+            conflicting, unfilled = unresolved_slots(puzzle, answers)
+            remaining = conflicting + unfilled
+            pairs, support = disagreements(answers, crossings, range(len(puzzle.clues)))
+            spent = {h for h, count in attempts.items() if count >= self.max_attempts}
+            settled = self.settle(puzzle, answers, crossings, pairs, avoid, spent)
+            if settled:
+                for handle in settled:
+                    attempts[handle] += 1
+                    asked[handle] = answers[handle]
+                local += len(settled)
+                continue
+            share = {handle: answer_share(puzzle, handle, answer) for handle, answer in answers.items()}
+            targets = set(unfilled) | cover_disagreements(pairs, support, share)
+            targets = {h for h in targets if attempts[h] < self.max_attempts}
+            if not targets:
+                # Clues left to ask may have been paired with clues out of attempts
+                targets = {h for h in remaining if attempts[h] < self.max_attempts}
+            budget = self.max_requests - (self.solver.requests - start)
+            if not targets or rounds >= self.max_rounds or budget <= 0:
+                break
+            rounds += 1
+
+            for handle in conflicting:
+                # The model gave this answer last time too, and it still conflicts
+                if handle in targets and asked.get(handle) == answers[handle]:
+                    avoid.setdefault(handle, []).append(answers[handle])
+
+            queries = []
+            for handle in targets:
+                pattern = self.pattern(puzzle, handle, answers, crossings[handle], targets)
+                query = ClueQuery(
+                    handle=handle, clue=puzzle.clues[handle], pattern=pattern,
+                    avoid=avoid.get(handle, []),
+                    priority=constrainedness(puzzle, handle, pattern),
+                )
+                word = self.stored(puzzle, query, answers.get(handle))
+                if word is None:
+                    queries.append(query)
+                    continue
+                attempts[handle] += 1
+                local += 1
+                asked[handle] = answers[handle] = word
+                puzzle.set_clue_chars(handle, list(word))
+            # Most constrained first, so a tight budget goes where answers are likeliest
+            queries.sort(key=lambda q: -sum(char not in WILDCARDS for char in q.pattern) / len(q.pattern))
+
+            by_handle = {query.handle: query for query in queries[:budget]}
+            async for result in self.solver.solve_queries(by_handle.values()):
+                query = by_handle[result.handle]
+                attempts[result.handle] += 1
+                if not result.ok or not _fits(result.word, query):
+                    continue
+                asked[result.handle] = result.word
+                answers[result.handle] = result.word
+                apply_result(puzzle, result)
+
+        return RefineResult(
+            answers=answers,
+            rounds=rounds,
+            requests=self.solver.requests - start,
+            converged=not remaining,
+            remaining=sorted(remaining),
+            local=local,
+        )
+
+
+def _fits(word: str, query: ClueQuery) -> bool:
+    if len(word) != query.clue.length or word in query.avoid:
+        return False
+    return all(p in WILDCARDS or p == w for w, p in zip(word, query.pattern or ""))
+
+
+def solve_and_refine(puzzle: CrosswordPuzzle, backend=None, config=None, cache=None,
+                     max_requests: int = 50, **kwargs) -> RefineResult:
+    """
+    Blocking first pass with ClueSolver.solve_puzzle followed by refinement,
+    for scripts, through run_blocking. Other keyword arguments go to
+    solve_puzzle.
+    """
+    async def run(shared) -> RefineResult:
+        solver = ClueSolver(shared, config, cache)
+        answers = answers_from_results(await solver.solve_puzzle(puzzle, **kwargs))
+        return await Refiner(solver, max_requests=max_requests).refine(puzzle, answers)
+
+    return run_blocking(backend, run)
@@ -0,0 +1,244 @@
+"""
+Rate-limit-aware request scheduling in front of a backend.
+
+Scheduler is itself an AsyncBackend. Requests wait in a priority queue,
+highest CompletionRequest.priority first, and are only sent once a
+concurrency slot is free and the request and token buckets can cover them,
+so the provider's per-minute limits are rarely hit at all. A request that
+is refused anyway, or fails transiently, is retried after a jittered
+exponential backoff, or after the provider's retry-after when it gives one,
+and keeps its place in the priority order. Streamed requests are scheduled
+the same way, but only retried if they fail before their first chunk.
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from .backends import (
+    AsyncBackend, BackendError, Completion, CompletionRequest, RateLimited, StreamingBackend,
+    as_async_backend, estimate_tokens,
+)
+
+# Failures worth retrying besides RateLimited
+TRANSIENT_ERRORS = (BackendError, asyncio.TimeoutError, ConnectionError)
+
+
+class TokenBucket:
+    """
+    Refills continuously at rate_per_minute up to capacity. The default
+    capacity is ten seconds' worth, as providers tend to enforce per-minute
+    limits over shorter windows, so a full minute's burst would be refused.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount tokens are available, 0 if they are now"""
+        self._refill()
+        # A request larger than the bucket only waits for a full bucket
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= amount
+
+    def give(self, amount: float) -> None:
+        """Return tokens that were reserved but not used"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RetryPolicy(BaseModel):
+    max_retries: int = Field(default=5, ge=0)
+    base_delay: float = Field(default=0.5, ge=0)
+    max_delay: float = Field(default=30.0, ge=0)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None,
+              rng: Optional[random.Random] = None) -> float:
+        """
+        Seconds to wait before retry number attempt + 1: the provider's
+        retry-after plus up to 10% jitter when given, otherwise full jitter
+        over an exponential backoff.
+        """
+        rng = rng or random
+        if retry_after is not None:
+            return retry_after * (1 + 0.1 * rng.random())
+        return rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class SchedulerStats(BaseModel):
+    sent: int = 0
+    completed: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+    failed: int = 0
+    # Seconds requests spent waiting for a slot or for tokens
+    queued_seconds: float = 0.0
+
+
+class Scheduler:
+    """A priority queue with request and token buckets and retries in front of a backend"""
+
+    def __init__(self, backend, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: int = 8,
+                 retry: Optional[RetryPolicy] = None, seed: Optional[int] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        self.backend: AsyncBackend = as_async_backend(backend)
+        self.requests = TokenBucket(requests_per_minute, clock=clock) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.retry = retry or RetryPolicy()
+        self.stats = SchedulerStats()
+        self._rng = random.Random(seed)
+        self._clock = clock
+        self._active = 0
+        # (-priority, sequence, token cost, future)
+        self._queue: List[Tuple[float, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    @staticmethod
+    def cost(request: CompletionRequest) -> int:
+        """Tokens a request may use: its prompt and the most it may generate"""
+        return sum(estimate_tokens(m["content"]) for m in request.messages) + request.max_tokens
+
+    def _dispatch(self) -> None:
+        """Admit queued requests, best priority first, while slots and tokens allow"""
+        self._timer = None
+        while self._queue and self._active < self.max_concurrency:
+            _, _, cost, future = self._queue[0]
+            if future.done():
+                # Cancelled while waiting
+                heapq.heappop(self._queue)
+                continue
+            wait = max(
+                self.requests.wait_time(1) if self.requests else 0.0,
+                self.tokens.wait_time(cost) if self.tokens else 0.0,
+            )
+            if wait > 0:
+                # The head keeps its turn; nothing jumps ahead of a higher priority
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(cost)
+            self._active += 1
+            future.set_result(None)
+
+    async def _admit(self, priority: float, cost: int) -> None:
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (-priority, next(self._sequence), cost, future))
+        if self._timer is None:
+            self._dispatch()
+        start = self._clock()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as it was cancelled: hand the slot on
+                self._release()
+            raise
+        self.stats.queued_seconds += self._clock() - start
+
+    def _release(self) -> None:
+        self._active -= 1
+        if self._timer is None:
+            self._dispatch()
+
+    async def acomplete(self, request: CompletionRequest) -> Completion:
+        cost = self.cost(request)
+        for attempt in itertools.count():
+            await self._admit(request.priority, cost)
+            try:
+                self.stats.sent += 1
+                completion = await self.backend.acomplete(request)
+            except RateLimited as e:
+                self.stats.rate_limited += 1
+                error, retry_after = e, e.retry_after
+            except TRANSIENT_ERRORS as e:
+                error, retry_after = e, None
+            else:
+                self.stats.completed += 1
+                used = completion.prompt_tokens + completion.completion_tokens
+                if self.tokens and used:
+                    self.tokens.give(max(0, cost - used))
+                return completion
+            finally:
+                self._release()
+            await self._backoff(attempt, error, retry_after)
+
+    async def astream(self, request: CompletionRequest) -> AsyncIterator[str]:
+        """
+        The reply in chunks, streamed if the backend can and otherwise whole.
+        A failure after the first chunk is raised rather than retried.
+        """
+        cost = self.cost(request)
+        for attempt in itertools.count():
+            await self._admit(request.priority, cost)
+            started = False
+            try:
+                self.stats.sent += 1
+                if isinstance(self.backend, StreamingBackend):
+                    stream = self.backend.astream(request)
+                    try:
+                        async for chunk in stream:
+                            started = True
+                            yield chunk
+                    finally:
+                        await stream.aclose()
+                else:
+                    completion = await self.backend.acomplete(request)
+                    started = True
+                    yield completion.text
+            except RateLimited as e:
+                if started:
+                    raise
+                self.stats.rate_limited += 1
+                error, retry_after = e, e.retry_after
+            except TRANSIENT_ERRORS as e:
+                if started:
+                    raise
+                error, retry_after = e, None
+            else:
+                self.stats.completed += 1
+                return
+            finally:
+                self._release()
+            await self._backoff(attempt, error, retry_after)
+
+    async def _backoff(self, attempt: int, error: Exception, retry_after: Optional[float]) -> None:
+        """Wait before retrying a failed attempt, or raise its error if out of retries"""
+        if attempt >= self.retry.max_retries:
+            self.stats.failed += 1
+            raise error
+        self.stats.retries += 1
+        await asyncio.sleep(self.retry.delay(attempt, retry_after, self._rng))
+
+    async def aclose(self) -> None:
+        aclose = getattr(self.backend, "aclose", None)
+        if aclose is not None:
+            await aclose()
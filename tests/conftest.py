@@ -0,0 +1,20 @@
+import pytest
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.types import Clue, Direction
+
+@pytest.fixture
+def puzzle():
+    """
+    C A T - -
+    O - E - -
+    W - A - -
+    - - R - -
+    """
+    return CrosswordPuzzle(width=5, height=5, clues=[
+        Clue(number=1, text="Feline friend", direction=Direction.ACROSS,
+             length=3, row=0, col=0, answer="CAT"),
+        Clue(number=1, text="Dairy farm animal", direction=Direction.DOWN,
+             length=3, row=0, col=0, answer="COW"),
+        Clue(number=2, text="A drop of sadness", direction=Direction.DOWN,
+             length=4, row=0, col=2, answer="TEAR"),
+    ])
@@ -0,0 +1,73 @@
+import time
+
+import pytest
+from src.solver.answer_cache import AnswerCache, normalize_clue
+
+@pytest.fixture
+def cache(tmp_path):
+    with AnswerCache(tmp_path / "answers.sqlite") as cache:
+        yield cache
+
+class TestAnswerCache:
+    def test_normalize_clue(self):
+        assert normalize_clue("  Café, au LAIT!  ") == "cafe au lait"
+        assert normalize_clue("Feline friend (3)") == normalize_clue("feline  friend 3")
+
+    def test_key_normalizes_clue_and_separates_fields(self):
+        key = AnswerCache.key("gpt-4o", "1", "Feline friend!", 3)
+        assert key == AnswerCache.key("gpt-4o", "1", "feline friend", 3, "???")
+        assert key != AnswerCache.key("gpt-4o", "2", "Feline friend", 3)
+        assert key != AnswerCache.key("gpt-4", "1", "Feline friend", 3)
+        assert key != AnswerCache.key("gpt-4o", "1", "Feline friend", 3, "C??")
+        assert key != AnswerCache.key("gpt-4o", "1", "Feline friend", 4)
+
+    def test_hits_misses_and_persistence(self, tmp_path, cache):
+        key = cache.key("gpt-4o", "1", "Feline friend", 3)
+        assert cache.get(key) is None
+        cache.put(key, "CAT", "The answer is CAT")
+        assert cache.get(key).word == "CAT"
+        assert cache.stats().hits == 1 and cache.stats().misses == 1
+        assert cache.stats().hit_rate == 0.5
+
+        with AnswerCache(tmp_path / "answers.sqlite") as reopened:
+            assert reopened.get(key).raw == "The answer is CAT"
+
+    def test_ttl(self, tmp_path):
+        with AnswerCache(tmp_path / "answers.sqlite", ttl=0.05) as cache:
+            cache.put("a", "CAT")
+            assert cache.get("a") is not None
+            time.sleep(0.1)
+            assert cache.get("a") is None
+            assert len(cache) == 0
+
+    def test_lru_eviction(self, tmp_path):
+        with AnswerCache(tmp_path / "answers.sqlite", max_entries=2) as cache:
+            cache.put("a", "CAT")
+            time.sleep(0.01)
+            cache.put("b", "COW")
+            time.sleep(0.01)
+            cache.get("a")
+            time.sleep(0.01)
+            cache.put("c", "TEAR")
+            assert len(cache) == 2
+            assert cache.get("b") is None
+            assert cache.get("a").word == "CAT"
+
+    def test_entry_count_is_tracked(self, tmp_path):
+        with AnswerCache(tmp_path / "answers.sqlite", max_entries=3) as cache:
+            for _ in range(3):
+                cache.put("a", "CAT")
+            cache.put("b", "COW")
+            assert cache._entries == len(cache) == 2
+            cache.put("c", "TEAR")
+            cache.put("d", "SEAR")
+            assert cache._entries == len(cache) == 3
+        with AnswerCache(tmp_path / "answers.sqlite", max_entries=3) as reopened:
+            assert reopened._entries == 3
+
+    def test_expired_entries_are_swept_on_put(self, tmp_path):
+        with AnswerCache(tmp_path / "answers.sqlite", ttl=0.05) as cache:
+            cache.put("a", "CAT")
+            time.sleep(0.1)
+            cache.put("b", "COW")
+            assert len(cache) == 1 and cache._entries == 1
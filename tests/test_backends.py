@@ -0,0 +1,150 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from src.crossword.utils import load_puzzle
+from src.solver.backends import (
+    ChatClientBackend, CompletionRequest, RateLimited, StubBackend, StubConfig,
+    ThreadedBackend, as_async_backend,
+)
+from src.solver.batching import BatchSolver
+from src.solver.pipeline import ClueSolver, SolverConfig, clue_prompt
+
+def request(prompt, **kwargs):
+    return CompletionRequest(model="stub", messages=[{"role": "user", "content": prompt}], **kwargs)
+
+def solve(solver, puzzle):
+    return {r.handle: r for r in asyncio.run(solver.solve_puzzle(puzzle))}
+
+class TestStubBackend:
+    def test_single_clue_prompts(self):
+        puzzle = load_puzzle("data/hard.puz")
+        backend = StubBackend(puzzle)
+        results = solve(ClueSolver(backend), puzzle)
+        assert all(r.ok for r in results.values())
+        assert puzzle.validate_all() is True
+        assert backend.stats.requests == len(puzzle.clues)
+
+        completion = backend.complete(request(clue_prompt(puzzle.clues[0])))
+        assert puzzle.clues[0].answer in completion.text
+        assert completion.prompt_tokens > 0 and completion.completion_tokens > 0
+
+    def test_custom_clue_templates(self):
+        puzzle = load_puzzle("data/medium.puz")
+        backend = StubBackend(puzzle)
+        config = SolverConfig(clue_template=("Provide a {length}-letter word that fits the clue: "
+                                             "'{text}'. Only return the word, nothing else."))
+        results = solve(ClueSolver(backend, config), puzzle)
+        assert all(r.ok for r in results.values())
+        assert puzzle.validate_all() is True
+
+    def test_stats_are_counted_across_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        puzzle = load_puzzle("data/cryptic.puz")
+        backend = StubBackend(puzzle, error_rate=0.2)
+        prompts = [clue_prompt(clue) for clue in puzzle.clues] * 20
+
+        def send(prompt):
+            try:
+                return backend.complete(request(prompt)).completion_tokens
+            except Exception:
+                return 0
+
+        with ThreadPoolExecutor(8) as pool:
+            tokens = sum(pool.map(send, prompts))
+        stats = backend.stats
+        assert stats.requests == len(prompts)
+        assert stats.clues + stats.errors == len(prompts)
+        assert stats.completion_tokens == tokens
+
+    def test_batch_prompts(self):
+        puzzle = load_puzzle("data/cryptic.puz")
+        backend = StubBackend(puzzle, candidates=2)
+        solver = BatchSolver(backend)
+        results = solve(solver, puzzle)
+        assert puzzle.validate_all() is True
+        assert solver.requests == backend.stats.requests == 1
+        assert all(len(r.candidates) <= 2 for r in results.values())
+
+    def test_noise_and_errors_are_reproducible(self):
+        def run():
+            puzzle = load_puzzle("data/cryptic.puz")
+            backend = StubBackend(puzzle, StubConfig(seed=3, noise=0.3, error_rate=0.2))
+            results = solve(ClueSolver(backend), puzzle)
+            return {h: (r.word, r.error) for h, r in results.items()}, backend.stats
+
+        first, stats = run()
+        second, _ = run()
+        assert first == second
+        assert 0 < stats.errors < stats.requests
+        assert 0 < stats.noisy < stats.clues
+        assert sum(error is not None for _, error in first.values()) == stats.errors
+
+    def test_latency(self):
+        puzzle = load_puzzle("data/easy.puz")
+        backend = StubBackend(puzzle, latency=0.05)
+        config = SolverConfig(max_concurrency=3)
+        began = time.perf_counter()
+        solve(ClueSolver(backend, config), puzzle)
+        assert 0.05 <= time.perf_counter() - began < 0.15
+
+    def test_rate_limits(self):
+        puzzle = load_puzzle("data/easy.puz")
+        backend = StubBackend(puzzle, requests_per_minute=2)
+        prompt = clue_prompt(puzzle.clues[0])
+        backend.complete(request(prompt))
+        backend.complete(request(prompt))
+        with pytest.raises(RateLimited) as info:
+            backend.complete(request(prompt))
+        assert 0 < info.value.retry_after <= 60
+        assert backend.stats.rate_limited == 1
+
+        backend = StubBackend(puzzle, tokens_per_minute=100)
+        with pytest.raises(RateLimited):
+            backend.complete(request(prompt, max_tokens=200))
+
+    def test_streaming_saves_tokens(self):
+        def run(stream):
+            puzzle = load_puzzle("data/hard.puz")
+            backend = StubBackend(puzzle, latency=0.01)
+            solver = ClueSolver(backend, SolverConfig(stream=stream))
+            solve(solver, puzzle)
+            assert puzzle.validate_all() is True
+            return backend.stats, solver
+
+        full, _ = run(False)
+        streamed, solver = run(True)
+        assert solver.early_stops == full.requests == streamed.requests
+        assert streamed.completion_tokens < full.completion_tokens
+
+class TestAdapters:
+    def test_chat_client_translates_rate_limits(self):
+        class RateLimitError(Exception):
+            response = SimpleNamespace(headers={"retry-after": "7"})
+
+        def create(**kwargs):
+            raise RateLimitError("slow down")
+
+        backend = ChatClientBackend(SimpleNamespace(chat=SimpleNamespace(
+            completions=SimpleNamespace(create=create)
+        )))
+        with pytest.raises(RateLimited) as info:
+            backend.complete(request("hi"))
+        assert info.value.retry_after == 7.0
+
+    def test_sync_backends_are_awaitable(self):
+        puzzle = load_puzzle("data/easy.puz")
+
+        class Blocking:
+            def complete(self, request):
+                return stub.complete(request)
+
+        stub = StubBackend(puzzle)
+        backend = as_async_backend(Blocking())
+        assert isinstance(backend, ThreadedBackend)
+        results = solve(ClueSolver(Blocking()), puzzle)
+        assert all(r.ok for r in results.values())
+        with pytest.raises(TypeError):
+            as_async_backend(object())
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+
+import pytest
+from src.crossword.types import Candidate
+from src.crossword.utils import load_puzzle
+from src.solver.backends import StubBackend
+from src.solver.batching import (
+    BatchConfig, BatchSolver, batch_entries, batch_prompt, parse_batch_response, plan_batches,
+)
+
+PUZZLE = "data/hard.puz"
+
+class BatchClient:
+    """Answers batch prompts in JSON from the puzzle's own answers, and single clues in text"""
+
+    def __init__(self, puzzle, broken=(), garbage_over=None):
+        self.puzzle = puzzle
+        self.broken = set(broken)
+        self.garbage_over = garbage_over
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        self.prompts.append((prompt, kwargs))
+        await asyncio.sleep(0)
+        ids = [int(i) for i in re.findall(r"^(\d+)\. ", prompt, re.MULTILINE)]
+        if not ids:
+            clue = next(c for c in self.puzzle.clues if c.text in prompt)
+            content = f"The answer is '{clue.answer}'."
+        elif self.garbage_over is not None and len(ids) > self.garbage_over:
+            content = '{"answers": [{"id": '
+        else:
+            answers = [
+                {"id": i, "candidates": ["?" * 3 if i in self.broken else self.puzzle.clues[i].answer, "x"]}
+                for i in ids
+            ]
+            content = "```json\n" + json.dumps({"answers": answers}) + "\n```"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+class TestBatching:
+    def test_plan_batches_respects_budgets(self):
+        puzzle = load_puzzle(PUZZLE)
+        all_entries = batch_entries(puzzle)
+        config = BatchConfig(max_prompt_tokens=200, max_clues=5)
+        batches = plan_batches(all_entries, config)
+        assert [e for batch in batches for e in batch] == all_entries
+        assert all(len(batch) <= 5 for batch in batches)
+        assert len(plan_batches(all_entries, BatchConfig())) == 1
+
+    def test_prompt_lists_pattern(self):
+        puzzle = load_puzzle(PUZZLE)
+        clue = puzzle.clues[0]
+        crossing = puzzle.crossings(0)[0]
+        puzzle.set_clue_chars(crossing.clue, list(crossing.clue.answer))
+        pattern = ["?"] * clue.length
+        pattern[crossing.position] = clue.answer[crossing.position]
+        prompt = batch_prompt(batch_entries(puzzle)[:1], BatchConfig())
+        assert f"pattern {''.join(pattern)}: {clue.text}" in prompt
+
+    def test_parse_batch_response(self):
+        puzzle = load_puzzle("data/easy.puz")
+        batch = batch_entries(puzzle)
+        puzzle.set_clue_chars(2, list("T???"))
+        batch[2] = batch_entries(puzzle)[2]
+        reply = 'Sure! {"answers": [{"id": 0, "candidates": ["cat", "bat", "cats", "c-a-t"]},' \
+                ' {"id": "2", "candidates": ["BEAR"]}, {"id": 9, "candidates": ["X"]}]}'
+        assert parse_batch_response(reply, batch) == {
+            0: [Candidate(word="CAT", score=1.0), Candidate(word="BAT", score=0.5)],
+        }
+        assert parse_batch_response('{"1": "cow"}', batch) == {1: [Candidate(word="COW", score=1.0)]}
+        with pytest.raises(ValueError):
+            parse_batch_response("no json here", batch)
+
+    def test_batches_with_per_clue_fallback(self):
+        puzzle = load_puzzle(PUZZLE)
+        client = BatchClient(puzzle, broken={3, 7})
+        solver = BatchSolver(client, batch_config=BatchConfig(max_clues=10))
+        results = asyncio.run(solver.solve_puzzle(puzzle))
+
+        assert sorted(r.handle for r in results) == list(range(len(puzzle.clues)))
+        assert all(r.ok for r in results)
+        assert puzzle.validate_all() is True
+        batches = -(-len(puzzle.clues) // 10)
+        assert solver.requests == batches + 2 and solver.fallbacks == 2
+        assert len(client.prompts) == batches + 2
+        assert client.prompts[0][1]["response_format"] == {"type": "json_object"}
+        assert next(r for r in results if r.handle == 0).candidates[0].score == 1.0
+
+    def test_unusable_batch_is_split(self):
+        puzzle = load_puzzle(PUZZLE)
+        client = BatchClient(puzzle, garbage_over=4)
+        solver = BatchSolver(client, batch_config=BatchConfig(max_clues=16, min_split=2))
+        results = asyncio.run(solver.solve_puzzle(puzzle, clues=range(16)))
+        assert all(r.ok for r in results)
+        # 16 fails, 2 x 8 fail, 4 x 4 succeed
+        assert solver.requests == 7 and solver.fallbacks == 0
+
+    def test_batch_answers_are_cached(self, tmp_path):
+        from src.solver.answer_cache import AnswerCache
+
+        puzzle = load_puzzle("data/easy.puz")
+        with AnswerCache(tmp_path / "answers.sqlite") as cache:
+            fresh = asyncio.run(BatchSolver(BatchClient(puzzle), cache=cache).solve_puzzle(puzzle, apply=False))
+            client = BatchClient(puzzle)
+            results = asyncio.run(BatchSolver(client, cache=cache).solve_puzzle(puzzle))
+            assert all(r.cached for r in results) and not client.prompts
+            # Cached answers keep their ranked candidates
+            by_handle = {r.handle: r.candidates for r in fresh}
+            assert all(r.candidates and r.candidates == by_handle[r.handle] for r in results)
+
+    def test_cached_batch_answers_keep_ranked_candidates(self, tmp_path):
+        from src.solver.answer_cache import AnswerCache
+
+        puzzle = load_puzzle("data/cryptic.puz")
+        with AnswerCache(tmp_path / "answers.sqlite") as cache:
+            solve = lambda: asyncio.run(BatchSolver(StubBackend(puzzle, seed=1, noise=0.3), cache=cache)
+                                        .solve_puzzle(puzzle, apply=False))
+            fresh, cached = solve(), solve()
+            assert all(r.cached for r in cached)
+            assert any(len(r.candidates) > 1 for r in cached)
+            assert {r.handle: r.candidates for r in cached} == {r.handle: r.candidates for r in fresh}
@@ -0,0 +1,87 @@
+import os
+import shutil
+import struct
+
+import pytest
+from src.crossword.cache import PuzzleCache
+from src.crossword.utils import load_puzzle
+
+class TestPuzzleCache:
+    def test_repeat_load_hits_cache(self, tmp_path):
+        cache = PuzzleCache(tmp_path / "cache")
+        first = load_puzzle("data/medium.puz", cache=cache)
+        second = load_puzzle("data/medium.puz", cache=cache)
+
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert second.clues == first.clues
+        assert second.compact_grid == first.compact_grid
+        assert second.validate_all() is False
+
+    def test_key_is_content_not_path(self, tmp_path):
+        cache = PuzzleCache(tmp_path / "cache")
+        copy = tmp_path / "copy.puz"
+        shutil.copy("data/easy.puz", copy)
+
+        load_puzzle("data/easy.puz", cache=cache)
+        load_puzzle(str(copy), cache=cache)
+        assert cache.hits == 1
+        assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        directory = tmp_path / "cache"
+        sizes = {}
+        for name in ("easy", "medium", "hard"):
+            probe = PuzzleCache(tmp_path / name)
+            load_puzzle(f"data/{name}.puz", cache=probe)
+            sizes[name] = sum(path.stat().st_size for path in (tmp_path / name).iterdir())
+
+        cache = PuzzleCache(directory, max_bytes=sizes["medium"] + sizes["hard"])
+        load_puzzle("data/easy.puz", cache=cache)
+        load_puzzle("data/medium.puz", cache=cache)
+        # Make easy the most recently used, so medium is evicted instead
+        for path in directory.iterdir():
+            os.utime(path, (0, 0))
+        load_puzzle("data/easy.puz", cache=cache)
+        load_puzzle("data/hard.puz", cache=cache)
+
+        assert sum(path.stat().st_size for path in directory.iterdir()) <= cache.max_bytes
+        hits = cache.hits
+        load_puzzle("data/easy.puz", cache=cache)
+        assert cache.hits == hits + 1
+        load_puzzle("data/medium.puz", cache=cache)
+        assert cache.hits == hits + 1
+
+    def test_size_is_tracked_without_scanning(self, tmp_path, monkeypatch):
+        directory = tmp_path / "cache"
+        load_puzzle("data/easy.puz", cache=PuzzleCache(directory))
+        cache = PuzzleCache(directory)
+        monkeypatch.setattr(cache, "_entries", lambda: pytest.fail("scanned below the limit"))
+        load_puzzle("data/medium.puz", cache=cache)
+        load_puzzle("data/hard.puz", cache=cache)
+        assert cache._size == sum(path.stat().st_size for path in directory.iterdir())
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        cache = PuzzleCache(tmp_path)
+        load_puzzle("data/easy.puz", cache=cache)
+        for path in tmp_path.iterdir():
+            path.write_bytes(b"garbage")
+
+        puzzle = load_puzzle("data/easy.puz", cache=cache)
+        assert len(puzzle.clues) == 3
+        assert cache.misses == 2
+
+    def test_entry_with_invalid_clues_is_evicted(self, tmp_path):
+        cache = PuzzleCache(tmp_path)
+        load_puzzle("data/easy.puz", cache=cache)
+        (entry,) = tmp_path.iterdir()
+        data = bytearray(entry.read_bytes())
+        # Move the first clue's column off the grid: header, then number, direction and row
+        struct.pack_into("<H", data, 20 + 4 + 1 + 2, 60000)
+        entry.write_bytes(bytes(data))
+
+        puzzle = load_puzzle("data/easy.puz", cache=cache)
+        assert len(puzzle.clues) == 3
+        assert cache.misses == 2
+        # The bad entry was replaced by a good one
+        load_puzzle("data/easy.puz", cache=cache)
+        assert cache.hits == 1
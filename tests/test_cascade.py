@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from src.crossword.types import Candidate
+from src.crossword.utils import load_puzzle
+from src.solver.backends import Completion, StubBackend
+from src.solver.cascade import Cascade, agreement, support
+from src.solver.pipeline import ClueResult
+
+class ByModel:
+    """Replies per model and clue, recording (model, prompt) pairs"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.requests = []
+
+    async def acomplete(self, request):
+        self.requests.append((request.model, request.prompt))
+        replies = self.replies[request.model]
+        key = next(key for key in replies if key in request.prompt)
+        return Completion(text=f"'{replies[key]}'", model=request.model)
+
+class TestConfidence:
+    def test_confidence_signals(self):
+        assert agreement(ClueResult(handle=0, word="CAT")) == 0.5
+        lone = ClueResult(handle=0, word="CAT", candidates=[Candidate(word="CAT", score=1.0)])
+        assert agreement(lone) == 1.0
+        ranked = ClueResult(handle=0, word="CAT", candidates=[
+            Candidate(word="CAT", score=1.0), Candidate(word="COT", score=1.0)
+        ])
+        assert agreement(ranked) == 0.5
+
+        crossings = [(0, 1, 0), (2, 2, 0)]
+        assert support(0, {0: "CAT"}, crossings) == (0.5, 0)
+        assert support(0, {0: "CAT", 1: "COW", 2: "SEAR"}, crossings) == (0.5, 1)
+
+class TestCascade:
+    def test_escalates_only_doubtful_clues(self, puzzle):
+        backend = ByModel({
+            "fast": {"Feline": "CAT", "Dairy": "COW", "sadness": "SEAR"},
+            "big": {"sadness": "TEAR"},
+        })
+        cascade = Cascade.from_models(backend, ["fast", "big"])
+        result = asyncio.run(cascade.solve_puzzle(puzzle))
+
+        assert result.answers == {0: "CAT", 1: "COW", 2: "TEAR"}
+        assert result.tier == {0: 0, 1: 0, 2: 1}
+        assert puzzle.validate_all() is True
+        fast, big = result.tiers
+        assert (fast.clues, fast.accepted, fast.escalated, fast.requests) == (3, 2, 1, 3)
+        assert (big.clues, big.accepted, big.requests) == (1, 1, 1)
+        assert fast.hit_rate == pytest.approx(2 / 3)
+        # The escalated clue is given the letters of its accepted crossing
+        model, prompt = backend.requests[-1]
+        assert model == "big" and "T???" in prompt
+
+    def test_single_tier_keeps_every_answer(self, puzzle):
+        backend = ByModel({"fast": {"Feline": "CAT", "Dairy": "COW", "sadness": "SEAR"}})
+        result = asyncio.run(Cascade.from_models(backend, ["fast"]).solve_puzzle(puzzle))
+        assert result.answers[2] == "SEAR"
+        assert len(result.tiers) == 1 and result.tiers[0].escalated == 0
+
+    @pytest.mark.parametrize("batch", [False, True])
+    def test_stub_cascade_reaches_large_model_accuracy(self, batch):
+        puzzle = load_puzzle("data/cryptic.puz")
+        stub = StubBackend(puzzle, seed=1, noise_by_model={"fast": 0.3})
+        result = asyncio.run(Cascade.from_models(stub, ["fast", "big"], batch=batch).solve_puzzle(puzzle))
+        fast, big = result.tiers
+        assert 0 < fast.escalated < fast.clues
+        assert big.clues == fast.escalated
+        correct = sum(result.answers.get(h) == clue.answer for h, clue in enumerate(puzzle.clues))
+        assert correct >= len(puzzle.clues) - 1
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+from src.crossword.utils import load_puzzle
+from src.solver.backends import StubBackend
+from src.solver.batching import BatchSolver
+from src.solver.corpus import ClueCorpus, corpus_text
+from src.solver.pipeline import ClueSolver
+
+@pytest.fixture
+def corpus(tmp_path):
+    with ClueCorpus(tmp_path / "corpus.sqlite") as corpus:
+        yield corpus
+
+GUARDIAN = {
+    "id": "crosswords/cryptic/1",
+    "name": "Cryptic crossword No 1",
+    "entries": [
+        {"clue": "Feline friend (3)", "solution": "CAT"},
+        {"clue": "Fruit of a palm tree (4)", "solution": "DATE"},
+        {"clue": "See 1", "solution": "ANYTHING"},
+        {"clue": "Not yet solved (4)"},
+    ],
+}
+
+class TestClueCorpus:
+    def test_corpus_text_drops_enumeration(self):
+        assert corpus_text("Feline friend (3)") == corpus_text("feline friend!")
+        assert corpus_text("Pick-me-up (3,2)") == "pick me up"
+        assert corpus_text("Catch 22") == "catch 22"
+
+    def test_guardian_entries(self, corpus):
+        assert corpus.add_guardian(GUARDIAN) == 2
+        assert len(corpus) == 2
+        assert [c.word for c in corpus.exact("Feline friend (3)")] == ["CAT"]
+        assert corpus.exact("Feline friend") == []
+
+    def test_lookup_by_normalized_text_and_pattern(self, corpus):
+        corpus.add("Feline friend (3)", "cat")
+        corpus.add("Feline friend (3)", "CAT")
+        corpus.add("FELINE FRIEND", "Tom")
+        corpus.add("Feline friend", "MOGGY")
+
+        ranked = corpus.lookup("feline friend?", 3)
+        assert [c.word for c in ranked] == ["CAT", "TOM"]
+        assert [c.score for c in ranked] == pytest.approx([2 / 3, 1 / 3])
+        assert [c.word for c in corpus.lookup("Feline friend", 3, "T??")] == ["TOM"]
+        assert [c.word for c in corpus.lookup("Feline friend", 3, avoid=["cat"])] == ["TOM"]
+        assert corpus.lookup("Canine friend", 3) == []
+        assert corpus.stats().hits == 3 and corpus.stats().misses == 1
+
+    def test_words_by_pattern(self, corpus):
+        corpus.add_pairs([("Feline friend", "CAT"), ("Baby bed", "COT"), ("Wager", "BET"),
+                          ("Small bed", "COT")])
+        assert [c.word for c in corpus.words(3, "C?T")] == ["COT", "CAT"]
+        assert [c.word for c in corpus.words(3, "c_t", limit=1)] == ["COT"]
+        assert len(corpus.words(3)) == 3
+
+    def test_puz_files_and_persistence(self, tmp_path, corpus):
+        puzzle = load_puzzle("data/medium.puz")
+        assert corpus.add_file("data/medium.puz") == len(puzzle.clues)
+        corpus.close()
+        with ClueCorpus(tmp_path / "corpus.sqlite") as reopened:
+            for clue in puzzle.clues:
+                assert reopened.exact(clue.text)[0].word == clue.answer
+
+class TestSolvingFromCorpus:
+    @pytest.mark.parametrize("solver_type", [ClueSolver, BatchSolver])
+    def test_known_clues_need_no_requests(self, corpus, solver_type):
+        puzzle = load_puzzle("data/hard.puz")
+        corpus.add_puzzle(puzzle)
+        stub = StubBackend(puzzle)
+        solver = solver_type(stub, corpus=corpus)
+        results = asyncio.run(solver.solve_puzzle(puzzle))
+        assert all(r.ok and r.cached for r in results)
+        assert puzzle.validate_all() is True
+        assert stub.stats.requests == 0
+        assert solver.corpus_hits == len(puzzle.clues)
+
+    def test_unknown_clues_go_to_the_backend(self, corpus):
+        puzzle = load_puzzle("data/easy.puz")
+        known = puzzle.clues[0]
+        corpus.add(known.text, known.answer)
+        stub = StubBackend(puzzle)
+        solver = ClueSolver(stub, corpus=corpus)
+        results = asyncio.run(solver.solve_puzzle(puzzle))
+        assert all(r.ok for r in results)
+        assert solver.corpus_hits == 1
+        assert stub.stats.requests == len(puzzle.clues) - 1
@@ -1,7 +1,7 @@
 import pytest
 from src.crossword.crossword import CrosswordPuzzle
-from src.crossword.types import Clue, Direction
-from src.crossword.exceptions import InvalidClueError, InvalidGridError
+from src.crossword.types import Candidate, Clue, Direction
+from src.crossword.exceptions import InvalidClueError, InvalidGridError, CrossingConflictError
 
 @pytest.fixture
 def clues():
@@ -140,7 +140,66 @@ class TestCrosswordPuzzle:
             puzzle.get_current_clue_chars(invalid_clue)
 
     def test_undo(self, puzzle):
-        raise NotImplementedError
+        puzzle.set_clue_chars(puzzle.clues[0], list("CAT"))
+        puzzle.set_clue_chars(puzzle.clues[1], list("DOG"))
+
+        puzzle.undo()
+        assert len(puzzle.grid_history) == 2
+        assert puzzle.clue_history == [0]
+        assert puzzle.clues[1].answered is False
+        assert puzzle.get_current_clue_chars(puzzle.clues[0]) == list("CAT")
+        assert puzzle.get_current_clue_chars(puzzle.clues[1]) == ["C", None, None]
+
+        puzzle.undo()
+        assert puzzle.clues[0].answered is False
+        assert puzzle.get_current_clue_chars(puzzle.clues[0]) == [None, None, None]
+
+        # Nothing left to undo
+        with pytest.raises(InvalidGridError):
+            puzzle.undo()
+
+    def test_undo_restores_previous_answered_state(self, puzzle):
+        clue = puzzle.clues[0]
+        puzzle.set_clue_chars(clue, list("BAT"))
+        puzzle.set_clue_chars(clue, list("CAT"))
+
+        puzzle.undo()
+        assert clue.answered is True
+        assert puzzle.get_current_clue_chars(clue) == list("BAT")
+
+    def test_grid_history_views(self, puzzle):
+        puzzle.set_clue_chars(puzzle.clues[0], list("CAT"))
+        puzzle.set_clue_chars(puzzle.clues[2], list("TEAR"))
+
+        assert puzzle.grid_history[0].cells[0][0].value is None
+        assert puzzle.grid_history[1].cells[0][2].value == "T"
+        assert puzzle.grid_history[1].cells[1][2].value is None
+        assert puzzle.grid_history[-1].cells[3][2].value == "R"
+        assert puzzle.grid_history[-1] is puzzle.current_grid
+
+    def test_grid_history_keyframes(self, puzzle):
+        words = ["CAT", "BAT", "HAT", "RAT"]
+        for i in range(150):
+            puzzle.set_clue_chars(puzzle.clues[0], list(words[i % len(words)]))
+
+        assert len(puzzle.grid_history) == 151
+        for i in (1, 64, 65, 128, 150):
+            assert puzzle.grid_history[i].cells[0][0].value == words[(i - 1) % len(words)][0]
+
+        for _ in range(100):
+            puzzle.undo()
+        assert puzzle.grid_history[-1].cells[0][0].value == words[49 % len(words)][0]
+
+    def test_grid_history_round_trip(self, puzzle):
+        puzzle.set_clue_chars(puzzle.clues[0], list("CAT"))
+        puzzle.set_clue_chars(puzzle.clues[1], list("COW"))
+
+        restored = CrosswordPuzzle(**puzzle.model_dump())
+        assert len(restored.grid_history) == 3
+        assert restored.clue_history == [0, 1]
+        assert restored.get_current_clue_chars(restored.clues[1]) == list("COW")
+        restored.undo()
+        assert restored.get_current_clue_chars(restored.clues[1]) == ["C", None, None]
 
     def test_reset(self, puzzle):
         # Make some moves
@@ -201,3 +260,220 @@ class TestCrosswordPuzzle:
         assert current_grid.cells[2][0].value == "W"  # Third cell of COW
         assert current_grid.cells[1][2].value == "E"  # Second cell of TEAR
         assert current_grid.cells[2][2].value == "A"  # Third cell of TEAR
+
+    def test_set_clue_chars_rejects_multi_letter_cells(self, puzzle):
+        with pytest.raises(InvalidClueError):
+            puzzle.set_clue_chars(puzzle.clues[0], ["C", "AB", "T"])
+        assert len(puzzle.grid_history) == 1
+
+    def test_compact_grid_tracks_moves(self, puzzle):
+        puzzle.set_clue_chars(puzzle.clues[1], list("COW"))
+        snapshot = puzzle.compact_grid.copy()
+        assert snapshot[2, 0] == "W"
+
+        puzzle.undo()
+        assert puzzle.compact_grid[2, 0] is None
+        assert snapshot[2, 0] == "W"
+
+    def test_get_clues_overlapping_with_cell(self, puzzle):
+        cat, cow, tear = puzzle.clues
+        assert puzzle.get_clues_overlapping_with_cell(0, 0) == [cat, cow]
+        assert puzzle.get_clues_overlapping_with_cell(0, 2) == [cat, tear]
+        assert puzzle.get_clues_overlapping_with_cell(3, 2) == [tear]
+        assert puzzle.get_clues_overlapping_with_cell(4, 4) == []
+
+        with pytest.raises(InvalidGridError):
+            puzzle.get_clues_overlapping_with_cell(5, 0)
+
+    def test_crossings(self, puzzle):
+        cat, cow, tear = puzzle.clues
+        assert puzzle.crossings(cat) == [(0, cow, 0), (2, tear, 0)]
+        assert puzzle.crossings(tear) == [(0, cat, 2)]
+
+        # Crossings of clues added later are indexed both ways
+        puzzle.add_clue(Clue(
+            number=4, text="Armed conflict", direction=Direction.ACROSS,
+            length=3, row=2, col=0, answer="WAR"
+        ))
+        war = puzzle.clues[3]
+        assert puzzle.crossings(war) == [(0, cow, 2), (2, tear, 2)]
+        assert puzzle.crossings(tear) == [(0, cat, 2), (2, war, 2)]
+
+    def test_add_overlapping_clue(self, puzzle):
+        overlapping = Clue(
+            number=4, text="Overlaps CAT", direction=Direction.ACROSS,
+            length=3, row=0, col=1, answer="ATE"
+        )
+        with pytest.raises(InvalidClueError):
+            puzzle.add_clue(overlapping)
+        assert len(puzzle.clues) == 3
+
+    def test_clue_handles(self, puzzle):
+        cat = puzzle.clues[0]
+        assert puzzle.handle(cat) == 0
+        assert puzzle.handle(cat.model_copy()) == 0
+        assert puzzle.get_clue(3, Direction.DOWN) is puzzle.clues[2]
+
+        puzzle.set_clue_chars(1, list("COW"))
+        assert puzzle.get_current_clue_chars(1) == list("COW")
+        assert puzzle.clues[1].answered is True
+        assert puzzle.validate_clue_chars(1)
+
+        with pytest.raises(InvalidClueError):
+            puzzle.get_current_clue_chars(3)
+        with pytest.raises(InvalidClueError):
+            puzzle.get_clue(1, Direction.DOWN)
+
+    def test_add_clue_number_unique_per_direction(self, puzzle):
+        handle = puzzle.add_clue(Clue(
+            number=1, text="Cry of a crow", direction=Direction.DOWN,
+            length=3, row=0, col=4, answer="CAW"
+        ))
+        assert handle == 3
+        assert puzzle.get_clue(1, Direction.DOWN).answer == "CAW"
+
+        with pytest.raises(InvalidClueError):
+            puzzle.add_clue(Clue(
+                number=1, text="Duplicate", direction=Direction.ACROSS,
+                length=2, row=4, col=0, answer="AB"
+            ))
+
+    def test_validate_all_tracks_moves(self, puzzle):
+        assert puzzle.validate_all() is False
+        assert puzzle.progress().complete_clues == 0
+
+        puzzle.set_clue_chars(puzzle.clues[0], list("CAT"))
+        puzzle.set_clue_chars(puzzle.clues[1], list("COW"))
+        assert puzzle.validate_clue_chars(puzzle.clues[0])
+        assert puzzle.validate_clue_chars(puzzle.clues[1])
+        assert not puzzle.validate_clue_chars(puzzle.clues[2])
+
+        progress = puzzle.progress()
+        assert (progress.correct_cells, progress.total_cells) == (5, 8)
+        assert (progress.complete_clues, progress.total_clues) == (2, 3)
+        assert progress.fraction == 5 / 8
+
+        # A wrong crossing breaks CAT
+        puzzle.set_clue_chars(puzzle.clues[2], list("BEAR"))
+        assert not puzzle.validate_clue_chars(puzzle.clues[0])
+        assert puzzle.progress().complete_clues == 1
+
+        puzzle.set_clue_chars(puzzle.clues[2], list("TEAR"))
+        assert puzzle.validate_all() is True
+        assert puzzle.progress().fraction == 1.0
+
+        puzzle.undo()
+        assert puzzle.validate_all() is False
+        assert puzzle.progress().correct_cells == 7
+
+        puzzle.reset()
+        assert puzzle.progress().correct_cells == 0
+        assert puzzle.progress().complete_clues == 0
+
+    def test_validate_all_matches_full_scan(self, puzzle):
+        moves = [(0, "CAT"), (2, "TEAR"), (1, "CUT"), (0, "BAT"), (1, "COW"), (0, "CAT")]
+        for clue_idx, word in moves:
+            puzzle.set_clue_chars(clue_idx, list(word))
+            expected = all(
+                puzzle.get_current_clue_chars(clue) == list(clue.answer) for clue in puzzle.clues
+            )
+            assert puzzle.validate_all() is expected
+        assert puzzle.validate_all() is True
+
+    def test_set_many(self, puzzle):
+        cat, cow, tear = puzzle.clues
+        puzzle.set_many({cat: list("cat"), cow: list("COW"), 2: list("TEAR")})
+
+        assert len(puzzle.grid_history) == 2
+        assert puzzle.clue_history == [0, 1, 2]
+        assert all(clue.answered for clue in puzzle.clues)
+        assert puzzle.validate_all() is True
+
+        # One undo undoes the whole batch
+        puzzle.undo()
+        assert len(puzzle.grid_history) == 1
+        assert puzzle.clue_history == []
+        assert not any(clue.answered for clue in puzzle.clues)
+        assert puzzle.get_current_clue_chars(tear) == [None] * 4
+
+    def test_set_many_conflict_applies_nothing(self, puzzle):
+        cat, cow, tear = puzzle.clues
+        with pytest.raises(CrossingConflictError) as excinfo:
+            puzzle.set_many([(cat, list("CAT")), (tear, list("BEAR"))])
+        assert (excinfo.value.row, excinfo.value.col) == (0, 2)
+        assert len(puzzle.grid_history) == 1
+        assert puzzle.get_current_clue_chars(cat) == [None] * 3
+
+        with pytest.raises(InvalidClueError):
+            puzzle.set_many([(cat, list("CAT")), (cow, list("CO"))])
+        assert len(puzzle.grid_history) == 1
+
+    def test_transaction(self, puzzle):
+        cat, cow, _ = puzzle.clues
+        with puzzle.transaction() as txn:
+            txn.set(cat, list("CAT"))
+            txn.set(cow, list("COW"))
+            assert puzzle.get_current_clue_chars(cat) == [None] * 3
+        assert puzzle.get_current_clue_chars(cow) == list("COW")
+        assert len(puzzle.grid_history) == 2
+
+        # An exception inside the block discards the staged writes
+        with pytest.raises(RuntimeError):
+            with puzzle.transaction() as txn:
+                txn.set(2, list("TEAR"))
+                raise RuntimeError
+        assert len(puzzle.grid_history) == 2
+        assert puzzle.get_current_clue_chars(2) == ["T", None, None, None]
+
+    def test_checkpoint_rollback(self, puzzle):
+        cat, cow, tear = puzzle.clues
+        puzzle.set_clue_chars(cat, list("CAT"))
+        start = puzzle.checkpoint()
+
+        puzzle.set_clue_chars(cow, list("COW"))
+        branch = puzzle.checkpoint()
+        puzzle.set_many({tear: list("TEAR"), cat: list("CAT")})
+        assert puzzle.validate_all() is True
+
+        puzzle.rollback(branch)
+        assert puzzle.get_current_clue_chars(tear) == ["T", None, None, None]
+        assert tear.answered is False
+        assert cat.answered is True
+
+        puzzle.rollback(start)
+        assert cow.answered is False
+        assert puzzle.get_current_clue_chars(cow) == ["C", None, None]
+        assert puzzle.clue_history == [0]
+        assert puzzle.progress().correct_cells == 3
+
+        # The branch checkpoint was abandoned, even once the history is as deep again
+        puzzle.set_clue_chars(cow, list("CUT"))
+        with pytest.raises(InvalidGridError):
+            puzzle.rollback(branch)
+        puzzle.rollback(start)
+
+        puzzle.reset()
+        with pytest.raises(InvalidGridError):
+            puzzle.rollback(start)
+
+    def test_from_trusted(self, puzzle):
+        grid = puzzle.compact_grid.copy()
+        trusted = CrosswordPuzzle.from_trusted(5, 5, grid, list(puzzle.clues))
+        assert trusted.clues == puzzle.clues
+        assert trusted.current_grid == puzzle.current_grid
+        assert [c.number for c in trusted.get_clues_overlapping_with_cell(0, 0)] == \
+            [c.number for c in puzzle.get_clues_overlapping_with_cell(0, 0)]
+
+        with pytest.raises(InvalidGridError):
+            CrosswordPuzzle.from_trusted(4, 5, grid, [])
+
+    def test_candidates(self, puzzle):
+        assert puzzle.get_candidates(0) == []
+        puzzle.add_candidates(0, [Candidate(word="cot", score=0.5), Candidate(word="CATS", score=2.0)])
+        merged = puzzle.add_candidates(puzzle.clues[0], [Candidate(word="CAT", score=1.0),
+                                                         Candidate(word="COT", score=0.2)])
+        # Uppercased, of the clue's length, best score kept, best first
+        assert [(c.word, c.score) for c in merged] == [("CAT", 1.0), ("COT", 0.5)]
+        assert puzzle.get_candidates(0) == merged
+        restored = CrosswordPuzzle.model_validate_json(puzzle.model_dump_json())
+        assert restored.get_candidates(0) == merged
@@ -0,0 +1,63 @@
+import random
+import string
+
+import pytest
+from src.crossword.types import Candidate
+from src.crossword.utils import load_puzzle
+from src.solver.fill import fill_puzzle, normalize_candidates
+
+class TestFill:
+    def test_normalize_candidates(self):
+        candidates = normalize_candidates(
+            ["cat", ("BAT", 0.5), Candidate(word="CAT", score=0.9), "CATS", "C-T"], 3
+        )
+        assert candidates == [Candidate(word="CAT", score=0.9), Candidate(word="BAT", score=0.5)]
+
+    def test_prefers_consistent_fill(self, puzzle):
+        result = fill_puzzle(puzzle, {
+            0: [("BAT", 0.9), ("CAT", 0.5)],
+            1: [("COW", 0.8), ("SOW", 0.1)],
+            2: [("BEAR", 0.2), ("TEAR", 0.6)],
+        })
+        assert result.complete and result.exhausted
+        assert result.answers == {0: "CAT", 1: "COW", 2: "TEAR"}
+        assert result.score == pytest.approx(1.9)
+
+        result.apply(puzzle)
+        assert puzzle.validate_all() is True
+        assert len(puzzle.grid_history) == 2
+
+    def test_leaves_slots_blank_without_complete_fill(self, puzzle):
+        candidates = {0: [("CAT", 0.9)], 1: [("DOW", 0.5)], 2: [("TEAR", 0.6)]}
+        result = fill_puzzle(puzzle, candidates)
+        assert not result.complete
+        assert result.answers == {0: "CAT", 2: "TEAR"}
+
+        result = fill_puzzle(puzzle, candidates, allow_partial=False)
+        assert result.answers == {}
+
+    def test_respect_grid(self, puzzle):
+        puzzle.set_clue_chars(2, list("BEAR"))
+        result = fill_puzzle(puzzle, {0: ["CAT", "CAB"]}, respect_grid=True)
+        assert result.answers == {0: "CAB"}
+
+    def test_fifty_candidates_per_slot(self):
+        puzzle = load_puzzle("data/cryptic.puz")
+        rng = random.Random(0)
+        candidates = {}
+        for handle, clue in enumerate(puzzle.clues):
+            # Near misses of the answer so crossings actually have to be resolved
+            noise = []
+            for _ in range(49):
+                word = list(clue.answer)
+                for _ in range(rng.randint(1, 3)):
+                    word[rng.randrange(len(word))] = rng.choice(string.ascii_uppercase)
+                noise.append(("".join(word), rng.uniform(0.0, 0.5)))
+            candidates[handle] = noise + [(clue.answer, 1.0)]
+
+        result = fill_puzzle(puzzle, candidates, time_budget=1.0)
+        assert result.complete
+        assert result.elapsed < 1.0
+
+        result.apply(puzzle)
+        assert puzzle.validate_all() is True
@@ -0,0 +1,42 @@
+import pytest
+from src.crossword.grid import BLOCK, CompactGrid
+from src.crossword.types import Cell, Grid
+from src.crossword.exceptions import InvalidGridError
+
+@pytest.fixture
+def grid():
+    cells = [[Cell(row=r, col=c, value=None) for c in range(3)] for r in range(2)]
+    cells[0][0].value = "C"
+    cells[1][2].value = BLOCK
+    return Grid(width=3, height=2, cells=cells)
+
+class TestCompactGrid:
+    def test_round_trip(self, grid):
+        compact = CompactGrid.from_grid(grid)
+        assert len(compact.buffer) == 6
+        assert compact[0, 0] == "C"
+        assert compact[0, 1] is None
+        assert compact[1, 2] == BLOCK
+        assert compact.to_grid() == grid
+
+    def test_cell_views_write_through(self, grid):
+        compact = CompactGrid.from_grid(grid)
+        view = compact.cells[0][1]
+        view.value = "A"
+        assert compact[0, 1] == "A"
+        assert compact.cell(1, 2).is_block
+        assert not hasattr(view, "__dict__")
+
+    def test_copy_is_independent(self, grid):
+        compact = CompactGrid.from_grid(grid)
+        snapshot = compact.copy()
+        compact[0, 0] = "D"
+        assert snapshot[0, 0] == "C"
+        assert snapshot != compact
+
+    def test_rejects_unencodable_values(self, grid):
+        compact = CompactGrid.from_grid(grid)
+        with pytest.raises(InvalidGridError):
+            compact[0, 0] = "AB"
+        with pytest.raises(InvalidGridError):
+            CompactGrid(3, 2, bytearray(5))
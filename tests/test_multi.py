@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from src.crossword.utils import load_puzzle
+from src.solver.backends import StubBackend
+from src.solver.batching import BatchSolver
+from src.solver.multi import group_queries, solve_many
+from src.solver.pipeline import ClueSolver, queries
+
+def shouted(path):
+    """A copy of a puzzle whose clues differ only in case and punctuation"""
+    puzzle = load_puzzle(path)
+    for clue in puzzle.clues:
+        clue.text = clue.text.upper() + "!"
+    return puzzle
+
+@pytest.mark.parametrize("solver_class", [ClueSolver, BatchSolver])
+def test_repeated_clues_are_asked_once(solver_class):
+    puzzles = [load_puzzle("data/hard.puz"), shouted("data/hard.puz"), load_puzzle("data/easy.puz")]
+    unique = len(puzzles[0].clues) + len(puzzles[2].clues)
+    backend = StubBackend(puzzles)
+    solver = solver_class(backend)
+    result = asyncio.run(solve_many(solver, puzzles))
+
+    report = result.report
+    assert (report.puzzles, report.clues, report.groups) == (3, unique + len(puzzles[1].clues), unique)
+    assert report.saved == len(puzzles[1].clues)
+    assert report.requests == solver.requests == backend.stats.requests
+    for puzzle, results in zip(puzzles, result.results):
+        assert sorted(r.handle for r in results) == list(range(len(puzzle.clues)))
+        assert puzzle.validate_all() is True
+
+def test_known_letters_split_groups():
+    first, second = load_puzzle("data/easy.puz"), load_puzzle("data/easy.puz")
+    second.set_clue_chars(0, list(second.clues[0].answer))
+    shared, members = group_queries([
+        BatchSolver(StubBackend(first)).puzzle_queries(puzzle) for puzzle in (first, second)
+    ])
+    # Every clue crossing the filled one now has a pattern of its own
+    assert len(shared) > len(first.clues)
+    assert sum(len(group) for group in members) == 2 * len(first.clues)
+
+def test_groups_sum_priorities():
+    puzzle = load_puzzle("data/hard.puz")
+    shared, members = group_queries([queries(puzzle), queries(puzzle)])
+    assert len(shared) == len(puzzle.clues)
+    assert all(group == [(0, handle), (1, handle)] for handle, group in enumerate(members))
+    assert [q.priority for q in shared] == [2 * q.priority for q in queries(puzzle)]
+    assert [q.handle for q in shared] == list(range(len(shared)))
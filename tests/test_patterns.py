@@ -0,0 +1,39 @@
+from src.crossword.grid import BLOCK
+from src.solver.patterns import PatternIndex, normalize_word, pattern_from_chars
+
+WORDS = ["cat", "cot", "Cut", "COW", "TEAR", "tear", "Oedipus Rex", "DOG"]
+
+class TestPatternIndex:
+    def test_normalizes_and_deduplicates(self):
+        index = PatternIndex(WORDS)
+        assert len(index) == 7
+        assert index.words(3) == ["CAT", "COT", "CUT", "COW", "DOG"]
+        assert "OEDIPUSREX" in index
+        assert normalize_word("Per annum") == "PERANNUM"
+
+    def test_match(self):
+        index = PatternIndex(WORDS)
+        assert index.match("C?T") == ["CAT", "COT", "CUT"]
+        assert index.match("c_t", limit=2) == ["CAT", "COT"]
+        assert index.match(["C", "O", None]) == ["COT", "COW"]
+        assert index.match("???") == index.words(3)
+        assert index.match("X??") == []
+        assert index.match("?????") == []
+        assert index.count("?O?") == 3
+
+    def test_pattern_from_chars(self):
+        assert pattern_from_chars(["C", None, "T", BLOCK]) == "C?T?"
+
+    def test_large_index(self):
+        # Every 4-letter word over a 12-letter alphabet
+        alphabet = "ABCDEFGHIJKL"
+        words = [a + b + c + d for a in alphabet for b in alphabet for c in alphabet for d in alphabet]
+        index = PatternIndex(words, normalize=False)
+        assert index.count("A??D") == 144
+        assert index.match("?BC?", limit=3) == ["ABCA", "ABCB", "ABCC"]
+
+        stats = index.stats()
+        assert stats.words == len(words)
+        assert stats.lengths == 1
+        assert stats.build_seconds > 0
+        assert stats.bytes > 0
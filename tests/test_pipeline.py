@@ -0,0 +1,183 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from src.solver.pipeline import (
+    ClueSolver, SolverConfig, WordExtractor, extract_candidates, extract_word, rank_candidates,
+    solve_puzzle,
+)
+
+class FakeClient:
+    """Answers prompts from a table, after a per-answer delay"""
+
+    def __init__(self, replies, delays=None):
+        self.replies = replies
+        self.delays = delays or {}
+        self.in_flight = 0
+        self.peak = 0
+        self.cancelled = 0
+        self.streams = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        text = next(text for key, text in self.replies.items() if key in prompt)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(text, 0.01))
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        if isinstance(text, Exception):
+            raise text
+        if kwargs.get("stream"):
+            self.streams.append(FakeStream(text))
+            return self.streams[-1]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+class FakeStream:
+    """Streams a reply two characters a chunk, recording how much was read"""
+
+    def __init__(self, text):
+        self.chunks = [text[i:i + 2] for i in range(0, len(text), 2)]
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read == len(self.chunks):
+            raise StopAsyncIteration
+        self.read += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=self.chunks[self.read - 1]))])
+
+    async def close(self):
+        self.closed = True
+
+REPLIES = {"Feline": "The answer is 'CAT'.", "Dairy": "cow", "sadness": "TEAR"}
+
+class TestPipeline:
+    def test_extract_word(self):
+        assert extract_word("The answer is 'cat'.", 3) == "CAT"
+        assert extract_word("I think TEAR fits", 4) == "TEAR"
+        with pytest.raises(ValueError):
+            extract_word("no idea", 7)
+
+    def test_word_extractor(self):
+        extractor = WordExtractor(3)
+        assert extractor.feed("The answer is 'C") is None
+        assert extractor.feed("AT' since") == "CAT"
+
+        extractor = WordExtractor(3)
+        assert extractor.feed("cow") is None
+        assert extractor.feed(".") == "COW"
+
+        # A quoted word contradicting the pattern is passed over
+        extractor = WordExtractor(4, "T??R")
+        assert extractor.feed("Not 'SEAR' but 'TEAR'") == "TEAR"
+        assert WordExtractor(4).feed("Tear drops") is None
+
+        extractor = WordExtractor(4)
+        extractor.feed("I think TEAR fits")
+        assert extractor.finish() == "TEAR"
+
+    def test_rank_candidates(self):
+        assert extract_candidates("1. 'CAT'\n2. cot\nno idea\n3. Cat", 3) == ["CAT", "COT", "CAT"]
+        ranked = rank_candidates([["CAT", "COT", "CUT"], ["cot", "DOG", "CATS"]], 3, "C??", avoid=["CUT"])
+        assert [(c.word, c.score) for c in ranked] == [("COT", 0.75), ("CAT", 0.5)]
+
+    def test_candidates_are_stored_on_the_puzzle(self, puzzle):
+        client = FakeClient({"Feline": "1. COT\n2. CAT", "Dairy": "1. COW\n2. SOW", "sadness": "TEAR"})
+        solver = ClueSolver(client, SolverConfig(candidates=2))
+        results = {r.handle: r for r in asyncio.run(solver.solve_puzzle(puzzle))}
+        assert results[0].word == "COT" and [c.word for c in results[0].candidates] == ["COT", "CAT"]
+        assert [c.word for c in puzzle.get_candidates(1)] == ["COW", "SOW"]
+        assert [c.word for c in puzzle.get_candidates(2)] == ["TEAR"]
+
+    def test_streaming_stops_at_first_answer(self, puzzle):
+        client = FakeClient({
+            "Feline": "The answer is 'CAT', as felines make friendly companions.",
+            "Dairy": "cow", "sadness": "TEAR",
+        })
+        solver = ClueSolver(client, SolverConfig(stream=True))
+        results = asyncio.run(solver.solve_puzzle(puzzle))
+        assert sorted((r.handle, r.word) for r in results) == [(0, "CAT"), (1, "COW"), (2, "TEAR")]
+        assert solver.early_stops == 1
+        assert all(stream.closed for stream in client.streams)
+        feline = next(stream for stream in client.streams if len(stream.chunks) > 10)
+        assert feline.read < len(feline.chunks)
+
+    def test_solves_all_clues(self, puzzle):
+        results = solve_puzzle(puzzle, backend=FakeClient(REPLIES))
+        assert sorted((r.handle, r.word) for r in results) == [(0, "CAT"), (1, "COW"), (2, "TEAR")]
+        assert puzzle.validate_all() is True
+
+    def test_results_arrive_in_completion_order(self, puzzle):
+        client = FakeClient(REPLIES, delays={"The answer is 'CAT'.": 0.1, "cow": 0.05})
+        results = solve_puzzle(puzzle, backend=client)
+        assert [r.handle for r in results] == [2, 1, 0]
+
+    def test_concurrency_limit(self, puzzle):
+        client = FakeClient(REPLIES)
+        solve_puzzle(puzzle, backend=client, config=SolverConfig(max_concurrency=2))
+        assert client.peak == 2
+
+    def test_clue_template(self, puzzle):
+        prompts = []
+        client = FakeClient(REPLIES)
+        create = client.create
+
+        async def recording(model, messages, **kwargs):
+            prompts.append(messages[-1]["content"])
+            return await create(model, messages, **kwargs)
+
+        client.chat.completions.create = recording
+        config = SolverConfig(clue_template="Answer in {length} letters: '{text}'. Only the word.")
+        solve_puzzle(puzzle, backend=client, config=config)
+        assert "Answer in 3 letters: 'Feline friend'. Only the word." in prompts
+        assert config.prompt_version != SolverConfig().prompt_version
+
+    def test_timeout_and_errors_are_results(self, puzzle):
+        client = FakeClient({**REPLIES, "Dairy": RuntimeError("rate limited")},
+                            delays={"TEAR": 1.0})
+        results = {r.handle: r for r in solve_puzzle(
+            puzzle, backend=client, config=SolverConfig(timeout=0.1)
+        )}
+        assert results[0].word == "CAT"
+        assert "rate limited" in results[1].error
+        assert "Timed out" in results[2].error
+        assert puzzle.get_current_clue_chars(2) == ["T", None, None, None]
+
+    def test_closing_stream_cancels_pending(self, puzzle):
+        client = FakeClient(REPLIES, delays={"cow": 1.0, "TEAR": 1.0})
+
+        async def first():
+            stream = ClueSolver(client).solve_stream(puzzle)
+            result = await stream.__anext__()
+            await stream.aclose()
+            return result
+
+        assert asyncio.run(first()).word == "CAT"
+        assert client.cancelled == 2 and client.in_flight == 0
+
+    def test_answer_cache(self, puzzle, tmp_path):
+        from src.solver.answer_cache import AnswerCache
+
+        with AnswerCache(tmp_path / "answers.sqlite") as cache:
+            solve_puzzle(puzzle, backend=FakeClient(REPLIES), cache=cache)
+            assert cache.stats().misses == 3 and len(cache) == 3
+
+            puzzle.reset()
+            client = FakeClient(REPLIES)
+            results = solve_puzzle(puzzle, backend=client, cache=cache)
+            assert all(r.cached for r in results)
+            assert client.peak == 0
+            assert puzzle.validate_all() is True
+
+            other = SolverConfig(system_prompt="Solve this clue.")
+            results = solve_puzzle(puzzle, backend=FakeClient(REPLIES), config=other, cache=cache)
+            assert not any(r.cached for r in results)
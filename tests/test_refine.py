@@ -0,0 +1,137 @@
+import asyncio
+from collections import Counter
+
+from src.crossword.types import Candidate
+from src.crossword.utils import load_puzzle
+from src.solver.backends import Completion, StubBackend
+from src.solver.pipeline import ClueSolver, SolverConfig
+from src.solver.refine import Refiner, answers_from_results, cover_disagreements, unresolved_slots
+
+class Scripted:
+    """Replies from a list per clue, recording the prompts"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.prompts = []
+
+    async def acomplete(self, request):
+        prompt = request.prompt
+        self.prompts.append(prompt)
+        key = next(key for key in self.replies if key in prompt)
+        return Completion(text=self.replies[key].pop(0))
+
+def first_pass(puzzle, answers):
+    for handle, word in answers.items():
+        puzzle.set_clue_chars(handle, list(word))
+    return answers
+
+class TestRefine:
+    def test_unresolved_slots(self, puzzle):
+        answers = first_pass(puzzle, {0: "CAT", 2: "BEAR"})
+        assert unresolved_slots(puzzle, answers) == ([0, 2], [1])
+
+    def test_unanswered_crossings_are_skipped(self, puzzle):
+        # CAT is crossed by TEAR at its last square, and has no answer
+        answers = first_pass(puzzle, {1: "COW", 2: "TEAR"})
+        assert unresolved_slots(puzzle, answers) == ([], [0])
+
+    def test_refines_after_failed_clues(self):
+        puzzle = load_puzzle("data/cryptic.puz")
+        solver = ClueSolver(StubBackend(puzzle, seed=1, error_rate=0.3))
+
+        async def run():
+            answers = answers_from_results(await solver.solve_puzzle(puzzle))
+            return answers, await Refiner(solver, max_requests=40).refine(puzzle, answers)
+
+        before, result = asyncio.run(run())
+        assert len(before) < len(puzzle.clues)
+        assert len(result.answers) > len(before)
+
+    def test_requeries_only_the_doubtful_side(self, puzzle):
+        answers = first_pass(puzzle, {0: "CAT", 1: "COW", 2: "BEAR"})
+        backend = Scripted({"sadness": ["TEAR"]})
+        result = asyncio.run(Refiner(ClueSolver(backend)).refine(puzzle, answers))
+
+        assert result.converged and result.requests == 1 and result.rounds == 1
+        assert "pattern T???" in backend.prompts[0]
+        assert result.answers[2] == "TEAR"
+        assert puzzle.validate_all() is True
+
+    def test_insisted_conflict_is_ruled_out(self, puzzle):
+        answers = first_pass(puzzle, {0: "CAT", 1: "COW", 2: "BEAR"})
+        backend = Scripted({"sadness": ["BEAR", "TEAR"]})
+        result = asyncio.run(Refiner(ClueSolver(backend)).refine(puzzle, answers))
+        # BEAR does not fit T??? and is rejected, then ruled out in the prompt
+        assert result.converged and result.requests == 2
+        assert "It is not BEAR" not in backend.prompts[0]
+        assert result.answers[2] == "TEAR"
+
+    def test_budget_and_attempts(self, puzzle):
+        answers = first_pass(puzzle, {0: "CAT", 1: "COW", 2: "BEAR"})
+        backend = Scripted({"sadness": ["BEAR"] * 5})
+        result = asyncio.run(Refiner(ClueSolver(backend), max_requests=2).refine(puzzle, answers))
+        assert not result.converged and result.requests == 2
+        assert result.remaining == [0, 2]
+
+        # With TEAR out of attempts, its crossing is asked instead
+        backend = Scripted({"sadness": ["BEAR"], "Feline": ["CAB"]})
+        result = asyncio.run(Refiner(ClueSolver(backend), max_attempts=1).refine(
+            puzzle, {0: "CAT", 1: "COW", 2: "BEAR"}
+        ))
+        assert result.requests == 2 and "pattern C?B" in backend.prompts[1]
+        assert result.converged and result.answers[0] == "CAB"
+
+    def test_improves_noisy_first_pass(self):
+        puzzle = load_puzzle("data/cryptic.puz")
+        solver = ClueSolver(StubBackend(puzzle, seed=1, noise=0.3))
+
+        async def run():
+            answers = answers_from_results(await solver.solve_puzzle(puzzle))
+            return answers, await Refiner(solver, max_requests=40).refine(puzzle, answers)
+
+        before, result = asyncio.run(run())
+        correct = lambda answers: sum(answers[h] == puzzle.clues[h].answer for h in answers)
+        assert result.requests <= 40
+        assert correct(result.answers) > correct(before)
+
+    def test_settles_conflicts_from_stored_candidates(self, puzzle):
+        answers = first_pass(puzzle, {0: "CAT", 1: "COW", 2: "BEAR"})
+        puzzle.add_candidates(2, [Candidate(word="BEAR", score=1.0), Candidate(word="SEAR", score=0.5),
+                                  Candidate(word="TEAR", score=0.3)])
+        backend = Scripted({})
+        result = asyncio.run(Refiner(ClueSolver(backend)).refine(puzzle, answers))
+        # SEAR does not fit T???, so TEAR is taken without a request
+        assert result.converged and result.requests == 0 and result.local == 1
+        assert result.answers[2] == "TEAR"
+
+    def test_stored_candidates_settle_both_sides_first(self, puzzle):
+        # CAT is right and in two disagreements; the crossing answers are wrong
+        answers = first_pass(puzzle, {1: "DOW", 2: "SEAR", 0: "CAT"})
+        puzzle.add_candidates(0, [Candidate(word="CAT", score=1.0), Candidate(word="XJB", score=0.5)])
+        puzzle.add_candidates(1, [Candidate(word="DOW", score=1.0), Candidate(word="COW", score=0.5)])
+        puzzle.add_candidates(2, [Candidate(word="SEAR", score=1.0), Candidate(word="TEAR", score=0.5)])
+        backend = Scripted({})
+        result = asyncio.run(Refiner(ClueSolver(backend)).refine(puzzle, answers))
+        assert result.answers == {0: "CAT", 1: "COW", 2: "TEAR"}
+        assert result.requests == 0 and result.local == 2
+        assert puzzle.validate_all() is True
+
+    def test_cover_weighs_answer_shares(self):
+        pairs = {(0, 1)}
+        assert cover_disagreements(pairs, Counter()) == {0}
+        assert cover_disagreements(pairs, Counter(), {0: 0.9, 1: 0.3}) == {1}
+        # More pairs still outweigh a surer answer
+        assert cover_disagreements({(0, 1), (0, 2)}, Counter(), {0: 0.9, 1: 0.3, 2: 0.3}) == {0}
+
+    def test_candidates_resolve_noisy_first_pass(self):
+        puzzle = load_puzzle("data/cryptic.puz")
+        solver = ClueSolver(StubBackend(puzzle, seed=1, noise=0.3), SolverConfig(candidates=3))
+
+        async def run():
+            answers = answers_from_results(await solver.solve_puzzle(puzzle))
+            return await Refiner(solver, max_requests=40).refine(puzzle, answers)
+
+        result = asyncio.run(run())
+        assert all(puzzle.get_candidates(h) for h in result.answers)
+        assert result.local > result.requests
+        assert sum(result.answers[h] == puzzle.clues[h].answer for h in result.answers) >= 28
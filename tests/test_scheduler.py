@@ -0,0 +1,165 @@
+import asyncio
+import random
+import time
+
+import pytest
+from src.crossword.utils import load_puzzle
+from src.solver.backends import BackendError, Completion, CompletionRequest, RateLimited, StubBackend
+from src.solver.batching import batch_entries
+from src.solver.pipeline import ClueSolver, SolverConfig, queries
+from src.solver.scheduler import RetryPolicy, Scheduler, TokenBucket
+
+def request(prompt, **kwargs):
+    return CompletionRequest(model="stub", messages=[{"role": "user", "content": prompt}], **kwargs)
+
+class Scripted:
+    """Raises the given errors in turn, then answers with the prompt"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.prompts = []
+
+    async def acomplete(self, request):
+        self.prompts.append(request.prompt)
+        if self.errors:
+            raise self.errors.pop(0)
+        return Completion(text=request.prompt, model=request.model)
+
+class TestTokenBucket:
+    def test_refills_at_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(60, clock=lambda: now[0])
+        # Ten seconds' worth
+        assert bucket.wait_time(10) == 0
+        bucket.take(10)
+        assert bucket.wait_time(1) == pytest.approx(1.0)
+        now[0] = 0.5
+        assert bucket.wait_time(1) == pytest.approx(0.5)
+        now[0] = 120
+        assert bucket.wait_time(10) == 0
+        assert bucket.tokens == 10
+
+    def test_give_back_and_oversized_requests(self):
+        now = [0.0]
+        bucket = TokenBucket(60, capacity=10, clock=lambda: now[0])
+        bucket.take(10)
+        bucket.give(4)
+        assert bucket.wait_time(4) == 0
+        # Never more than a full bucket to wait for
+        assert bucket.wait_time(100) == pytest.approx(6.0)
+
+class TestRetryPolicy:
+    def test_delays(self):
+        policy = RetryPolicy(base_delay=1, max_delay=4)
+        rng = random.Random(0)
+        assert all(0 <= policy.delay(3, rng=rng) <= 4 for _ in range(50))
+        assert all(2 <= policy.delay(0, retry_after=2, rng=rng) <= 2.2 for _ in range(50))
+
+class TestScheduler:
+    def test_dispatches_by_priority(self):
+        async def run():
+            gate = asyncio.Event()
+            sent = []
+
+            class Gated:
+                async def acomplete(self, request):
+                    sent.append(request.prompt)
+                    await gate.wait()
+                    return Completion(text="", model=request.model)
+
+            scheduler = Scheduler(Gated(), max_concurrency=1)
+            first = asyncio.ensure_future(scheduler.acomplete(request("first")))
+            await asyncio.sleep(0)
+            rest = [asyncio.ensure_future(scheduler.acomplete(request(p, priority=n)))
+                    for p, n in [("low", 1), ("high", 5), ("mid", 3)]]
+            await asyncio.sleep(0)
+            gate.set()
+            await asyncio.gather(first, *rest)
+            return sent
+
+        assert asyncio.run(run()) == ["first", "high", "mid", "low"]
+
+    def test_paces_requests(self):
+        async def run():
+            scheduler = Scheduler(Scripted(), requests_per_minute=1200)
+            scheduler.requests.tokens = 0
+            began = time.perf_counter()
+            await asyncio.gather(*(scheduler.acomplete(request(str(n))) for n in range(3)))
+            return time.perf_counter() - began, scheduler.stats
+
+        elapsed, stats = asyncio.run(run())
+        # 20 requests a second from an empty bucket
+        assert 0.14 <= elapsed < 0.5
+        assert stats.sent == stats.completed == 3
+        assert stats.queued_seconds > 0
+
+    def test_retries_rate_limits_and_transient_errors(self):
+        backend = Scripted([RateLimited("slow down", retry_after=0.01), BackendError("oops")])
+        scheduler = Scheduler(backend, retry=RetryPolicy(base_delay=0.01), seed=0)
+        completion = asyncio.run(scheduler.acomplete(request("hi")))
+        assert completion.text == "hi"
+        assert backend.prompts == ["hi"] * 3
+        assert scheduler.stats.retries == 2
+        assert scheduler.stats.rate_limited == 1
+        assert scheduler.stats.completed == 1
+
+    def test_gives_up_after_max_retries(self):
+        backend = Scripted([BackendError("oops")] * 3)
+        scheduler = Scheduler(backend, retry=RetryPolicy(max_retries=2, base_delay=0))
+        with pytest.raises(BackendError):
+            asyncio.run(scheduler.acomplete(request("hi")))
+        assert scheduler.stats.failed == 1
+        assert scheduler._active == 0
+
+    def test_other_errors_are_not_retried(self):
+        backend = Scripted([ValueError("bad request")])
+        scheduler = Scheduler(backend)
+        with pytest.raises(ValueError):
+            asyncio.run(scheduler.acomplete(request("hi")))
+        assert len(backend.prompts) == 1
+        assert scheduler._active == 0
+
+    def test_streams_and_retries_before_first_chunk(self):
+        async def run():
+            puzzle = load_puzzle("data/easy.puz")
+            stub = StubBackend(puzzle)
+            scheduler = Scheduler(stub, retry=RetryPolicy(base_delay=0))
+            failures = [BackendError("oops")]
+            astream = stub.astream
+
+            def flaky(request):
+                if failures:
+                    raise failures.pop()
+                return astream(request)
+
+            stub.astream = flaky
+            solver = ClueSolver(scheduler, SolverConfig(stream=True))
+            results = await solver.solve_puzzle(puzzle)
+            return puzzle, results, scheduler, solver
+
+        puzzle, results, scheduler, solver = asyncio.run(run())
+        assert all(r.ok for r in results)
+        assert solver.early_stops == len(puzzle.clues)
+        assert scheduler.stats.retries == 1
+        assert scheduler._active == 0
+
+    def test_solves_puzzle_under_stub_limits(self):
+        puzzle = load_puzzle("data/hard.puz")
+        stub = StubBackend(puzzle, requests_per_minute=len(puzzle.clues))
+        # Ten seconds' burst is every clue, and the stub allows no more
+        scheduler = Scheduler(stub, requests_per_minute=6 * len(puzzle.clues))
+        results = asyncio.run(ClueSolver(scheduler).solve_puzzle(puzzle))
+        assert all(r.ok for r in results)
+        assert puzzle.validate_all() is True
+        assert stub.stats.rate_limited == 0
+
+class TestPriorities:
+    def test_queries_rank_crossed_and_known_letters(self):
+        puzzle = load_puzzle("data/hard.puz")
+        ranked = queries(puzzle)
+        assert all(q.priority == len(puzzle.crossings(q.handle)) for q in ranked)
+
+        crossing = puzzle.crossings(0)[0]
+        puzzle.set_clue_chars(crossing.clue, list(crossing.clue.answer))
+        entry = batch_entries(puzzle, [0])[0]
+        assert entry.priority == len(puzzle.crossings(0)) + 2
@@ -0,0 +1,98 @@
+import numpy as np
+import puz
+import pytest
+
+from src.crossword.exceptions import InvalidGridError
+from src.crossword.slots import ACROSS, DOWN, find_slots, guardian_arrays, puz_arrays
+from src.crossword.types import Direction
+
+PUZZLES = ["data/cryptic.puz", "data/easy.puz", "data/hard.puz", "data/medium.puz"]
+
+def naive_slots(blocks):
+    """Reference numbering with per-cell loops, as in puz's clue_numbering"""
+    height, width = blocks.shape
+    open_ = lambda r, c: 0 <= r < height and 0 <= c < width and not blocks[r, c]
+    across, down, n = [], [], 1
+    for r in range(height):
+        for c in range(width):
+            if not open_(r, c):
+                continue
+            starts = False
+            if not open_(r, c - 1) and open_(r, c + 1):
+                length = next(i for i in range(width + 1) if not open_(r, c + i))
+                across.append((n, r, c, length))
+                starts = True
+            if not open_(r - 1, c) and open_(r + 1, c):
+                length = next(i for i in range(height + 1) if not open_(r + i, c))
+                down.append((n, r, c, length))
+                starts = True
+            n += starts
+    return across + down
+
+def as_tuples(slots):
+    return list(zip(slots.number.tolist(), slots.row.tolist(), slots.col.tolist(), slots.length.tolist()))
+
+class TestFindSlots:
+    @pytest.mark.parametrize("path", PUZZLES)
+    def test_matches_puz_numbering(self, path):
+        puzzle_file = puz.read(path)
+        numbering = puzzle_file.clue_numbering()
+        width = puzzle_file.width
+        slots = find_slots(*puz_arrays(
+            puzzle_file.fill, puzzle_file.solution, width, puzzle_file.height
+        ))
+
+        entries = numbering.across + numbering.down
+        assert slots.directions() == \
+            [Direction.ACROSS] * len(numbering.across) + [Direction.DOWN] * len(numbering.down)
+        assert as_tuples(slots) == \
+            [(e["num"], e["cell"] // width, e["cell"] % width, e["len"]) for e in entries]
+        assert slots.clue_order().tolist() == \
+            sorted(range(len(entries)), key=lambda i: entries[i]["clue_index"])
+        for entry, answer in zip(numbering.across, slots.answers):
+            assert answer == puzzle_file.solution[entry["cell"]:entry["cell"] + entry["len"]]
+
+    def test_large_generated_grid(self):
+        rng = np.random.default_rng(7)
+        blocks = rng.random((100, 100)) < 0.25
+        solution = rng.integers(ord("A"), ord("Z") + 1, size=(100, 100), dtype=np.uint8)
+        slots = find_slots(blocks, solution)
+
+        assert as_tuples(slots) == naive_slots(blocks)
+        for direction, row, col, length, answer in zip(
+            slots.direction, slots.row, slots.col, slots.length, slots.answers
+        ):
+            if direction == ACROSS:
+                expected = solution[row, col:col + length]
+            else:
+                expected = solution[row:row + length, col]
+            assert answer == expected.tobytes().decode()
+
+    def test_min_length_and_empty_grid(self):
+        blocks = np.array([[False, True, False],
+                           [False, False, False]])
+        slots = find_slots(blocks, min_length=1)
+        assert (DOWN, 1, 0, 0, 2) in zip(slots.direction.tolist(), slots.number.tolist(),
+                                         slots.row.tolist(), slots.col.tolist(),
+                                         slots.length.tolist())
+        assert len(find_slots(np.ones((3, 3), dtype=bool))) == 0
+        assert find_slots(blocks).answers is None
+
+        with pytest.raises(InvalidGridError):
+            find_slots(blocks, np.zeros((3, 3), dtype=np.uint8))
+
+class TestGuardianArrays:
+    def test_entries_fill_grid(self):
+        json_data = {
+            "dimensions": {"rows": 3, "cols": 3},
+            "entries": [
+                {"position": {"x": 0, "y": 0}, "length": 3, "direction": "across", "solution": "CAT"},
+                {"position": {"x": 0, "y": 0}, "length": 3, "direction": "down", "solution": "COW"},
+                {"position": {"x": 2, "y": 0}, "length": 3, "direction": "down", "solution": "TEA"},
+            ],
+        }
+        blocks, solution = guardian_arrays(json_data)
+        slots = find_slots(blocks, solution)
+        assert blocks.tolist() == [[False, False, False], [False, True, False], [False, True, False]]
+        assert slots.answers == ["CAT", "COW", "TEA"]
+        assert slots.number.tolist() == [1, 1, 2]
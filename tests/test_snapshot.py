@@ -0,0 +1,73 @@
+import pytest
+from src.crossword.crossword import CrosswordPuzzle
+from src.crossword.exceptions import SnapshotError
+from src.crossword.types import Candidate
+from src.crossword.utils import load_puzzle
+
+PUZZLES = ["data/easy.puz", "data/medium.puz", "data/hard.puz", "data/cryptic.puz"]
+
+def played(path):
+    puzzle = load_puzzle(path)
+    for handle, clue in enumerate(puzzle.clues):
+        puzzle.set_clue_chars(handle, list(clue.answer))
+        puzzle.add_candidates(handle, [Candidate(word=clue.answer, score=0.75)])
+    puzzle.undo()
+    return puzzle
+
+class TestSnapshot:
+    @pytest.mark.parametrize("path", PUZZLES)
+    def test_round_trip(self, path):
+        puzzle = played(path)
+        restored = CrosswordPuzzle.from_bytes(puzzle.to_bytes())
+
+        assert restored.clues == puzzle.clues
+        assert restored.clue_history == puzzle.clue_history
+        assert restored.compact_grid == puzzle.compact_grid
+        assert restored.candidates == puzzle.candidates
+        assert len(restored.grid_history) == len(puzzle.grid_history)
+        assert restored.grid_history[1] == puzzle.grid_history[1]
+        assert restored.progress() == puzzle.progress()
+
+        restored.undo()
+        puzzle.undo()
+        assert restored.compact_grid == puzzle.compact_grid
+        assert restored.clues == puzzle.clues
+
+    @pytest.mark.parametrize("path", PUZZLES)
+    def test_much_smaller_than_json(self, path):
+        puzzle = played(path)
+        assert len(puzzle.to_bytes()) * 10 <= len(puzzle.model_dump_json())
+
+    def test_loads_from_memoryview(self):
+        puzzle = played(PUZZLES[0])
+        data = bytearray(puzzle.to_bytes())
+        restored = CrosswordPuzzle.from_bytes(memoryview(data))
+        assert restored.compact_grid == puzzle.compact_grid
+
+    def test_rejects_bad_data(self):
+        data = played(PUZZLES[0]).to_bytes()
+        with pytest.raises(SnapshotError):
+            CrosswordPuzzle.from_bytes(b"NOPE" + data[4:])
+        with pytest.raises(SnapshotError):
+            CrosswordPuzzle.from_bytes(data[:len(data) // 2])
+
+    def test_long_candidates_and_oversized_fields(self):
+        puzzle = played(PUZZLES[0])
+        puzzle.candidates[0] = [Candidate(word="X" * 300, score=1.0)]
+        restored = CrosswordPuzzle.from_bytes(puzzle.to_bytes())
+        assert restored.candidates[0] == puzzle.candidates[0]
+
+        puzzle.candidates[0] = [Candidate(word="X" * 70000, score=1.0)]
+        with pytest.raises(SnapshotError):
+            puzzle.to_bytes()
+
+    def test_rejects_clue_indices_out_of_range(self):
+        puzzle = played(PUZZLES[0])
+        puzzle.clue_history.append(len(puzzle.clues))
+        with pytest.raises(SnapshotError):
+            CrosswordPuzzle.from_bytes(puzzle.to_bytes())
+
+        puzzle = played(PUZZLES[0])
+        puzzle.candidates[len(puzzle.clues)] = [Candidate(word="CAT", score=1.0)]
+        with pytest.raises(SnapshotError):
+            CrosswordPuzzle.from_bytes(puzzle.to_bytes())
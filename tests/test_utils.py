@@ -0,0 +1,48 @@
+import pytest
+
+from src.crossword.utils import load_puzzle, load_puzzles
+
+PUZZLES = ["data/cryptic.puz", "data/easy.puz", "data/hard.puz", "data/medium.puz"]
+
+class TestLoadPuzzles:
+    def test_glob_in_order(self):
+        results = list(load_puzzles("data/*.puz", workers=2, ordered=True))
+        assert [r.path for r in results] == PUZZLES
+        for result in results:
+            assert result.error is None
+            assert result.puzzle.clues == load_puzzle(result.path).clues
+
+    def test_errors_do_not_abort_batch(self, tmp_path):
+        broken = tmp_path / "broken.puz"
+        broken.write_bytes(b"not a puzzle")
+        paths = [PUZZLES[0], str(broken), str(tmp_path / "missing.puz"), PUZZLES[1]]
+
+        results = {r.path: r for r in load_puzzles(paths, workers=2, max_in_flight=1)}
+        assert set(results) == set(paths)
+        assert results[str(broken)].puzzle is None
+        assert results[str(broken)].error is not None
+        assert isinstance(results[str(tmp_path / "missing.puz")].error, FileNotFoundError)
+        assert len(results[PUZZLES[1]].puzzle.clues) == 3
+
+    def test_single_worker_directory(self):
+        results = list(load_puzzles("data", workers=1))
+        assert [r.path for r in results] == PUZZLES
+        assert all(r.puzzle is not None for r in results)
+
+class TestLoadPuzzle:
+    @pytest.mark.parametrize("path", PUZZLES)
+    def test_trusted_matches_validated(self, path):
+        validated = load_puzzle(path)
+        trusted = load_puzzle(path, trusted=True)
+        assert trusted.clues == validated.clues
+        assert trusted.compact_grid == validated.compact_grid
+        assert trusted.model_dump() == validated.model_dump()
+
+    def test_trusted_puzzle_is_playable(self):
+        puzzle = load_puzzle(PUZZLES[1], trusted=True)
+        clue = puzzle.clues[0]
+        puzzle.set_clue_chars(clue, list(clue.answer))
+        assert puzzle.clues[0].answered
+        puzzle.undo()
+        assert not puzzle.clues[0].answered
+        assert len(puzzle.grid_history) == 1